@@ -32,6 +32,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # Third-party Apps
     'rest_framework.authtoken',
@@ -44,6 +45,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Before anything that reads or changes the response body
+    'gear.middleware.CompressionMiddleware',
+    'gear.middleware.ReplicaPinMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -88,6 +92,28 @@ DATABASES = {
     }
 }
 
+# Read replicas (host or host:port, same credentials as the primary) for
+# the read-only API actions; see gear.replicas. Tests treat them as
+# mirrors of the test database. Locally, DB_REPLICA_HOSTS=localhost gives
+# a second connection to the same database, to exercise the routing.
+DATABASE_REPLICAS = []
+for number, replica_host in enumerate(env.list('DB_REPLICA_HOSTS', default=[]), 1):
+    replica_host, _, replica_port = replica_host.partition(':')
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': replica_host,
+        'PORT': replica_port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['gear.replicas.ReplicaRouter']
+
+# After writing, a user reads from the primary for this many seconds, to
+# cover replication lag. Pins are kept in the default cache, which must
+# be shared (e.g. Redis) when running several processes.
+DB_REPLICA_PIN_SECONDS = env.int('DB_REPLICA_PIN_SECONDS', default=10)
+
 
 # --- AUTHENTICATION & REST FRAMEWORK ---
 AUTH_PASSWORD_VALIDATORS = [
@@ -105,10 +131,25 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'gear.renderers.ORJSONRenderer',
+        'gear.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'rest_framework.parsers.JSONParser',
+        'gear.renderers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
 }
 
+# Smaller responses are sent uncompressed (see gear.middleware)
+RESPONSE_COMPRESSION_MIN_BYTES = env.int(
+    'RESPONSE_COMPRESSION_MIN_BYTES', default=1024)
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
@@ -128,7 +169,59 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Serve uploads at MEDIA_URL from the app. The files are public to anyone
+# who has their URL (photo names are content hashes), so this is off
+# unless DEBUG; enable it explicitly in production, ideally together with
+# MEDIA_SENDFILE_HEADER, or serve MEDIA_ROOT from the front proxy.
+MEDIA_SERVE = env.bool('MEDIA_SERVE', default=DEBUG)
+
+# How /media/ responses are sent: '' streams files from the app,
+# 'X-Accel-Redirect' (nginx) or 'X-Sendfile' (Apache, lighttpd) hands them
+# to the front proxy. For nginx, MEDIA_ACCEL_REDIRECT_PREFIX is an
+# `internal` location aliased to MEDIA_ROOT.
+MEDIA_SENDFILE_HEADER = env('MEDIA_SENDFILE_HEADER', default='')
+MEDIA_ACCEL_REDIRECT_PREFIX = env(
+    'MEDIA_ACCEL_REDIRECT_PREFIX', default='/protected-media/')
+
+# Weather forecasts are cached (in the default cache) for this long
+WEATHER_CACHE_SECONDS = env.int('WEATHER_CACHE_SECONDS', default=1800)
+
+# Each part of the trip dashboard (recommendations, weather, usage stats)
+# is left out of the response when it takes longer than this
+TRIP_DASHBOARD_PART_TIMEOUT = env.float('TRIP_DASHBOARD_PART_TIMEOUT', default=2.0)
+
+# Serve trip detail, recommendations and the weather forecast with async
+# views; worthwhile under ASGI (backend/asgi.py), not under WSGI
+ASYNC_VIEWS = env.bool('ASYNC_VIEWS', default=False)
+
+# Processes rendering photo thumbnails in the background (0 renders them
+# in the request that saved the photo)
+THUMBNAIL_WORKERS = env.int('THUMBNAIL_WORKERS', default=2)
+
+# Photos are stored by content hash and shared between rows; an
+# unreferenced photo is only deleted once its file is this old, so an
+# upload of the same content that is still being saved keeps it
+MEDIA_RELEASE_GRACE_SECONDS = env.int('MEDIA_RELEASE_GRACE_SECONDS', default=600)
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Coalesce packing status toggles for this many seconds before writing them
+# (0 writes every change immediately). The buffer is per process: changes
+# from the last window are lost if a worker is killed rather than stopped.
+TRIP_GEAR_WRITE_BEHIND_SECONDS = env.float(
+    'TRIP_GEAR_WRITE_BEHIND_SECONDS', default=0)
+
+# Categories and activity types are cached per process; other processes'
+# changes are noticed within REFERENCE_DATA_RECHECK_SECONDS. Clients may
+# cache those responses for REFERENCE_DATA_MAX_AGE seconds.
+REFERENCE_DATA_RECHECK_SECONDS = env.int(
+    'REFERENCE_DATA_RECHECK_SECONDS', default=60)
+REFERENCE_DATA_MAX_AGE = env.int('REFERENCE_DATA_MAX_AGE', default=86400)
+
+# Deleted rows are reported to syncing clients for this many days; older
+# sync cursors get a full resync (see prune_sync_tombstones)
+SYNC_TOMBSTONE_RETENTION_DAYS = env.int(
+    'SYNC_TOMBSTONE_RETENTION_DAYS', default=30)
+
 # External Weather API Configuration (used in trips/services.py)
 OPENWEATHER_API_KEY = env('OPENWEATHER_API_KEY', default='')
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Category, UserGear, Trip, TripGear, GearUsageStats, ActivityType, GearCatalog
+from .services.catalog_search_service import catalog_search_service
 
 
 @admin.register(Category)
@@ -47,4 +48,10 @@ class ActivityTypeAdmin(admin.ModelAdmin):
 class GearCatalogAdmin(admin.ModelAdmin):
     list_display = ['name', 'category', 'typical_weight_grams', 'popularity_score']
     list_filter = ['category']
-    search_fields = ['name', 'description']
\ No newline at end of file
+    search_fields = ['name', 'description']
+
+    def get_search_results(self, request, queryset, search_term):
+        # Use the indexed catalog search instead of icontains scans
+        if not search_term.strip():
+            return queryset, False
+        return catalog_search_service.search(queryset, search_term), False
\ No newline at end of file
@@ -0,0 +1,106 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+from rest_framework.views import APIView
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView with coroutine handlers, for DRF, which has no async views.
+
+    Authentication, permissions, throttling and content negotiation may
+    query the database, so they run through sync_to_async; the handler runs
+    on the event loop and can await the async ORM. Responses are rendered
+    by Django's handler as usual. Under WSGI these views still work, each
+    request running in its own event loop.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(),
+                                  self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def options(self, request, *args, **kwargs):
+        return await sync_to_async(super().options)(request, *args, **kwargs)
+
+
+async def alist(queryset) -> list:
+    """Evaluate a queryset with the async ORM"""
+    return [obj async for obj in queryset]
+
+
+# Process-wide rather than the event loop's default executor: under WSGI
+# each request's loop waits for that one to finish when it shuts down
+_own_threads = ThreadPoolExecutor(thread_name_prefix='async-api')
+
+
+async def run_in_own_thread(func, *args, **kwargs):
+    """
+    Run blocking code (ORM queries included) in a worker thread with its
+    own database connections, closed afterwards.
+
+    The async ORM runs every query on one thread-sensitive executor, so
+    awaiting several of them doesn't overlap them, and a cancelled one
+    still holds up everything queued behind it. Work run here overlaps
+    with other work and with that executor; cancelling it only stops the
+    waiting, the thread finishes on its own. It can't see uncommitted
+    changes of the request's transaction.
+    """
+    def run():
+        try:
+            return func(*args, **kwargs)
+        finally:
+            connections.close_all()
+    return await sync_to_async(
+        run, thread_sensitive=False, executor=_own_threads)()
+
+
+def async_api_view(http_method_names):
+    """
+    @api_view for coroutine functions; combines with DRF's
+    @permission_classes and friends in the same way
+    """
+    def decorator(func):
+        methods = [method.lower() for method in http_method_names]
+        if 'get' in methods and 'head' not in methods:
+            methods.append('head')
+
+        async def handler(self, *args, **kwargs):
+            return await func(*args, **kwargs)
+
+        attrs = {
+            'http_method_names': methods + ['options'],
+            '__doc__': func.__doc__,
+            '__module__': func.__module__,
+        }
+        for setting in ['renderer_classes', 'parser_classes',
+                        'authentication_classes', 'throttle_classes',
+                        'permission_classes']:
+            attrs[setting] = getattr(func, setting, getattr(APIView, setting))
+        for method in methods:
+            attrs[method] = handler
+
+        return type(func.__name__, (AsyncAPIView,), attrs).as_view()
+    return decorator
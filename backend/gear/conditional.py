@@ -0,0 +1,143 @@
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Optional, Tuple
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+
+@dataclass
+class Version:
+    """
+    Cheap fingerprint of what a response would contain.
+
+    `token` must change whenever the serialized output would.
+    `last_modified` is only set where a timestamp alone is enough, i.e.
+    where no row can disappear from the response without a newer
+    timestamp appearing (lists and nested collections don't qualify).
+    """
+    token: Tuple[Any, ...]
+    last_modified: Optional[datetime] = None
+
+
+def aggregate_version(queryset, field: str = 'updated_at') -> Tuple[int, Optional[datetime]]:
+    """Row count and newest timestamp of a queryset, in one query"""
+    result = queryset.order_by().aggregate(rows=Count('pk'), latest=Max(field))
+    return result['rows'], result['latest']
+
+
+class ConditionalGetMixin:
+    """
+    ETag/Last-Modified validators for list and retrieve.
+
+    Views provide get_list_version(rows) and get_object_version(obj);
+    both run before serialization, so a matching If-None-Match (or
+    If-Modified-Since) is answered with 304 without serializing anything.
+    A list's version is taken from the rows of the requested page and the
+    paginator's state (see get_page_version), so validating a page costs
+    no more than reading it: no COUNT or MAX over the whole list.
+
+    Setting list_values_serializer_class (a ValuesSerializer) makes list
+    read plain .values() rows and serialize them with it.
+    """
+    list_values_serializer_class = None
+
+    def get_list_version(self, rows) -> Version:
+        return Version(token=self.get_page_version(rows))
+
+    def get_page_version(self, rows) -> Tuple[Any, ...]:
+        """
+        Fingerprint of a page: each row's (pk, updated_at), or the whole
+        row for .values() rows, plus what the paginator adds (count or
+        whether there is a next page).
+        """
+        paginator_version = getattr(self.paginator, 'get_version_token', None)
+        return (
+            tuple(
+                tuple(row.values()) if isinstance(row, dict) else (row.pk, row.updated_at)
+                for row in rows
+            ),
+            paginator_version() if paginator_version else None,
+        )
+
+    def get_row_ids(self, rows):
+        return [row['id'] if isinstance(row, dict) else row.pk for row in rows]
+
+    def get_object_version(self, obj) -> Version:
+        return Version(token=(obj.pk, obj.updated_at), last_modified=obj.updated_at)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+
+        values_serializer_class = self.get_list_values_serializer_class()
+        if values_serializer_class is not None:
+            queryset = values_serializer_class.prepare_queryset(
+                queryset, self.get_serializer_context())
+            # Meta.ordering isn't applied once annotations add a GROUP BY
+            ordering = getattr(self, 'keyset_ordering', None)
+            if ordering:
+                queryset = queryset.order_by(*ordering)
+
+        page = self.paginate_queryset(queryset)
+        rows = page if page is not None else list(queryset)
+        version = self.get_list_version(rows)
+        not_modified = self.check_not_modified(request, version)
+        if not_modified is not None:
+            return not_modified
+
+        serializer = self.get_list_serializer(rows, values_serializer_class)
+        if page is not None:
+            response = self.get_paginated_response(serializer.data)
+        else:
+            response = Response(serializer.data)
+        return self.add_validators(response, version)
+
+    def get_list_values_serializer_class(self):
+        return self.list_values_serializer_class
+
+    def get_list_serializer(self, rows, values_serializer_class=None):
+        if values_serializer_class is not None:
+            return values_serializer_class(
+                rows, context=self.get_serializer_context())
+        return self.get_serializer(rows, many=True)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        version = self.get_object_version(instance)
+        not_modified = self.check_not_modified(request, version)
+        if not_modified is not None:
+            return not_modified
+
+        serializer = self.get_serializer(instance)
+        return self.add_validators(Response(serializer.data), version)
+
+    def get_etag(self, version: Version) -> str:
+        # The path (with query string) and user are part of the tag so the
+        # same fingerprint never validates a different representation
+        source = repr((
+            self.request.user.pk, self.request.get_full_path(), version.token
+        ))
+        return 'W/"%s"' % hashlib.sha1(source.encode()).hexdigest()
+
+    def check_not_modified(self, request, version: Version):
+        last_modified = version.last_modified
+        response = get_conditional_response(
+            request,
+            etag=self.get_etag(version),
+            last_modified=int(last_modified.timestamp()) if last_modified else None
+        )
+        if response is not None:
+            return self.add_validators(response, version)
+        return None
+
+    def add_validators(self, response, version: Version):
+        response['ETag'] = self.get_etag(version)
+        if version.last_modified:
+            response['Last-Modified'] = http_date(version.last_modified.timestamp())
+        if 'Cache-Control' not in response:
+            # Clients may keep the response but must revalidate it
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
@@ -0,0 +1,101 @@
+from dataclasses import dataclass
+from typing import FrozenSet, Optional
+
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.serializers import ListSerializer
+
+
+@dataclass(frozen=True)
+class FieldSelection:
+    """
+    Which fields a client asked for with `?fields=` and `?expand=`.
+
+    `fields` limits the output to the named fields (None: the serializer's
+    defaults). `expand` adds optional, more expensive fields that aren't
+    part of the defaults, e.g. a trip list's gear_items.
+    """
+    fields: Optional[FrozenSet[str]] = None
+    expand: FrozenSet[str] = frozenset()
+
+    @classmethod
+    def from_request(cls, request) -> 'FieldSelection':
+        # Selections only shape read responses
+        if request is None or request.method not in SAFE_METHODS:
+            return cls()
+        params = request.query_params
+        fields = cls._parse(params.getlist('fields'))
+        return cls(
+            fields=fields if 'fields' in params else None,
+            expand=cls._parse(params.getlist('expand')),
+        )
+
+    @staticmethod
+    def _parse(values) -> FrozenSet[str]:
+        return frozenset(
+            name.strip() for value in values for name in value.split(',')
+            if name.strip()
+        )
+
+    @property
+    def requested(self) -> FrozenSet[str]:
+        return (self.fields or frozenset()) | self.expand
+
+    def wants(self, name: str, default: bool = True) -> bool:
+        """Whether the field is in the output; `default` when not specified"""
+        if name in self.expand:
+            return True
+        if self.fields is None:
+            return default
+        return name in self.fields
+
+
+class SparseFieldsMixin:
+    """
+    Serializer mixin applying the view's FieldSelection (passed in the
+    context as `field_selection`) to the top-level serializer.
+
+    Names in `expandable_fields` are only included when asked for.
+    """
+    expandable_fields = ()
+
+    def get_fields(self):
+        fields = super().get_fields()
+        parent = self.parent
+        if isinstance(parent, ListSerializer):
+            parent = parent.parent
+        if parent is not None:
+            # Nested serializers are shaped by their parent's selection
+            return fields
+
+        selection = self.context.get('field_selection') or FieldSelection()
+        return {
+            name: field for name, field in fields.items()
+            if selection.wants(name, default=name not in self.expandable_fields)
+        }
+
+
+class SparseFieldsViewMixin:
+    """
+    Reads the request's FieldSelection, hands it to serializers and skips
+    the values() list path when it can't produce what was asked for.
+    Views use get_field_selection() to fetch only what is needed.
+    """
+
+    def get_field_selection(self) -> FieldSelection:
+        if not hasattr(self, '_field_selection'):
+            self._field_selection = FieldSelection.from_request(
+                getattr(self, 'request', None))
+        return self._field_selection
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['field_selection'] = self.get_field_selection()
+        return context
+
+    def get_list_values_serializer_class(self):
+        serializer_class = super().get_list_values_serializer_class()
+        if serializer_class is None:
+            return None
+        if not serializer_class.supports(self.get_field_selection()):
+            return None
+        return serializer_class
@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+from gear.services.media_service import media_service
+
+
+class Command(BaseCommand):
+    help = 'Deletes photos, thumbnails and abandoned uploads that no row references'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours', type=float, default=24,
+            help='Keep files written within this many hours (default: 24)')
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Files checked against the database per query')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report what would be deleted')
+
+    def handle(self, *args, **options):
+        report = media_service.collect_garbage(
+            grace=timedelta(hours=options['grace_hours']),
+            chunk_size=max(1, options['chunk_size']),
+            dry_run=options['dry_run'],
+        )
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {report['deleted']} of {report['scanned']} old files, "
+            f"reclaiming {filesizeformat(report['bytes'])}"))
@@ -0,0 +1,64 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from gear.models import UserGear, GearCatalog
+from gear.services.thumbnail_service import (
+    thumbnail_service, _generate_job, _init_worker
+)
+
+
+class Command(BaseCommand):
+    help = 'Generates missing thumbnails for gear and catalog photos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Also redo photos that already have thumbnails')
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Number of worker processes rendering thumbnails')
+
+    def handle(self, *args, **options):
+        models = {model._meta.label: model for model in [UserGear, GearCatalog]}
+        jobs = []
+        for model in models.values():
+            queryset = model.objects.exclude(photo='').exclude(photo__isnull=True)
+            if not options['all']:
+                queryset = queryset.filter(photo_thumbnails={})
+            jobs += [
+                (model._meta.label, pk, name)
+                for pk, name in queryset.values_list('pk', 'photo').iterator()
+            ]
+
+        workers = max(1, options['workers'])
+        self.stdout.write(
+            f'Generating thumbnails for {len(jobs)} photos '
+            f'using {workers} worker(s)...')
+
+        failed = 0
+        if workers == 1:
+            for label, pk, name in jobs:
+                failed += self._run(
+                    lambda: thumbnail_service.generate(models[label], pk, name),
+                    (label, pk, name))
+        else:
+            # Forked workers must not share the parent's open connections
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker
+            ) as pool:
+                futures = {pool.submit(_generate_job, *job): job for job in jobs}
+                for future in as_completed(futures):
+                    failed += self._run(future.result, futures[future])
+
+        self.stdout.write(self.style.SUCCESS(
+            f' Done: {len(jobs) - failed} generated, {failed} failed'))
+
+    def _run(self, call, job):
+        try:
+            call()
+            return 0
+        except Exception as e:
+            self.stderr.write(f'  {job[0]} {job[1]} ({job[2]}): {e}')
+            return 1
@@ -0,0 +1,79 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from gear.models import Trip, GearUsageStats
+
+
+def _init_worker():
+    """Make sure a worker process never reuses the parent's connections"""
+    import django
+    django.setup()
+    connections.close_all()
+
+
+def _rebuild_chunk(user_ids):
+    from gear.services.usage_stats_service import usage_stats_service
+    return usage_stats_service.rebuild_for_users(user_ids)
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds gear usage statistics from completed trip history'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help='Only rebuild stats for this user id (can be repeated)')
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Number of users recomputed per transaction')
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Number of worker processes to spread chunks across')
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids'] or self._get_user_ids()
+        chunk_size = max(1, options['chunk_size'])
+        workers = max(1, options['workers'])
+
+        chunks = [
+            user_ids[i:i + chunk_size]
+            for i in range(0, len(user_ids), chunk_size)
+        ]
+        self.stdout.write(
+            f'Rebuilding usage stats for {len(user_ids)} users '
+            f'in {len(chunks)} chunks using {workers} worker(s)...')
+
+        total = 0
+        if workers == 1:
+            results = map(_rebuild_chunk, chunks)
+            total = self._collect(results, len(chunks))
+        else:
+            # Forked workers must not share the parent's open connections
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker
+            ) as pool:
+                total = self._collect(
+                    pool.map(_rebuild_chunk, chunks), len(chunks))
+
+        self.stdout.write(self.style.SUCCESS(
+            f' Rebuilt {total} usage stats rows'))
+
+    def _collect(self, results, chunk_count):
+        total = 0
+        for done, count in enumerate(results, start=1):
+            total += count
+            self.stdout.write(f'  Chunk {done}/{chunk_count}: {count} rows')
+        return total
+
+    def _get_user_ids(self):
+        """Users with completed trips, plus users holding stats to clear"""
+        user_ids = set(
+            Trip.objects.filter(status='completed')
+            .values_list('user_id', flat=True).distinct()
+        )
+        user_ids.update(
+            GearUsageStats.objects.values_list('user_id', flat=True).distinct()
+        )
+        return sorted(user_ids)
@@ -0,0 +1,133 @@
+import brotli
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_sequence, compress_string
+
+from gear import replicas
+
+
+def _brotli_sequence(sequence, quality):
+    compressor = brotli.Compressor(quality=quality)
+    for item in sequence:
+        data = compressor.process(item)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress responses with brotli or gzip, whichever the client prefers
+    in Accept-Encoding (brotli on a tie).
+
+    Only textual and MessagePack bodies of at least
+    RESPONSE_COMPRESSION_MIN_BYTES are compressed; below that the
+    overhead isn't worth it. Takes the place of Django's GZipMiddleware.
+    """
+
+    # Low quality keeps brotli cheaper than gzip -6 on dynamic responses
+    # while still compressing JSON better
+    BROTLI_QUALITY = 4
+
+    COMPRESSIBLE_TYPES = (
+        'text/',
+        'application/json',
+        'application/msgpack',
+        'application/javascript',
+        'application/xml',
+    )
+
+    @property
+    def min_bytes(self) -> int:
+        return getattr(settings, 'RESPONSE_COMPRESSION_MIN_BYTES', 1024)
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding'):
+            return response
+        if response.status_code < 200 or response.status_code in (204, 206, 304):
+            return response
+        content_type = response.get('Content-Type', '')
+        if not content_type.startswith(self.COMPRESSIBLE_TYPES):
+            return response
+        if response.streaming and response.is_async:
+            return response
+        if not response.streaming and len(response.content) < self.min_bytes:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = self.choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if encoding == 'br':
+                response.streaming_content = _brotli_sequence(
+                    response.streaming_content, self.BROTLI_QUALITY)
+            else:
+                response.streaming_content = compress_sequence(
+                    response.streaming_content)
+            del response['Content-Length']
+        else:
+            if encoding == 'br':
+                compressed = brotli.compress(
+                    response.content, quality=self.BROTLI_QUALITY)
+            else:
+                compressed = compress_string(response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # The representation changed, so a strong ETag no longer matches it
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+
+        response['Content-Encoding'] = encoding
+        return response
+
+    def choose_encoding(self, accept_encoding: str):
+        """'br', 'gzip' or None, by the client's q-values"""
+        qualities = {}
+        for part in accept_encoding.split(','):
+            coding, _, params = part.strip().partition(';')
+            coding = coding.strip().lower()
+            q = 1.0
+            params = params.strip()
+            if params.startswith('q='):
+                try:
+                    q = float(params[2:])
+                except ValueError:
+                    q = 0.0
+            if coding:
+                qualities[coding] = q
+
+        wildcard = qualities.get('*', 0.0)
+        best, best_q = None, 0.0
+        for coding in ('br', 'gzip'):
+            q = qualities.get(coding, wildcard)
+            if q > best_q:
+                best, best_q = coding, q
+        return best
+
+
+class ReplicaPinMiddleware(MiddlewareMixin):
+    """
+    Track database routing per request (see gear.replicas.ReplicaRouter)
+    and pin users who wrote something to the primary for
+    DB_REPLICA_PIN_SECONDS, so their next reads see it.
+
+    The user is the one DRF authenticated, known once the view has run.
+    """
+
+    def process_request(self, request):
+        request._db_routing = replicas.start_request()
+
+    def process_response(self, request, response):
+        state = getattr(request, '_db_routing', None)
+        if state is not None and state.wrote:
+            replicas.pin_to_primary(
+                getattr(request, 'user', None), state.write_delay)
+        replicas.end_request()
+        return response
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.8 on 2026-10-18 23:03
+
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rating_totals(apps, schema_editor):
+    """Seed the running totals (and exact averages) from completed trips"""
+    GearUsageStats = apps.get_model('gear', 'GearUsageStats')
+    TripGear = apps.get_model('gear', 'TripGear')
+
+    totals = {
+        (row['trip__user_id'], row['gear_id']): row
+        for row in TripGear.objects.filter(
+            trip__status='completed', usefulness_rating__isnull=False
+        ).values('trip__user_id', 'gear_id').annotate(
+            rating_sum=Sum('usefulness_rating'),
+            rating_count=Count('usefulness_rating')
+        )
+    }
+
+    to_update = []
+    for stats in GearUsageStats.objects.only(
+            'id', 'user_id', 'gear_id').iterator(chunk_size=2000):
+        row = totals.get((stats.user_id, stats.gear_id))
+        if row:
+            stats.rating_sum = row['rating_sum']
+            stats.rating_count = row['rating_count']
+            stats.avg_usefulness_rating = (
+                Decimal(row['rating_sum']) / row['rating_count']
+            ).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+            to_update.append(stats)
+
+    GearUsageStats.objects.bulk_update(
+        to_update, ['rating_sum', 'rating_count', 'avg_usefulness_rating'],
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gear', '0003_alter_trip_expected_weather'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gearusagestats',
+            name='rating_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='gearusagestats',
+            name='rating_sum',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(
+            backfill_rating_totals, migrations.RunPython.noop),
+    ]
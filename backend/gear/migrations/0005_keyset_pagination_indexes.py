@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 23:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gear', '0004_gearusagestats_rating_sum_rating_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='trip',
+            name='gear_trip_user_id_b39080_idx',
+        ),
+        migrations.AddIndex(
+            model_name='gearcatalog',
+            index=models.Index(fields=['-popularity_score', 'name', 'id'], name='gear_gearca_popular_f17fd0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['user', '-start_date', '-id'], name='gear_trip_user_id_267acb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usergear',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='gear_userge_user_id_d7f8a0_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.8 on 2026-10-18 23:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_tags(apps, schema_editor):
+    GearCatalog = apps.get_model('gear', 'GearCatalog')
+    GearCatalogTag = apps.get_model('gear', 'GearCatalogTag')
+
+    tags = []
+    for item in GearCatalog.objects.only(
+            'id', 'common_activities', 'weather_conditions').iterator():
+        tags += [
+            GearCatalogTag(item_id=item.id, kind='activity', name=name)
+            for name in set(item.common_activities or [])
+        ]
+        tags += [
+            GearCatalogTag(item_id=item.id, kind='weather', name=name)
+            for name in set(item.weather_conditions or [])
+        ]
+    GearCatalogTag.objects.bulk_create(
+        tags, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gear', '0006_updated_at_for_conditional_get'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GearCatalogTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('activity', 'Activity'), ('weather', 'Weather')], max_length=20)),
+                ('name', models.CharField(max_length=100)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tags', to='gear.gearcatalog')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'name', 'item'], name='gear_gearca_kind_1efac4_idx')],
+                'unique_together': {('item', 'kind', 'name')},
+            },
+        ),
+        migrations.RunPython(populate_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.8 on 2026-10-18 23:19
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+FORWARD_SQL = [
+    """
+    CREATE OR REPLACE FUNCTION gear_gearcatalog_search_vector_update()
+    RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('english', coalesce(NEW.name, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(NEW.description, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql;
+    """,
+    """
+    CREATE TRIGGER gear_gearcatalog_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, description ON gear_gearcatalog
+    FOR EACH ROW EXECUTE FUNCTION gear_gearcatalog_search_vector_update();
+    """,
+    # Fire the trigger once for existing rows
+    "UPDATE gear_gearcatalog SET name = name;",
+    """
+    CREATE INDEX gear_gearcatalog_search_vector_gin
+    ON gear_gearcatalog USING gin (search_vector);
+    """,
+    """
+    CREATE INDEX gear_gearcatalog_name_trgm
+    ON gear_gearcatalog USING gin (name gin_trgm_ops);
+    """,
+]
+
+REVERSE_SQL = [
+    "DROP INDEX IF EXISTS gear_gearcatalog_name_trgm;",
+    "DROP INDEX IF EXISTS gear_gearcatalog_search_vector_gin;",
+    "DROP TRIGGER IF EXISTS gear_gearcatalog_search_vector_trigger ON gear_gearcatalog;",
+    "DROP FUNCTION IF EXISTS gear_gearcatalog_search_vector_update();",
+]
+
+
+def run_postgres_only(statements):
+    def run(apps, schema_editor):
+        # Other backends (SQLite in tests) search without these
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gear', '0007_gearcatalogtag'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='gearcatalog',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(
+            run_postgres_only(FORWARD_SQL), run_postgres_only(REVERSE_SQL)),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-18 23:41
+
+from django.contrib.postgres.operations import BtreeGinExtension
+from django.db import migrations
+
+from gear.migrations._helpers import run_postgres_only
+
+
+# The indexed expressions match what Django generates for icontains and
+# istartswith on PostgreSQL: UPPER("column"::text) LIKE UPPER(...)
+FORWARD_SQL = [
+    """
+    CREATE INDEX gear_usergear_search_trgm
+    ON gear_usergear USING gin (
+        user_id,
+        UPPER(name::text) gin_trgm_ops,
+        UPPER(description::text) gin_trgm_ops
+    );
+    """,
+    """
+    CREATE INDEX gear_gearcatalog_name_upper_trgm
+    ON gear_gearcatalog USING gin (UPPER(name::text) gin_trgm_ops);
+    """,
+]
+
+REVERSE_SQL = [
+    "DROP INDEX IF EXISTS gear_gearcatalog_name_upper_trgm;",
+    "DROP INDEX IF EXISTS gear_usergear_search_trgm;",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gear', '0008_gearcatalog_search'),
+    ]
+
+    operations = [
+        # Lets user_id share the GIN index with the trigram columns
+        BtreeGinExtension(),
+        migrations.RunPython(
+            run_postgres_only(FORWARD_SQL), run_postgres_only(REVERSE_SQL)),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.8 on 2026-10-18 23:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gear', '0009_usergear_search_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('gear', 'User gear'), ('trip', 'Trip'), ('trip_gear', 'Trip gear'), ('stats', 'Gear usage statistics')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='gearusagestats',
+            index=models.Index(fields=['user', 'updated_at'], name='gear_gearus_user_id_d2aeae_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['user', 'updated_at'], name='gear_trip_user_id_6ad26a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tripgear',
+            index=models.Index(fields=['trip', 'updated_at'], name='gear_tripge_trip_id_fc5007_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usergear',
+            index=models.Index(fields=['user', 'updated_at'], name='gear_userge_user_id_4f3be6_idx'),
+        ),
+        migrations.AddField(
+            model_name='synctombstone',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='synctombstone',
+            index=models.Index(fields=['user', 'deleted_at'], name='gear_syncto_user_id_23e0d8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='synctombstone',
+            index=models.Index(fields=['deleted_at'], name='gear_syncto_deleted_850509_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 23:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gear', '0010_sync_tombstones_and_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gearcatalog',
+            name='photo_thumbnails',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='usergear',
+            name='photo_thumbnails',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
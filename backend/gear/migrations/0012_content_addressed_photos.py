@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-18 23:46
+
+import gear.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gear', '0011_photo_thumbnails'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='gearcatalog',
+            name='photo',
+            field=models.ImageField(blank=True, db_index=True, null=True, storage=gear.storage.photo_storage, upload_to='catalog_photos/'),
+        ),
+        migrations.AlterField(
+            model_name='usergear',
+            name='photo',
+            field=models.ImageField(blank=True, db_index=True, null=True, storage=gear.storage.photo_storage, upload_to='gear_photos/'),
+        ),
+    ]
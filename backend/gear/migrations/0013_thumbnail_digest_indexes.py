@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-18 23:52
+
+import django.db.models.fields.json
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gear', '0012_content_addressed_photos'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='gearcatalog',
+            index=models.Index(django.db.models.fields.json.KeyTransform('digest', 'photo_thumbnails'), name='gear_catalog_thumb_digest'),
+        ),
+        migrations.AddIndex(
+            model_name='usergear',
+            index=models.Index(django.db.models.fields.json.KeyTransform('digest', 'photo_thumbnails'), name='gear_usergear_thumb_digest'),
+        ),
+    ]
@@ -0,0 +1,13 @@
+"""Shared by migrations; the leading underscore keeps Django's migration
+loader from treating this module as a migration."""
+
+
+def run_postgres_only(statements):
+    """RunPython code executing raw SQL statements on PostgreSQL only"""
+    def run(apps, schema_editor):
+        # Other backends (SQLite in tests) search without these
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
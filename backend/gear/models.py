@@ -1,12 +1,17 @@
 from django.db import models
+from django.db.models.fields.json import KeyTransform
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from .storage import photo_storage
+
 
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
     icon = models.CharField(max_length=50, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name_plural = "Categories"
@@ -16,7 +21,21 @@ class Category(models.Model):
         return self.name
 
 
-class UserGear(models.Model):
+class PhotoMixin:
+    """
+    Remembers the photo a row was loaded with, so the file can be released
+    when it is replaced (see gear/signals.py)
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'photo' in field_names:
+            instance._loaded_photo = values[field_names.index('photo')]
+        return instance
+
+
+class UserGear(PhotoMixin, models.Model):
     user = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name='gear_items')
     name = models.CharField(max_length=200)
@@ -25,7 +44,12 @@ class UserGear(models.Model):
         Category, on_delete=models.SET_NULL, null=True, blank=True)
     weight_grams = models.IntegerField(
         null=True, blank=True, validators=[MinValueValidator(0)])
-    photo = models.ImageField(upload_to='gear_photos/', null=True, blank=True)
+    # Stored by content hash, indexed for media_service's reference counts
+    photo = models.ImageField(
+        upload_to='gear_photos/', storage=photo_storage, db_index=True,
+        null=True, blank=True)
+    # Filled in by thumbnail_service once the current photo's thumbnails exist
+    photo_thumbnails = models.JSONField(default=dict, blank=True, editable=False)
     purchase_date = models.DateField(null=True, blank=True)
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -35,6 +59,14 @@ class UserGear(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['user', 'category']),
+            # Keyset pagination order
+            models.Index(fields=['user', '-created_at', '-id']),
+            # Delta sync
+            models.Index(fields=['user', 'updated_at']),
+            # Thumbnail references, for media garbage collection
+            models.Index(
+                KeyTransform('digest', 'photo_thumbnails'),
+                name='gear_usergear_thumb_digest'),
         ]
 
     def __str__(self):
@@ -81,7 +113,10 @@ class Trip(models.Model):
         ordering = ['-start_date']
         indexes = [
             models.Index(fields=['user', 'status']),
-            models.Index(fields=['user', 'start_date']),
+            # Also serves keyset pagination order
+            models.Index(fields=['user', '-start_date', '-id']),
+            # Delta sync
+            models.Index(fields=['user', 'updated_at']),
         ]
 
     def save(self, *args, **kwargs):
@@ -121,12 +156,15 @@ class TripGear(models.Model):
     notes = models.TextField(blank=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ['trip', 'gear']
         indexes = [
             models.Index(fields=['trip', 'packed']),
             models.Index(fields=['trip', 'used']),
+            # Delta sync
+            models.Index(fields=['trip', 'updated_at']),
         ]
 
     def __str__(self):
@@ -143,6 +181,10 @@ class GearUsageStats(models.Model):
     avg_usefulness_rating = models.DecimalField(
         max_digits=3, decimal_places=2, null=True, blank=True)
 
+    # Running totals behind avg_usefulness_rating
+    rating_sum = models.IntegerField(default=0)
+    rating_count = models.IntegerField(default=0)
+
     # Context-based usage stored as JSON
     usage_by_activity = models.JSONField(default=dict, blank=True, null=True)
     usage_by_weather = models.JSONField(default=dict, blank=True, null=True)
@@ -154,6 +196,10 @@ class GearUsageStats(models.Model):
     class Meta:
         unique_together = ['user', 'gear']
         verbose_name_plural = "Gear usage statistics"
+        indexes = [
+            # Delta sync
+            models.Index(fields=['user', 'updated_at']),
+        ]
 
     def __str__(self):
         return f"Stats for {self.gear.name} ({self.user.username})"
@@ -163,6 +209,7 @@ class ActivityType(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
     typical_gear_categories = models.JSONField(default=list, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['name']
@@ -171,22 +218,118 @@ class ActivityType(models.Model):
         return self.name
 
 
-class GearCatalog(models.Model):
+class GearCatalog(PhotoMixin, models.Model):
     name = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     category = models.ForeignKey(
         Category, on_delete=models.SET_NULL, null=True, blank=True)
     typical_weight_grams = models.IntegerField(null=True, blank=True)
     photo = models.ImageField(
-        upload_to='catalog_photos/', null=True, blank=True)
+        upload_to='catalog_photos/', storage=photo_storage, db_index=True,
+        null=True, blank=True)
+    photo_thumbnails = models.JSONField(default=dict, blank=True, editable=False)
 
     common_activities = models.JSONField(default=list, blank=True)
     weather_conditions = models.JSONField(default=list, blank=True)
 
     popularity_score = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Weighted name/description document, maintained by a database trigger
+    # on PostgreSQL (see migration 0008); unused on other backends
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         ordering = ['-popularity_score', 'name']
+        indexes = [
+            # Keyset pagination order
+            models.Index(fields=['-popularity_score', 'name', 'id']),
+            models.Index(
+                KeyTransform('digest', 'photo_thumbnails'),
+                name='gear_catalog_thumb_digest'),
+        ]
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Keep the indexed tag rows in step with the JSON lists
+        self.sync_tags()
+
+    def sync_tags(self):
+        wanted = {
+            (GearCatalogTag.ACTIVITY, name) for name in self.common_activities or []
+        } | {
+            (GearCatalogTag.WEATHER, name) for name in self.weather_conditions or []
+        }
+        existing = {
+            (tag.kind, tag.name): tag.pk for tag in self.tags.all()
+        }
+
+        stale = [pk for key, pk in existing.items() if key not in wanted]
+        if stale:
+            GearCatalogTag.objects.filter(pk__in=stale).delete()
+        GearCatalogTag.objects.bulk_create(
+            [
+                GearCatalogTag(item=self, kind=kind, name=name)
+                for kind, name in wanted if (kind, name) not in existing
+            ],
+            ignore_conflicts=True
+        )
 
     def __str__(self):
         return self.name
+
+
+class GearCatalogTag(models.Model):
+    """Normalized activity/weather tags of a catalog item, for indexed filtering"""
+    ACTIVITY = 'activity'
+    WEATHER = 'weather'
+    KIND_CHOICES = [
+        (ACTIVITY, 'Activity'),
+        (WEATHER, 'Weather'),
+    ]
+
+    item = models.ForeignKey(
+        GearCatalog, on_delete=models.CASCADE, related_name='tags')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    name = models.CharField(max_length=100)
+
+    class Meta:
+        unique_together = ['item', 'kind', 'name']
+        indexes = [
+            models.Index(fields=['kind', 'name', 'item']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}: {self.name}"
+
+
+class SyncTombstone(models.Model):
+    """
+    Record of a deleted row, so delta sync can tell clients to drop it.
+    Written by the post_delete receivers in gear/signals.py.
+    """
+    GEAR = 'gear'
+    TRIP = 'trip'
+    TRIP_GEAR = 'trip_gear'
+    STATS = 'stats'
+    KIND_CHOICES = [
+        (GEAR, 'User gear'),
+        (TRIP, 'Trip'),
+        (TRIP_GEAR, 'Trip gear'),
+        (STATS, 'Gear usage statistics'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'deleted_at']),
+            # Pruning
+            models.Index(fields=['deleted_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} deleted at {self.deleted_at}"
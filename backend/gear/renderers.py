@@ -0,0 +1,55 @@
+import msgpack
+import orjson
+from rest_framework.parsers import BaseParser
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer producing the same output with orjson.
+
+    Types orjson doesn't handle the way DRF does (datetimes, Decimals,
+    lazy strings, ...) are passed through DRF's JSONEncoder, so responses
+    are unchanged; only the encoding is faster. Indented output for the
+    browsable API and `; indent=` requests still uses the stock renderer.
+    """
+
+    OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = orjson.dumps(data, default=JSONEncoder().default, option=self.OPTIONS)
+        # Escaped by the stock renderer so the output is valid JavaScript
+        return ret.replace(
+            '\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Compact binary alternative to JSON, for clients that ask for it"""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        # Same value conversions as the JSON output
+        return msgpack.packb(data, default=JSONEncoder().default, datetime=False)
+
+
+class MessagePackParser(BaseParser):
+    """Parses MessagePack request bodies"""
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False, strict_map_key=False)
+        except Exception as e:
+            raise ParseError('MessagePack parse error - %s' % e)
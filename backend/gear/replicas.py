@@ -0,0 +1,121 @@
+import math
+import random
+from contextvars import ContextVar
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+class RoutingState:
+    """Per-request routing: whether reads may use a replica, and whether
+    anything was written (after which they may not)"""
+
+    def __init__(self):
+        self.replica_reads = False
+        self.wrote = False
+        # Seconds until the last buffered write actually reaches the primary
+        self.write_delay = 0.0
+
+
+_routing = ContextVar('db_routing', default=None)
+
+
+def start_request() -> RoutingState:
+    state = RoutingState()
+    _routing.set(state)
+    return state
+
+
+def end_request():
+    _routing.set(None)
+
+
+def use_replica(enabled: bool = True):
+    state = _routing.get()
+    if state is not None:
+        state.replica_reads = enabled
+
+
+def use_primary(delay: float = 0):
+    """Send this request's reads to the primary from here on, e.g. inside
+    a transaction whose reads must see its own writes. delay is how long
+    a write made by this request takes to reach the primary, if buffered."""
+    state = _routing.get()
+    if state is not None:
+        state.wrote = True
+        state.write_delay = max(state.write_delay, delay)
+
+
+def _pin_key(user_id: int) -> str:
+    return f'db:pinned:{user_id}'
+
+
+def pin_to_primary(user, delay: float = 0):
+    """Keep the user's reads on the primary until replicas have caught up
+    with what they just wrote (or will write, delay seconds from now)"""
+    if user is not None and user.is_authenticated:
+        cache.set(_pin_key(user.pk), True,
+                  settings.DB_REPLICA_PIN_SECONDS + math.ceil(delay))
+
+
+def is_pinned(user) -> bool:
+    return bool(user is not None and user.is_authenticated
+                and cache.get(_pin_key(user.pk)))
+
+
+class ReplicaRouter:
+    """
+    Reads go to a random DATABASE_REPLICAS alias while the view allows it
+    (see ReplicaReadMixin) and nothing has been written during the request;
+    everything else uses the primary.
+
+    Replicas lag behind, so after a request that wrote something the user
+    is pinned to the primary for DB_REPLICA_PIN_SECONDS (see
+    ReplicaPinMiddleware): they always read their own writes.
+    """
+
+    def db_for_read(self, model, **hints) -> Optional[str]:
+        state = _routing.get()
+        if state is None or not state.replica_reads or state.wrote:
+            return None
+        if not settings.DATABASE_REPLICAS:
+            return None
+        return self.choose_replica(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints) -> Optional[str]:
+        state = _routing.get()
+        if state is not None:
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints) -> bool:
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints) -> bool:
+        # Replicas are migrated by replication
+        return db not in settings.DATABASE_REPLICAS
+
+    def choose_replica(self, replicas) -> str:
+        return random.choice(replicas)
+
+
+class ReplicaReadMixin:
+    """
+    Serve replica_actions from a read replica, unless the user is pinned
+    to the primary after a recent write.
+
+    Authentication happens first, on the primary.
+    """
+    replica_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        if self.action in self.replica_actions and not is_pinned(request.user):
+            use_replica()
+        super().initial(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        # Views run one after another in a batch request
+        use_replica(False)
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -1,9 +1,13 @@
 from rest_framework import serializers
+from rest_framework.utils.serializer_helpers import ReturnList
 from django.contrib.auth.models import User
+from django.db.models import Count, F, Q
 from .models import (
     Category, UserGear, Trip, TripGear, 
     GearUsageStats, ActivityType, GearCatalog
 )
+from .fieldsets import SparseFieldsMixin
+from .services.thumbnail_service import thumbnail_service
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -44,50 +48,110 @@ class ActivityTypeSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description', 'typical_gear_categories']
 
 
-class UserGearSerializer(serializers.ModelSerializer):
+def usage_stats_data(gear):
+    """Serialized usage stats of a gear item with prefetched stats, or None"""
+    stats = gear.gearusagestats_set.all()
+    return GearUsageStatsSerializer(stats[0]).data if stats else None
+
+
+def thumbnail_urls(obj, context):
+    """URLs of the thumbnails of obj.photo, or None while there are none"""
+    return thumbnail_service.urls(obj.photo_thumbnails, context.get('request'))
+
+
+def gear_counts(trip):
+    """(gear_count, packed_count), from prefetched gear_items when available"""
+    prefetched = getattr(trip, '_prefetched_objects_cache', {}).get('gear_items')
+    if prefetched is not None:
+        return len(prefetched), sum(1 for item in prefetched if item.packed)
+    return trip.gear_items.count(), trip.gear_items.filter(packed=True).count()
+
+
+class UserGearSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
+    thumbnails = serializers.SerializerMethodField()
+    usage_stats = serializers.SerializerMethodField()
+    expandable_fields = ('usage_stats',)
     
     class Meta:
         model = UserGear
         fields = [
             'id', 'name', 'description', 'category', 'category_name',
-            'weight_grams', 'photo', 'purchase_date', 'notes',
-            'created_at', 'updated_at'
+            'weight_grams', 'photo', 'thumbnails', 'purchase_date', 'notes',
+            'created_at', 'updated_at', 'usage_stats'
         ]
         read_only_fields = ['created_at', 'updated_at']
 
+    def get_thumbnails(self, obj):
+        return thumbnail_urls(obj, self.context)
+
+    def get_usage_stats(self, obj):
+        return usage_stats_data(obj)
+
     def create(self, validated_data):
         # Automatically set the user from request context
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
 
 
-class UserGearListSerializer(serializers.ModelSerializer):
+class UserGearListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Lighter serializer for list views"""
     category_name = serializers.CharField(source='category.name', read_only=True)
+    thumbnails = serializers.SerializerMethodField()
+    usage_stats = serializers.SerializerMethodField()
+    expandable_fields = ('usage_stats',)
     
     class Meta:
         model = UserGear
-        fields = ['id', 'name', 'category_name', 'weight_grams', 'photo']
+        fields = [
+            'id', 'name', 'category_name', 'weight_grams', 'photo', 'thumbnails',
+            'usage_stats'
+        ]
+
+    def get_thumbnails(self, obj):
+        return thumbnail_urls(obj, self.context)
+
+    def get_usage_stats(self, obj):
+        return usage_stats_data(obj)
 
 
 class TripGearSerializer(serializers.ModelSerializer):
     gear_name = serializers.CharField(source='gear.name', read_only=True)
     gear_photo = serializers.ImageField(source='gear.photo', read_only=True)
+    gear_thumbnails = serializers.SerializerMethodField()
     gear_weight = serializers.IntegerField(source='gear.weight_grams', read_only=True)
     gear_category = serializers.CharField(source='gear.category.name', read_only=True)
     
     class Meta:
         model = TripGear
         fields = [
-            'id', 'gear', 'gear_name', 'gear_photo', 'gear_weight', 'gear_category',
-            'origin', 'packed', 'used', 'quantity', 
-            'usefulness_rating', 'notes', 'created_at'
+            'id', 'gear', 'gear_name', 'gear_photo', 'gear_thumbnails',
+            'gear_weight', 'gear_category', 'origin', 'packed', 'used',
+            'quantity', 'usefulness_rating', 'notes', 'created_at'
         ]
         read_only_fields = ['created_at']
 
+    def get_gear_thumbnails(self, obj):
+        return thumbnail_urls(obj.gear, self.context)
+
+
+class TripGearAddSerializer(serializers.Serializer):
+    """Single gear item to add, as sent to bulk_add_gear"""
+    gear_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, default=1)
+
+
+class TripGearStatusSerializer(serializers.Serializer):
+    """Single packing status change, as sent to bulk_update_gear_status"""
+    gear_id = serializers.IntegerField()
+    packed = serializers.BooleanField(required=False)
+    used = serializers.BooleanField(required=False)
+    usefulness_rating = serializers.IntegerField(
+        required=False, allow_null=True, min_value=1, max_value=5)
+    notes = serializers.CharField(required=False, allow_blank=True)
 
-class TripSerializer(serializers.ModelSerializer):
+
+class TripSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     gear_items = TripGearSerializer(many=True, read_only=True)
     gear_count = serializers.SerializerMethodField()
     packed_count = serializers.SerializerMethodField()
@@ -104,33 +168,60 @@ class TripSerializer(serializers.ModelSerializer):
         read_only_fields = ['duration_days', 'created_at', 'updated_at']
 
     def get_gear_count(self, obj):
-        return obj.gear_items.count()
+        return gear_counts(obj)[0]
 
     def get_packed_count(self, obj):
-        return obj.gear_items.filter(packed=True).count()
+        return gear_counts(obj)[1]
 
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
 
 
-class TripListSerializer(serializers.ModelSerializer):
+class TripListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Lighter serializer for list views"""
     gear_count = serializers.SerializerMethodField()
     packed_count = serializers.SerializerMethodField()
+    gear_items = TripGearSerializer(many=True, read_only=True)
+    expandable_fields = ('gear_items',)
     
     class Meta:
         model = Trip
         fields = [
             'id', 'title', 'location', 'start_date', 'end_date',
-            'duration_days', 'status', 'gear_count', 'packed_count'
+            'duration_days', 'status', 'gear_count', 'packed_count',
+            'gear_items'
         ]
 
     def get_gear_count(self, obj):
-        return obj.gear_items.count()
+        return gear_counts(obj)[0]
 
     def get_packed_count(self, obj):
-        return obj.gear_items.filter(packed=True).count()
+        return gear_counts(obj)[1]
+
+
+class TripSyncSerializer(serializers.ModelSerializer):
+    """Flat trip row for delta sync; gear items are synced separately"""
+
+    class Meta:
+        model = Trip
+        fields = [
+            'id', 'title', 'description', 'location',
+            'start_date', 'end_date', 'duration_days',
+            'activities', 'expected_temp_min', 'expected_temp_max',
+            'expected_weather', 'status', 'created_at', 'updated_at'
+        ]
+
+
+class TripGearSyncSerializer(serializers.ModelSerializer):
+    """Flat trip gear row for delta sync"""
+
+    class Meta:
+        model = TripGear
+        fields = [
+            'id', 'trip', 'gear', 'origin', 'packed', 'used', 'quantity',
+            'usefulness_rating', 'notes', 'created_at', 'updated_at'
+        ]
 
 
 class GearUsageStatsSerializer(serializers.ModelSerializer):
@@ -147,13 +238,166 @@ class GearUsageStatsSerializer(serializers.ModelSerializer):
         read_only_fields = ['updated_at']
 
 
-class GearCatalogSerializer(serializers.ModelSerializer):
+class GearCatalogSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
+    thumbnails = serializers.SerializerMethodField()
     
     class Meta:
         model = GearCatalog
         fields = [
             'id', 'name', 'description', 'category', 'category_name',
-            'typical_weight_grams', 'photo', 'common_activities',
+            'typical_weight_grams', 'photo', 'thumbnails', 'common_activities',
             'weather_conditions', 'popularity_score'
-        ]
\ No newline at end of file
+        ]
+
+    def get_thumbnails(self, obj):
+        return thumbnail_urls(obj, self.context)
+
+
+class ValuesSerializer:
+    """
+    Read-only list serializer working on queryset.values() rows instead of
+    model instances, for hot list endpoints.
+
+    `field_sources` maps each output field to the column it reads, or to
+    an expression annotated under the field's name. Only the selected
+    fields (see FieldSelection) are fetched, so unselected joins and
+    aggregates drop out of the query. The output must match the
+    ModelSerializer the class stands in for.
+    """
+    field_sources = {}
+    # Fetched even when not output, e.g. keyset pagination keys
+    extra_values = ()
+    # Fields left out when None, like a source='related.attr' field
+    omit_if_none = ()
+
+    def __init__(self, instance=None, many=True, context=None, **kwargs):
+        self.instance = instance
+        self.context = context or {}
+        self.field_names = self.selected_fields(self.context)
+
+    @classmethod
+    def supports(cls, selection) -> bool:
+        """False when the selection names fields only the model path has"""
+        return selection.requested <= set(cls.field_sources)
+
+    @classmethod
+    def selected_fields(cls, context):
+        selection = context.get('field_selection')
+        return [
+            name for name in cls.field_sources
+            if selection is None or selection.wants(name)
+        ]
+
+    @classmethod
+    def prepare_queryset(cls, queryset, context=None):
+        values, annotations = list(cls.extra_values), {}
+        for name in cls.selected_fields(context or {}):
+            source = cls.field_sources[name]
+            if isinstance(source, str):
+                values.append(source)
+            else:
+                annotations[name] = source
+        return queryset.values(*values, **annotations)
+
+    @property
+    def data(self):
+        return ReturnList(
+            [self.to_representation(row) for row in self.instance],
+            serializer=self
+        )
+
+    def to_representation(self, row):
+        item = {}
+        for name in self.field_names:
+            source = self.field_sources[name]
+            value = row[source if isinstance(source, str) else name]
+            if value is None:
+                if name in self.omit_if_none:
+                    continue
+            else:
+                represent = getattr(self, 'represent_' + name, None)
+                if represent is not None:
+                    value = represent(value)
+            item[name] = value
+        return item
+
+    def file_url(self, field, name):
+        """What a DRF FileField/ImageField renders for a stored file name"""
+        if not name:
+            return None
+        url = field.storage.url(name)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+
+    def thumbnail_urls(self, thumbnails):
+        return thumbnail_service.urls(thumbnails, self.context.get('request'))
+
+
+class UserGearListValuesSerializer(ValuesSerializer):
+    """Same output as UserGearListSerializer"""
+    field_sources = {
+        'id': 'id',
+        'name': 'name',
+        'category_name': F('category__name'),
+        'weight_grams': 'weight_grams',
+        'photo': 'photo',
+        'thumbnails': 'photo_thumbnails',
+    }
+    extra_values = ('created_at', 'id')
+    omit_if_none = ('category_name',)
+    photo_field = UserGear._meta.get_field('photo')
+
+    def represent_photo(self, value):
+        return self.file_url(self.photo_field, value)
+
+    def represent_thumbnails(self, value):
+        return self.thumbnail_urls(value)
+
+
+class TripListValuesSerializer(ValuesSerializer):
+    """Same output as TripListSerializer, with both counts in the one query"""
+    field_sources = {
+        'id': 'id',
+        'title': 'title',
+        'location': 'location',
+        'start_date': 'start_date',
+        'end_date': 'end_date',
+        'duration_days': 'duration_days',
+        'status': 'status',
+        'gear_count': Count('gear_items'),
+        'packed_count': Count('gear_items', filter=Q(gear_items__packed=True)),
+    }
+    extra_values = ('start_date', 'id')
+
+    def represent_start_date(self, value):
+        return value.isoformat()
+
+    def represent_end_date(self, value):
+        return value.isoformat()
+
+
+class GearCatalogValuesSerializer(ValuesSerializer):
+    """Same output as GearCatalogSerializer"""
+    field_sources = {
+        'id': 'id',
+        'name': 'name',
+        'description': 'description',
+        'category': 'category_id',
+        'category_name': F('category__name'),
+        'typical_weight_grams': 'typical_weight_grams',
+        'photo': 'photo',
+        'thumbnails': 'photo_thumbnails',
+        'common_activities': 'common_activities',
+        'weather_conditions': 'weather_conditions',
+        'popularity_score': 'popularity_score',
+    }
+    extra_values = ('popularity_score', 'name', 'id')
+    omit_if_none = ('category_name',)
+    photo_field = GearCatalog._meta.get_field('photo')
+
+    def represent_photo(self, value):
+        return self.file_url(self.photo_field, value)
+
+    def represent_thumbnails(self, value):
+        return self.thumbnail_urls(value)
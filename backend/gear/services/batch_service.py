@@ -0,0 +1,169 @@
+import json
+import logging
+from io import BytesIO
+from typing import Any, Dict, List, Tuple
+from urllib.parse import urlsplit
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.db import transaction
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework.response import Response
+
+from gear import replicas
+from gear.services.packing_buffer_service import packing_buffer_service
+
+logger = logging.getLogger(__name__)
+
+
+class BatchService:
+    """
+    Runs several API requests inside one HTTP request.
+
+    Sub-requests go through the URL resolver to the usual views, as the
+    user the batch request authenticated as (no per-request token checks).
+    They run in order; with `all_or_nothing`, inside one transaction that
+    is rolled back, skipping the rest, as soon as one fails.
+    """
+
+    MAX_REQUESTS = 20
+    METHODS = {'GET', 'POST', 'PUT', 'PATCH', 'DELETE'}
+    PREFIX = '/api/'
+    # Response headers worth passing back to the client
+    HEADERS = ('ETag', 'Last-Modified', 'Location', 'Cache-Control')
+
+    def execute(self, request, sub_requests: List[Dict],
+                all_or_nothing: bool = False) -> Tuple[List[Dict], bool]:
+        """
+        Returns ([{status, headers, body}, ...], rolled_back).
+        Sub-requests skipped after a failure in an all-or-nothing batch
+        get status 424 (Failed Dependency).
+        """
+        if not all_or_nothing:
+            return [self._run(request, sub) for sub in sub_requests], False
+
+        # Buffered toggles were made before anything in this batch; the
+        # batch's own are written in its transaction, to be rolled back
+        # with it
+        packing_buffer_service.flush(user_id=request.user.id)
+
+        responses = []
+        rolled_back = False
+        with transaction.atomic(), packing_buffer_service.writing_through():
+            # Later requests must read what earlier ones wrote
+            replicas.use_primary()
+            for sub in sub_requests:
+                result = self._run(request, sub)
+                responses.append(result)
+                if result['status'] >= 400:
+                    transaction.set_rollback(True)
+                    rolled_back = True
+                    break
+
+        responses += [
+            self._result(424, {'error': 'Not run: an earlier request failed'})
+            for _ in sub_requests[len(responses):]
+        ]
+        return responses, rolled_back
+
+    def validate(self, sub: Any) -> str:
+        """Why a sub-request can't be run, or '' if it can"""
+        if not isinstance(sub, dict):
+            return 'Each request must be an object'
+        if str(sub.get('method', 'GET')).upper() not in self.METHODS:
+            return f"method must be one of {', '.join(sorted(self.METHODS))}"
+        if not isinstance(sub.get('path'), str):
+            return 'path is required'
+        if not isinstance(sub.get('headers', {}), dict):
+            return 'headers must be an object'
+        return ''
+
+    def _run(self, request, sub: Dict) -> Dict:
+        error = self.validate(sub)
+        if error:
+            return self._result(400, {'error': error})
+
+        path, query = self._split_path(sub['path'])
+        try:
+            match = resolve(path)
+        except Resolver404:
+            return self._result(404, {'error': 'Not found'})
+        if not path.startswith(self.PREFIX) or match.url_name == 'batch':
+            return self._result(400, {'error': 'Only API endpoints can be batched'})
+
+        sub_request = self._build_request(request, sub, path, query)
+        sub_request.resolver_match = match
+        try:
+            if iscoroutinefunction(match.func):
+                response = async_to_sync(match.func)(
+                    sub_request, *match.args, **match.kwargs)
+            else:
+                response = match.func(sub_request, *match.args, **match.kwargs)
+        except Exception:
+            logger.exception('Batched %s %s failed', sub_request.method, path)
+            return self._result(500, {'error': 'Internal server error'})
+
+        return self._result(
+            response.status_code, self._body(response),
+            {name: response[name] for name in self.HEADERS if response.has_header(name)}
+        )
+
+    def _split_path(self, path: str) -> Tuple[str, str]:
+        parts = urlsplit(path)
+        path = parts.path
+        if not path.startswith('/'):
+            # Relative to the API root, e.g. "gear/?page=2"
+            path = self.PREFIX + path
+        return path, parts.query
+
+    def _build_request(self, request, sub: Dict, path: str, query: str) -> HttpRequest:
+        body = b''
+        if sub.get('body') is not None:
+            body = json.dumps(sub['body']).encode()
+
+        sub_request = HttpRequest()
+        sub_request.method = str(sub.get('method', 'GET')).upper()
+        sub_request.path = sub_request.path_info = path
+        sub_request.META = {
+            # Client details, without the batch's own body and headers
+            key: value for key, value in request.META.items()
+            if key.startswith(('REMOTE_', 'SERVER_', 'HTTP_X_FORWARDED_', 'wsgi.url_scheme'))
+            or key in ('HTTP_HOST', 'HTTP_USER_AGENT', 'HTTP_ACCEPT_LANGUAGE')
+        }
+        for name, value in sub.get('headers', {}).items():
+            sub_request.META['HTTP_' + name.upper().replace('-', '_')] = str(value)
+        sub_request.META.update({
+            'REQUEST_METHOD': sub_request.method,
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'HTTP_ACCEPT': 'application/json',
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(body)),
+        })
+        sub_request.GET = QueryDict(query)
+        sub_request._stream = BytesIO(body)
+        sub_request._read_started = False
+
+        # Shared authentication: DRF uses these instead of authenticating
+        sub_request.user = request.user
+        sub_request._force_auth_user = request.user
+        sub_request._force_auth_token = request.auth
+        return sub_request
+
+    def _body(self, response):
+        if isinstance(response, Response):
+            return response.data
+        if hasattr(response, 'render'):
+            response.render()
+        if not response.content:
+            return None
+        if response.get('Content-Type', '').startswith('application/json'):
+            return json.loads(response.content)
+        return response.content.decode(response.charset, 'replace')
+
+    def _result(self, status: int, body, headers=None) -> Dict:
+        return {'status': status, 'headers': headers or {}, 'body': body}
+
+
+# Singleton instance
+batch_service = BatchService()
@@ -0,0 +1,66 @@
+from django.db import connection
+from django.db.models import Case, F, FloatField, IntegerField, Q, Value, When
+from django.db.models.functions import Cast, Greatest, Ln
+
+
+class CatalogSearchService:
+    """
+    Text search over the gear catalog.
+
+    On PostgreSQL this uses the trigger-maintained `search_vector` column
+    (GIN indexed) for full-text matches and the trigram index on `name` for
+    typo tolerance; the score blends both with popularity_score. Other
+    backends (the SQLite test setup) fall back to case-insensitive
+    matching ranked by where the term matched and by popularity.
+    """
+
+    SEARCH_CONFIG = 'english'
+    # How strongly popularity lifts relevance: score * (1 + ln(1 + pop) * w)
+    POPULARITY_WEIGHT = 0.1
+
+    def search(self, queryset, query: str):
+        """Filter queryset to items matching query, best matches first"""
+        query = query.strip()
+        if connection.vendor == 'postgresql':
+            return self._search_postgres(queryset, query)
+        return self._search_fallback(queryset, query)
+
+    def _search_postgres(self, queryset, query):
+        from django.contrib.postgres.search import (
+            SearchQuery, SearchRank, TrigramWordSimilarity
+        )
+
+        text_query = SearchQuery(
+            query, config=self.SEARCH_CONFIG, search_type='websearch')
+        return queryset.annotate(
+            text_rank=SearchRank(F('search_vector'), text_query),
+            similarity=TrigramWordSimilarity(query, 'name'),
+        ).filter(
+            # Both operators (@@ and %>) are served by the GIN indexes;
+            # %> uses pg_trgm.word_similarity_threshold
+            Q(search_vector=text_query) |
+            Q(name__trigram_word_similar=query)
+        ).annotate(
+            score=(F('text_rank') + F('similarity')) * (
+                Value(1.0) + Ln(Cast(
+                    Greatest(F('popularity_score'), Value(0)) + Value(1),
+                    FloatField()
+                )) * Value(self.POPULARITY_WEIGHT)
+            )
+        ).order_by('-score', '-popularity_score', 'id')
+
+    def _search_fallback(self, queryset, query):
+        return queryset.filter(
+            Q(name__icontains=query) | Q(description__icontains=query)
+        ).annotate(
+            score=Case(
+                When(name__istartswith=query, then=Value(3)),
+                When(name__icontains=query, then=Value(2)),
+                default=Value(1),
+                output_field=IntegerField()
+            )
+        ).order_by('-score', '-popularity_score', 'id')
+
+
+# Singleton instance
+catalog_search_service = CatalogSearchService()
@@ -0,0 +1,84 @@
+from typing import Dict, List
+
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from gear.models import UserGear, GearCatalog
+from gear.services.reference_data_service import reference_data_service
+
+
+class GearSearchService:
+    """
+    Autocomplete over a user's own gear, topped up with catalog items.
+
+    Matching is case-insensitive substring matching; PostgreSQL serves it
+    from the trigram GIN indexes on UPPER(name) and UPPER(description)
+    (see migration 0009), which is the exact expression Django emits for
+    icontains/istartswith. Results are ranked by where the term matched:
+    start of the name, start of a later word in the name, anywhere in the
+    name, then the description.
+    """
+
+    DEFAULT_LIMIT = 10
+    MAX_LIMIT = 50
+
+    def autocomplete(self, user, query: str, limit: int = DEFAULT_LIMIT) -> List[Dict]:
+        query = query.strip()
+        limit = max(1, min(limit, self.MAX_LIMIT))
+
+        gear = list(
+            self._ranked(
+                UserGear.objects.filter(user=user), query, with_description=True
+            ).order_by('-score', 'name', 'id').values(
+                'id', 'name', 'category_id', 'weight_grams'
+            )[:limit]
+        )
+        results = [
+            self._result('user', item, item['weight_grams']) for item in gear
+        ]
+        if len(results) >= limit:
+            return results
+
+        # Don't suggest catalog items the user already has under that name
+        owned = {item['name'].lower() for item in gear}
+        catalog = self._ranked(
+            GearCatalog.objects.all(), query
+        ).order_by('-score', '-popularity_score', 'id').values(
+            'id', 'name', 'category_id', 'typical_weight_grams'
+        )[:limit + len(owned)]
+
+        for item in catalog:
+            if len(results) >= limit:
+                break
+            if item['name'].lower() not in owned:
+                results.append(
+                    self._result('catalog', item, item['typical_weight_grams']))
+        return results
+
+    def _ranked(self, queryset, query, with_description=False):
+        word_start = ' ' + query
+        matches = Q(name__icontains=query)
+        if with_description:
+            matches |= Q(description__icontains=query)
+        return queryset.filter(matches).annotate(
+            score=Case(
+                When(name__istartswith=query, then=Value(3)),
+                When(name__icontains=word_start, then=Value(2)),
+                When(name__icontains=query, then=Value(1)),
+                default=Value(0),
+                output_field=IntegerField()
+            )
+        )
+
+    def _result(self, source, item, weight_grams):
+        return {
+            'source': source,
+            'id': item['id'],
+            'name': item['name'],
+            'category': item['category_id'],
+            'category_name': reference_data_service.category_name(item['category_id']),
+            'weight_grams': weight_grams,
+        }
+
+
+# Singleton instance
+gear_search_service = GearSearchService()
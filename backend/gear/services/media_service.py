@@ -0,0 +1,256 @@
+import logging
+import mimetypes
+import os
+import re
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils import timezone
+from django.utils._os import safe_join
+
+from gear.models import GearCatalog, UserGear
+from gear.storage import photo_storage
+
+logger = logging.getLogger(__name__)
+
+
+# A SHA-256 path segment or file name: the content of such a file never
+# changes (photos are named after theirs, thumbnails after their source's)
+CONTENT_ADDRESSED = re.compile(r'(^|/)[0-9a-f]{64}(/|\.|$)')
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+@dataclass(frozen=True)
+class MediaFile:
+    """A file under MEDIA_ROOT, as served by the media view"""
+    name: str
+    path: str
+    size: int
+    modified_ns: int
+    content_type: str
+    immutable: bool
+
+    @property
+    def etag(self) -> str:
+        if self.immutable:
+            return '"%s"' % self.digest
+        return '"%x-%x"' % (self.modified_ns, self.size)
+
+    @property
+    def digest(self) -> str:
+        return re.search(r'[0-9a-f]{64}', self.name).group()
+
+    @property
+    def last_modified(self) -> int:
+        return self.modified_ns // 1_000_000_000
+
+
+class MediaService:
+    """
+    Serving and reference counting of uploaded media.
+
+    Content-addressed files are served as immutable. Rows with identical
+    photos share one file (see gear/storage.py), so a file is only deleted
+    once no UserGear or GearCatalog row references it. The count comes from
+    the rows themselves (the photo columns are indexed), so it can't drift
+    from them through bulk updates or failed transactions.
+    """
+
+    PHOTO_MODELS = (UserGear, GearCatalog)
+    PHOTO_DIRECTORIES = ('gear_photos', 'catalog_photos')
+    THUMBNAIL_DIRECTORY = 'thumbnails'
+    INCOMING_DIRECTORY = '.incoming'
+
+    @property
+    def grace_period(self) -> timedelta:
+        return timedelta(
+            seconds=getattr(settings, 'MEDIA_RELEASE_GRACE_SECONDS', 600))
+
+    def find(self, name: str) -> Optional[MediaFile]:
+        """The servable file at the MEDIA_ROOT-relative `name`, or None"""
+        # Hidden entries are storage internals (e.g. unfinished uploads)
+        if any(part.startswith('.') for part in name.split('/')):
+            return None
+        try:
+            path = safe_join(settings.MEDIA_ROOT, name)
+            stat = os.stat(path)
+        except (SuspiciousFileOperation, OSError, ValueError):
+            return None
+        if not os.path.isfile(path):
+            return None
+
+        content_type, _ = mimetypes.guess_type(path)
+        return MediaFile(
+            name=name,
+            path=path,
+            size=stat.st_size,
+            modified_ns=stat.st_mtime_ns,
+            content_type=content_type or 'application/octet-stream',
+            immutable=bool(CONTENT_ADDRESSED.search(name)),
+        )
+
+    def byte_range(self, header: str, size: int) -> Optional[Tuple[int, int]]:
+        """
+        Inclusive (start, end) of a single-range `Range` header, or None to
+        send the whole file (other units, multiple or malformed ranges).
+        Raises ValueError when the range can't be satisfied.
+        """
+        match = RANGE.match(header.strip())
+        if not match or match.groups() == ('', ''):
+            return None
+        first, last = match.groups()
+        if size == 0:
+            raise ValueError('Empty file')
+
+        if not first:
+            # bytes=-N: the last N bytes
+            if int(last) == 0:
+                raise ValueError('Empty suffix range')
+            return max(size - int(last), 0), size - 1
+
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        if start >= size:
+            raise ValueError('Range starts after the end of the file')
+        end = min(int(last), size - 1) if last else size - 1
+        return start, end
+
+    def reference_count(self, name: str) -> int:
+        return sum(
+            model.objects.filter(photo=name).count() for model in self.PHOTO_MODELS
+        )
+
+    def release(self, name: str) -> bool:
+        """Delete the photo `name` if nothing references it any more"""
+        if not name or self.reference_count(name):
+            return False
+
+        storage = photo_storage()
+        try:
+            modified = storage.get_modified_time(name)
+        except FileNotFoundError:
+            return False
+        # Recently written or reused files may belong to a row that isn't
+        # committed yet; the media garbage collection gets them later
+        if timezone.now() - modified < self.grace_period:
+            return False
+
+        storage.delete(name)
+        logger.info('Deleted unreferenced photo %s', name)
+        return True
+
+    def collect_garbage(self, grace: timedelta, chunk_size: int = 1000,
+                        dry_run: bool = False) -> Dict:
+        """
+        Delete files under MEDIA_ROOT that no row references and that are
+        older than `grace`: photos, thumbnails and abandoned uploads.
+
+        The tree is walked one directory at a time and checked against the
+        database one chunk of files per query, so neither side is loaded
+        whole. Directories left empty are removed.
+        """
+        cutoff = time.time() - grace.total_seconds()
+        report = {'scanned': 0, 'deleted': 0, 'bytes': 0}
+
+        def sweep(files, is_referenced):
+            for chunk in self._chunks(files, chunk_size):
+                report['scanned'] += len(chunk)
+                referenced = is_referenced(chunk)
+                for name, path, size in chunk:
+                    if name not in referenced and self._remove(path, cutoff, dry_run):
+                        report['deleted'] += 1
+                        report['bytes'] += size
+
+        for directory in self.PHOTO_DIRECTORIES:
+            sweep(self._old_files(directory, cutoff), self._referenced_photos)
+        sweep(self._old_files(self.THUMBNAIL_DIRECTORY, cutoff),
+              self._referenced_thumbnails)
+        # Left behind by uploads that died half way
+        sweep(self._old_files(self.INCOMING_DIRECTORY, cutoff), lambda chunk: set())
+
+        if not dry_run:
+            for directory in (*self.PHOTO_DIRECTORIES, self.THUMBNAIL_DIRECTORY):
+                self._remove_empty_directories(os.path.join(settings.MEDIA_ROOT, directory))
+        return report
+
+    def _old_files(self, directory: str, cutoff: float) -> Iterator[Tuple[str, str, int]]:
+        """(name, path, size) of the files under `directory` last written before cutoff"""
+        root = os.path.join(settings.MEDIA_ROOT, directory)
+        pending = [root]
+        while pending:
+            try:
+                entries = os.scandir(pending.pop())
+            except FileNotFoundError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        stat = entry.stat(follow_symlinks=False)
+                        if stat.st_mtime < cutoff:
+                            name = os.path.relpath(entry.path, settings.MEDIA_ROOT)
+                            yield name.replace(os.sep, '/'), entry.path, stat.st_size
+
+    def _referenced_photos(self, chunk: List[Tuple[str, str, int]]) -> Set[str]:
+        names = [name for name, _, _ in chunk]
+        referenced = set()
+        for model in self.PHOTO_MODELS:
+            referenced.update(
+                model.objects.filter(photo__in=names).values_list('photo', flat=True))
+        return referenced
+
+    def _referenced_thumbnails(self, chunk: List[Tuple[str, str, int]]) -> Set[str]:
+        # thumbnails/ab/<digest>/<px>.<format> belongs to rows whose
+        # photo_thumbnails has that digest
+        by_digest = {}
+        for name, _, _ in chunk:
+            parts = name.split('/')
+            if len(parts) == 4:
+                by_digest.setdefault(parts[2], []).append(name)
+
+        referenced = set()
+        for model in self.PHOTO_MODELS:
+            digests = model.objects.filter(
+                photo_thumbnails__digest__in=list(by_digest)
+            ).values_list('photo_thumbnails__digest', flat=True)
+            for digest in digests:
+                referenced.update(by_digest[digest])
+        return referenced
+
+    def _remove(self, path: str, cutoff: float, dry_run: bool) -> bool:
+        try:
+            # Reused by an upload since it was listed
+            if os.stat(path).st_mtime >= cutoff:
+                return False
+            if not dry_run:
+                os.remove(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _remove_empty_directories(self, root: str) -> None:
+        # Bottom up, so parents emptied by their children go too
+        for directory, _, _ in os.walk(root, topdown=False):
+            if directory != root:
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    # Not empty
+                    pass
+
+    def _chunks(self, items: Iterable, size: int) -> Iterator[List]:
+        items = iter(items)
+        while chunk := list(islice(items, size)):
+            yield chunk
+
+
+# Singleton instance
+media_service = MediaService()
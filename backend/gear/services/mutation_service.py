@@ -0,0 +1,274 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+from gear.models import UserGear, Trip, TripGear
+from gear.serializers import (
+    UserGearSerializer, TripSerializer, TripSyncSerializer,
+    TripGearAddSerializer, TripGearStatusSerializer, TripGearSyncSerializer
+)
+from gear.services.packing_buffer_service import packing_buffer_service
+from gear.services.usage_stats_service import usage_stats_service
+
+
+class MutationError(Exception):
+    """An operation that can't be applied; reported in its result"""
+
+    def __init__(self, status: str, error: str, data: Optional[Dict] = None):
+        super().__init__(error)
+        self.status = status
+        self.error = error
+        self.data = data
+
+
+class MutationService:
+    """
+    Applies a queue of mutations recorded by an offline client.
+
+    Operations run in order inside one transaction, each in its own
+    savepoint: one that fails is rolled back on its own and reported,
+    the rest still apply (unless the caller asks for all or nothing).
+
+    An operation looks like
+        {"op": "gear.update", "target": 12, "data": {...},
+         "base_updated_at": "<updated_at the client last saw>"}
+    A base_updated_at older than the row's updated_at is a conflict: the
+    operation is skipped and the result carries the server's row. Create
+    operations may name a client `ref`; later operations can then pass
+    that string wherever an id is expected (target, gear_id).
+    """
+
+    MAX_OPERATIONS = 500
+
+    HANDLERS = {
+        'gear.create': '_gear_create',
+        'gear.update': '_gear_update',
+        'gear.delete': '_gear_delete',
+        'trip.create': '_trip_create',
+        'trip.update': '_trip_update',
+        'trip.delete': '_trip_delete',
+        'trip.complete': '_trip_complete',
+        'trip.add_gear': '_trip_add_gear',
+        'trip.remove_gear': '_trip_remove_gear',
+        'trip.update_gear_status': '_trip_update_gear_status',
+    }
+
+    def apply(self, request, operations: List[Dict], all_or_nothing=False) -> Tuple[List[Dict], bool]:
+        """
+        Apply operations for request.user.
+        Returns the per-operation results and whether everything was
+        rolled back (only with all_or_nothing).
+        """
+        # Buffered toggles were made before anything in this queue
+        packing_buffer_service.flush(user_id=request.user.id)
+
+        refs: Dict[str, int] = {}
+        with transaction.atomic():
+            results = [
+                self._apply_one(request, index, operation, refs)
+                for index, operation in enumerate(operations)
+            ]
+            rolled_back = all_or_nothing and any(
+                result['status'] != 'applied' for result in results)
+            if rolled_back:
+                transaction.set_rollback(True)
+                for result in results:
+                    if result['status'] == 'applied':
+                        result['status'] = 'rolled_back'
+        return results, rolled_back
+
+    def _apply_one(self, request, index, operation, refs) -> Dict[str, Any]:
+        if not isinstance(operation, dict):
+            operation = {}
+        op = operation.get('op')
+        result = {'index': index, 'op': op}
+        handler = self.HANDLERS.get(op)
+        if handler is None:
+            return {**result, 'status': 'error', 'error': 'Unknown operation'}
+
+        try:
+            with transaction.atomic():
+                object_id, data = getattr(self, handler)(request, operation, refs)
+        except MutationError as e:
+            result.update(status=e.status, error=e.error)
+            if e.data is not None:
+                result['data'] = e.data
+            return result
+        except ValidationError as e:
+            return {**result, 'status': 'error', 'errors': e.detail}
+        except ObjectDoesNotExist:
+            return {**result, 'status': 'not_found', 'error': 'Not found'}
+
+        ref = operation.get('ref')
+        if ref and op.endswith('.create'):
+            refs[str(ref)] = object_id
+        return {**result, 'status': 'applied', 'id': object_id, 'data': data}
+
+    # Helpers
+
+    def _resolve(self, value, refs) -> int:
+        """A server id, or a ref named by an earlier create operation"""
+        if isinstance(value, str):
+            if value not in refs:
+                raise MutationError('error', f'Unknown reference: {value}')
+            return refs[value]
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise MutationError('error', 'Expected an id or a reference')
+        return value
+
+    def _data(self, operation, refs) -> Dict:
+        data = operation.get('data') or {}
+        if not isinstance(data, dict):
+            raise MutationError('error', 'data must be an object')
+        if 'gear_id' in data:
+            data = {**data, 'gear_id': self._resolve(data['gear_id'], refs)}
+        return data
+
+    def _check_base(self, operation, row, serialize):
+        base = operation.get('base_updated_at')
+        if not base:
+            return
+        try:
+            base = serializers.DateTimeField().to_internal_value(base)
+        except ValidationError:
+            raise MutationError('error', 'Invalid base_updated_at')
+        if row.updated_at > base:
+            raise MutationError(
+                'conflict', 'Changed on the server since base_updated_at',
+                serialize(row))
+
+    def _gear(self, request, operation, refs) -> UserGear:
+        return UserGear.objects.select_for_update().get(
+            pk=self._resolve(operation.get('target'), refs), user=request.user)
+
+    def _trip(self, request, operation, refs) -> Trip:
+        return Trip.objects.select_for_update().get(
+            pk=self._resolve(operation.get('target'), refs), user=request.user)
+
+    def _trip_gear(self, trip, gear_id) -> TripGear:
+        return TripGear.objects.select_for_update().get(trip=trip, gear_id=gear_id)
+
+    def _gear_data(self, request, gear):
+        return UserGearSerializer(gear, context={'request': request}).data
+
+    def _trip_data(self, trip):
+        return TripSyncSerializer(trip).data
+
+    def _trip_gear_data(self, trip_gear):
+        return TripGearSyncSerializer(trip_gear).data
+
+    # Gear
+
+    def _gear_create(self, request, operation, refs):
+        serializer = UserGearSerializer(
+            data=self._data(operation, refs), context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        gear = serializer.save()
+        return gear.id, self._gear_data(request, gear)
+
+    def _gear_update(self, request, operation, refs):
+        gear = self._gear(request, operation, refs)
+        self._check_base(operation, gear, lambda row: self._gear_data(request, row))
+        serializer = UserGearSerializer(
+            gear, data=self._data(operation, refs), partial=True,
+            context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        gear = serializer.save()
+        return gear.id, self._gear_data(request, gear)
+
+    def _gear_delete(self, request, operation, refs):
+        gear = self._gear(request, operation, refs)
+        self._check_base(operation, gear, lambda row: self._gear_data(request, row))
+        gear_id = gear.id
+        gear.delete()
+        return gear_id, None
+
+    # Trips
+
+    def _trip_create(self, request, operation, refs):
+        serializer = TripSerializer(
+            data=self._data(operation, refs), context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        trip = serializer.save()
+        return trip.id, self._trip_data(trip)
+
+    def _trip_update(self, request, operation, refs):
+        trip = self._trip(request, operation, refs)
+        self._check_base(operation, trip, self._trip_data)
+        serializer = TripSerializer(
+            trip, data=self._data(operation, refs), partial=True,
+            context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        trip = serializer.save()
+        return trip.id, self._trip_data(trip)
+
+    def _trip_delete(self, request, operation, refs):
+        trip = self._trip(request, operation, refs)
+        self._check_base(operation, trip, self._trip_data)
+        trip_id = trip.id
+        trip.delete()
+        return trip_id, None
+
+    def _trip_complete(self, request, operation, refs):
+        trip = self._trip(request, operation, refs)
+        # A replayed completion must not count the trip twice
+        if trip.status == 'completed':
+            raise MutationError(
+                'conflict', 'Trip is already completed', self._trip_data(trip))
+        trip.status = 'completed'
+        trip.save()
+        usage_stats_service.record_trip(trip)
+        return trip.id, self._trip_data(trip)
+
+    # Trip gear
+
+    def _trip_add_gear(self, request, operation, refs):
+        trip = self._trip(request, operation, refs)
+        serializer = TripGearAddSerializer(data=self._data(operation, refs))
+        serializer.is_valid(raise_exception=True)
+        gear_id = serializer.validated_data['gear_id']
+        if not UserGear.objects.filter(id=gear_id, user=request.user).exists():
+            raise MutationError('not_found', 'Gear item not found')
+
+        existing = TripGear.objects.filter(trip=trip, gear_id=gear_id).first()
+        if existing is not None:
+            raise MutationError(
+                'conflict', 'Gear already added to this trip',
+                self._trip_gear_data(existing))
+
+        trip_gear = TripGear.objects.create(
+            trip=trip,
+            gear_id=gear_id,
+            origin='user_added',
+            quantity=serializer.validated_data['quantity']
+        )
+        return trip_gear.id, self._trip_gear_data(trip_gear)
+
+    def _trip_remove_gear(self, request, operation, refs):
+        trip = self._trip(request, operation, refs)
+        data = self._data(operation, refs)
+        trip_gear = self._trip_gear(trip, data.get('gear_id'))
+        self._check_base(operation, trip_gear, self._trip_gear_data)
+        trip_gear_id = trip_gear.id
+        trip_gear.delete()
+        return trip_gear_id, None
+
+    def _trip_update_gear_status(self, request, operation, refs):
+        trip = self._trip(request, operation, refs)
+        serializer = TripGearStatusSerializer(data=self._data(operation, refs))
+        serializer.is_valid(raise_exception=True)
+        changes = dict(serializer.validated_data)
+
+        trip_gear = self._trip_gear(trip, changes.pop('gear_id'))
+        self._check_base(operation, trip_gear, self._trip_gear_data)
+        for field, value in changes.items():
+            setattr(trip_gear, field, value)
+        trip_gear.save()
+        return trip_gear.id, self._trip_gear_data(trip_gear)
+
+
+# Singleton instance
+mutation_service = MutationService()
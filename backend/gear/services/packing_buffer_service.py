@@ -0,0 +1,238 @@
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import DataError, IntegrityError, connections, transaction
+from django.utils import timezone
+
+from gear import replicas
+from gear.models import TripGear
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PendingStatus:
+    """Coalesced, not yet written changes for one TripGear row"""
+    user_id: int
+    trip_gear_id: int
+    changes: Dict[str, Any] = field(default_factory=dict)
+
+
+class PackingBufferService:
+    """
+    Write-behind buffer for packing status toggles.
+
+    Changes to the same (trip, gear) pair are merged in memory and written
+    with a single bulk_update once the window configured by
+    TRIP_GEAR_WRITE_BEHIND_SECONDS has passed. With the window set to 0
+    (the default) every change is written straight away.
+
+    The buffer lives in the process that served the request, so callers
+    flush a user's pending changes before any other read or write of their
+    trips (see TripViewSet.get_queryset), and everything left is flushed
+    when the process exits normally. Changes accepted in the last window
+    are lost if the process is killed (SIGKILL, OOM, a worker recycled
+    without a graceful shutdown): only enable the window where losing a
+    few seconds of toggles is acceptable.
+
+    Changes are validated against the model when they are accepted, so bad
+    data gets a 400 rather than being buffered; rows that still fail when
+    written are logged and dropped so they don't hold up the rest.
+    """
+
+    STATUS_FIELDS = ['packed', 'used', 'usefulness_rating', 'notes']
+    # Errors caused by the changes themselves: retrying won't help
+    DATA_ERRORS = (ValidationError, DataError, IntegrityError, TypeError, ValueError)
+
+    def __init__(self):
+        self._write_through = ContextVar('packing_write_through', default=False)
+        self._pending: Dict[Tuple[int, int], PendingStatus] = {}
+        self._lock = threading.Lock()
+        # Held for a whole flush so that flushes never overtake each other
+        self._flush_lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._exit_hook_registered = False
+
+    @property
+    def window(self) -> float:
+        return float(getattr(settings, 'TRIP_GEAR_WRITE_BEHIND_SECONDS', 0))
+
+    def update(self, trip_gear: TripGear, changes: Dict[str, Any], user_id: int) -> TripGear:
+        """
+        Apply status changes to trip_gear and persist them (now or later).
+
+        The instance is returned with every pending change applied, so it
+        can be serialized as the up-to-date state. Raises ValidationError
+        for changes that couldn't be written.
+        """
+        changes = {
+            name: value for name, value in changes.items()
+            if name in self.STATUS_FIELDS
+        }
+        changes = self._validate(trip_gear, changes)
+
+        if self.window <= 0 or self._write_through.get():
+            for name, value in changes.items():
+                setattr(trip_gear, name, value)
+            trip_gear.save()
+            return trip_gear
+
+        key = (trip_gear.trip_id, trip_gear.gear_id)
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._pending[key] = PendingStatus(
+                    user_id=user_id, trip_gear_id=trip_gear.id)
+            pending.changes.update(changes)
+            merged = dict(pending.changes)
+            self._schedule_flush()
+
+        # The write reaches the primary up to a window later; keep the user
+        # reading from it until replicas have that too
+        replicas.use_primary(delay=self.window)
+
+        for name, value in merged.items():
+            setattr(trip_gear, name, value)
+        return trip_gear
+
+    @contextmanager
+    def writing_through(self):
+        """
+        Write changes immediately inside the block: buffered changes would
+        outlive a rollback of the transaction they were made in.
+        """
+        token = self._write_through.set(True)
+        try:
+            yield
+        finally:
+            self._write_through.reset(token)
+
+    def _validate(self, trip_gear: TripGear, changes: Dict[str, Any]) -> Dict[str, Any]:
+        """The changes converted to the fields' types, or ValidationError"""
+        candidate = TripGear(pk=trip_gear.pk, trip_id=trip_gear.trip_id,
+                             gear_id=trip_gear.gear_id, **changes)
+        candidate.clean_fields(exclude=[
+            f.name for f in TripGear._meta.fields if f.name not in changes
+        ])
+        return {name: getattr(candidate, name) for name in changes}
+
+    def has_pending(self, user_id: Optional[int] = None) -> bool:
+        with self._lock:
+            if user_id is None:
+                return bool(self._pending)
+            return any(p.user_id == user_id for p in self._pending.values())
+
+    def flush(self, user_id: Optional[int] = None) -> int:
+        """
+        Write pending changes (only those of user_id if given).
+        Returns the number of rows written.
+        """
+        with self._flush_lock:
+            with self._lock:
+                keys = [
+                    key for key, pending in self._pending.items()
+                    if user_id is None or pending.user_id == user_id
+                ]
+                batch = {key: self._pending.pop(key) for key in keys}
+
+            if not batch:
+                return 0
+
+            try:
+                return self._write(batch)
+            except self.DATA_ERRORS:
+                return self._write_each(batch)
+            except Exception:
+                logger.exception(
+                    'Failed to flush %d buffered packing changes', len(batch))
+                self._requeue(batch)
+                raise
+
+    def _write_each(self, batch: Dict[Tuple[int, int], PendingStatus]) -> int:
+        """Write a batch that failed on its data row by row, dropping the
+        rows that can't be written so they don't hold up the others"""
+        written = 0
+        keys = list(batch)
+        for index, key in enumerate(keys):
+            try:
+                written += self._write({key: batch[key]})
+            except self.DATA_ERRORS:
+                logger.exception(
+                    'Dropped buffered packing changes %r for trip gear %d',
+                    batch[key].changes, batch[key].trip_gear_id)
+            except Exception:
+                logger.exception(
+                    'Failed to flush %d buffered packing changes',
+                    len(keys) - index)
+                self._requeue({key: batch[key] for key in keys[index:]})
+                raise
+        return written
+
+    def _write(self, batch: Dict[Tuple[int, int], PendingStatus]) -> int:
+        changes_by_id = {
+            pending.trip_gear_id: pending.changes for pending in batch.values()
+        }
+
+        with transaction.atomic():
+            rows = list(
+                TripGear.objects.select_for_update()
+                .filter(id__in=changes_by_id.keys())
+                .order_by('id')
+            )
+            fields = set()
+            now = timezone.now()
+            for row in rows:
+                for name, value in changes_by_id[row.id].items():
+                    setattr(row, name, value)
+                    fields.add(name)
+                # bulk_update() bypasses save(), so auto_now isn't applied
+                row.updated_at = now
+
+            if fields:
+                TripGear.objects.bulk_update(
+                    rows, sorted(fields) + ['updated_at'])
+
+        return len(rows)
+
+    def _requeue(self, batch: Dict[Tuple[int, int], PendingStatus]) -> None:
+        """Put a failed batch back without overriding newer changes"""
+        with self._lock:
+            for key, pending in batch.items():
+                newer = self._pending.get(key)
+                if newer is not None:
+                    pending.changes.update(newer.changes)
+                self._pending[key] = pending
+            self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        """Start the flush timer if it isn't running (caller holds _lock)"""
+        if not self._exit_hook_registered:
+            atexit.register(self.flush)
+            self._exit_hook_registered = True
+
+        if self._timer is None:
+            self._timer = threading.Timer(self.window, self._flush_from_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_from_timer(self) -> None:
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        except Exception:
+            pass  # already logged and requeued
+        finally:
+            # The timer thread opened its own connection; don't leak it
+            connections.close_all()
+
+
+# Singleton instance
+packing_buffer_service = PackingBufferService()
@@ -1,7 +1,14 @@
+import asyncio
 from typing import List, Dict, Any, Optional, Callable
 from dataclasses import dataclass
 
-from gear.models import Trip, UserGear, GearCatalog, Category, GearUsageStats
+from asgiref.sync import sync_to_async
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from gear.async_api import alist
+from gear.models import Trip, UserGear, GearCatalog, GearUsageStats
+from gear.services.reference_data_service import reference_data_service
 import logging
        
 
@@ -18,7 +25,10 @@ class RecommendationRule:
 
 class RecommendationService:
     """Service for generating personalized gear recommendations"""
-    
+
+    # Catalog items suggested per category the user has no gear in
+    CATALOG_ITEMS = 2
+
     def __init__(self):
         self.rules = self._initialize_rules()
 
@@ -255,33 +265,60 @@ class RecommendationService:
         Returns:
             List of recommendation dictionaries
         """
+        return self.build_recommendations(
+            trip,
+            user_gear=list(UserGear.objects.filter(user_id=user_id)),
+            usage_stats=list(GearUsageStats.objects.filter(user_id=user_id)),
+            catalog_items=list(self._catalog_queryset(trip)),
+        )
+
+    async def agenerate_recommendations(
+        self,
+        trip: Trip,
+        user_id: int
+    ) -> List[Dict[str, Any]]:
+        """
+        generate_recommendations() for async views. The loads are gathered,
+        but the async ORM runs them one at a time on the thread-sensitive
+        executor: this frees the event loop, it doesn't overlap queries.
+        """
+        catalog_queryset = await sync_to_async(self._catalog_queryset)(trip)
+        user_gear, usage_stats, catalog_items = await asyncio.gather(
+            alist(UserGear.objects.filter(user_id=user_id)),
+            alist(GearUsageStats.objects.filter(user_id=user_id)),
+            alist(catalog_queryset),
+        )
+        return await sync_to_async(self.build_recommendations)(
+            trip, user_gear, usage_stats, catalog_items)
+
+    def build_recommendations(
+        self,
+        trip: Trip,
+        user_gear: List[UserGear],
+        usage_stats: List[GearUsageStats],
+        catalog_items: List[GearCatalog]
+    ) -> List[Dict[str, Any]]:
+        """Recommendations from the user's gear and stats and the catalog's top items"""
         logger = logging.getLogger(__name__)
-        
+
         logger.info(
-            f"Generating recommendations for trip {trip.id}, user {user_id}")
+            f"Generating recommendations for trip {trip.id}, "
+            f"{len(user_gear)} gear items, {len(usage_stats)} usage stats")
         recommendations = []
 
         # Get user's gear grouped by category
-        user_gear = UserGear.objects.filter(user_id=user_id)
-        logger.info(f"Found {user_gear.count()} gear items for user")
         user_gear_by_category = self._group_by_category(user_gear)
 
-        # Get usage stats for personalization
-        usage_stats = GearUsageStats.objects.filter(user_id=user_id)
-
-        logger.info(f"Found {usage_stats.count()} usage stats")
-
-        for rule in self.rules:
-            # Check if rule condition is met
-            if rule.condition and not rule.condition(trip):
-                continue
+        catalog_by_category = {}
+        for item in catalog_items:
+            catalog_by_category.setdefault(item.category_id, []).append(item)
 
+        for rule in self._applicable_rules(trip):
             quantity = rule.quantity(trip) if rule.quantity else 1
 
             # Get category object
-            try:
-                category = Category.objects.get(name=rule.category)
-            except Category.DoesNotExist:
+            category = reference_data_service.category_by_name(rule.category)
+            if category is None:
                 # If category doesn't exist, create a generic recommendation
                 recommendations.append(self._create_suggestion_recommendation(
                     rule, trip, quantity
@@ -293,11 +330,9 @@ class RecommendationService:
             if not category_gear:
                 # User doesn't have items in this category
                 # Recommend from catalog
-                catalog_items = GearCatalog.objects.filter(
-                    category=category
-                ).order_by('-popularity_score')[:2]
+                category_catalog = catalog_by_category.get(category.id, [])
 
-                if catalog_items:
+                if category_catalog:
                     recommendations.append({
                         'category': rule.category,
                         'category_id': category.id,
@@ -309,7 +344,7 @@ class RecommendationService:
                                 'weight': item.typical_weight_grams,
                                 'source': 'catalog'
                             }
-                            for item in catalog_items
+                            for item in category_catalog
                         ],
                         'reason': self._get_reason_for_recommendation(rule, trip),
                         'quantity': quantity,
@@ -355,11 +390,36 @@ class RecommendationService:
 
         return recommendations
 
+    def _applicable_rules(self, trip: Trip) -> List[RecommendationRule]:
+        return [
+            rule for rule in self.rules
+            if not rule.condition or rule.condition(trip)
+        ]
+
+    def _catalog_queryset(self, trip: Trip):
+        """The CATALOG_ITEMS most popular catalog items of each rule category"""
+        category_ids = [
+            category.id for category in (
+                reference_data_service.category_by_name(rule.category)
+                for rule in self._applicable_rules(trip)
+            )
+            if category is not None
+        ]
+        # One query instead of one per category
+        return GearCatalog.objects.filter(category_id__in=category_ids).annotate(
+            rank=Window(
+                RowNumber(),
+                partition_by=F('category_id'),
+                order_by=[F('popularity_score').desc(), F('id')]
+            )
+        ).filter(rank__lte=self.CATALOG_ITEMS).order_by('category_id', 'rank')
+
     def _group_by_category(self, gear_queryset) -> Dict[str, List[UserGear]]:
         """Group gear items by category name"""
         result = {}
         for item in gear_queryset:
-            category_name = item.category.name if item.category else 'Uncategorized'
+            category_name = reference_data_service.category_name(
+                item.category_id) or 'Uncategorized'
             if category_name not in result:
                 result[category_name] = []
             result[category_name].append(item)
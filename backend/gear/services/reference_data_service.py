@@ -0,0 +1,126 @@
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional, Tuple, Type
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, models
+from django.db.models import Count, Max
+
+from gear.models import Category, ActivityType
+from gear.renderers import ORJSONRenderer
+from gear.serializers import CategorySerializer, ActivityTypeSerializer
+
+
+@dataclass(frozen=True)
+class ReferenceSnapshot:
+    """Immutable, fully serialized copy of a small reference table"""
+    version: str
+    last_modified: Optional[datetime]
+    by_id: Dict[int, models.Model]
+    id_by_name: Dict[str, int]
+    # Rendered JSON of each row, in the table's order
+    detail_bytes: Dict[int, bytes]
+
+
+class ReferenceDataService:
+    """
+    Process-wide cache for categories and activity types.
+
+    Each table is loaded once into a ReferenceSnapshot holding lookup maps
+    and pre-rendered JSON for the list and detail endpoints. Saves and
+    deletes in this process drop the snapshot immediately (see
+    gear/signals.py); changes made by other processes are picked up by
+    re-checking the table fingerprint at most every
+    REFERENCE_DATA_RECHECK_SECONDS.
+
+    Snapshots are shared by every user, so they are always loaded from the
+    primary: one built from a lagging replica would hide a user's own
+    changes from them.
+    """
+
+    SERIALIZERS = {
+        Category: CategorySerializer,
+        ActivityType: ActivityTypeSerializer,
+    }
+
+    def __init__(self):
+        self._snapshots: Dict[Type[models.Model], ReferenceSnapshot] = {}
+        self._checked_at: Dict[Type[models.Model], float] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def recheck_seconds(self) -> float:
+        return float(getattr(settings, 'REFERENCE_DATA_RECHECK_SECONDS', 60))
+
+    def categories(self) -> ReferenceSnapshot:
+        return self.get_snapshot(Category)
+
+    def activities(self) -> ReferenceSnapshot:
+        return self.get_snapshot(ActivityType)
+
+    def category_by_name(self, name: str) -> Optional[Category]:
+        snapshot = self.categories()
+        category_id = snapshot.id_by_name.get(name)
+        return snapshot.by_id.get(category_id) if category_id else None
+
+    def category_name(self, category_id: Optional[int]) -> Optional[str]:
+        category = self.categories().by_id.get(category_id)
+        return category.name if category else None
+
+    def get_snapshot(self, model: Type[models.Model]) -> ReferenceSnapshot:
+        snapshot = self._snapshots.get(model)
+        checked_at = self._checked_at.get(model, 0)
+        if snapshot is not None and time.monotonic() - checked_at < self.recheck_seconds:
+            return snapshot
+
+        with self._lock:
+            fingerprint = self._fingerprint(model)
+            snapshot = self._snapshots.get(model)
+            if snapshot is None or snapshot.version != fingerprint[0]:
+                snapshot = self._build(model, *fingerprint)
+                self._snapshots[model] = snapshot
+            self._checked_at[model] = time.monotonic()
+            return snapshot
+
+    def invalidate(self, model: Optional[Type[models.Model]] = None) -> None:
+        with self._lock:
+            if model is None:
+                self._snapshots.clear()
+                self._checked_at.clear()
+            else:
+                self._snapshots.pop(model, None)
+                self._checked_at.pop(model, None)
+
+    def _fingerprint(self, model) -> Tuple[str, Optional[datetime]]:
+        result = model.objects.using(DEFAULT_DB_ALIAS).aggregate(
+            rows=Count('pk'), latest=Max('updated_at'), top=Max('pk'))
+        latest = result['latest']
+        version = '%s-%s-%s' % (
+            result['rows'], result['top'],
+            latest.isoformat() if latest else ''
+        )
+        return version, latest
+
+    def _build(self, model, version, last_modified) -> ReferenceSnapshot:
+        serializer_class = self.SERIALIZERS[model]
+        renderer = ORJSONRenderer()
+
+        objects = list(model.objects.using(DEFAULT_DB_ALIAS))
+        items = serializer_class(objects, many=True).data
+
+        return ReferenceSnapshot(
+            version=version,
+            last_modified=last_modified,
+            by_id={obj.pk: obj for obj in objects},
+            id_by_name={obj.name: obj.pk for obj in objects},
+            detail_bytes={
+                obj.pk: renderer.render(item)
+                for obj, item in zip(objects, items)
+            },
+        )
+
+
+# Singleton instance
+reference_data_service = ReferenceDataService()
@@ -0,0 +1,97 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from gear.models import UserGear, Trip, TripGear, GearUsageStats, SyncTombstone
+from gear.serializers import (
+    UserGearSerializer, TripSyncSerializer, TripGearSyncSerializer,
+    GearUsageStatsSerializer
+)
+from gear.services.packing_buffer_service import packing_buffer_service
+
+
+class SyncService:
+    """
+    Delta sync of a user's gear, trips, trip gear and usage statistics.
+
+    A cursor is the server time at which the previous sync started. The
+    next sync returns every row with updated_at (and every tombstone with
+    deleted_at) at or after the cursor, less CURSOR_OVERLAP so that rows
+    written by transactions that were still open at that moment aren't
+    missed. Clients apply rows as upserts by id, so the overlap is
+    harmless. No cursor, or one older than the tombstone retention, gets a
+    full snapshot flagged with `full: true`.
+    """
+
+    CURSOR_OVERLAP = timedelta(seconds=5)
+
+    @property
+    def retention(self) -> timedelta:
+        return timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_RETENTION_DAYS', 30))
+
+    def changes(self, user, since: Optional[datetime], context=None) -> Dict:
+        now = timezone.now()
+        full = since is None or since < now - self.retention
+
+        # Buffered packing toggles must not be skipped by the next cursor
+        packing_buffer_service.flush(user_id=user.id)
+
+        sources = {
+            SyncTombstone.GEAR: (
+                UserGear.objects.filter(user=user).select_related('category'),
+                UserGearSerializer
+            ),
+            SyncTombstone.TRIP: (
+                Trip.objects.filter(user=user),
+                TripSyncSerializer
+            ),
+            SyncTombstone.TRIP_GEAR: (
+                TripGear.objects.filter(trip__user=user),
+                TripGearSyncSerializer
+            ),
+            SyncTombstone.STATS: (
+                GearUsageStats.objects.filter(user=user).select_related('gear'),
+                GearUsageStatsSerializer
+            ),
+        }
+
+        deleted = {kind: [] for kind in sources}
+        if not full:
+            lower = since - self.CURSOR_OVERLAP
+            tombstones = SyncTombstone.objects.filter(
+                user=user, deleted_at__gte=lower
+            ).values_list('kind', 'object_id').order_by('deleted_at', 'id')
+            for kind, object_id in tombstones:
+                deleted[kind].append(object_id)
+
+        result = {'cursor': self.encode_cursor(now), 'full': full}
+        for kind, (queryset, serializer_class) in sources.items():
+            if not full:
+                queryset = queryset.filter(updated_at__gte=lower)
+            result[kind] = {
+                'updated': serializer_class(
+                    queryset.order_by('id'), many=True, context=context).data,
+                'deleted': deleted[kind],
+            }
+        return result
+
+    def encode_cursor(self, moment: datetime) -> str:
+        return urlsafe_b64encode(moment.isoformat().encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor: str) -> datetime:
+        """Raises ValueError for anything that isn't a cursor we issued"""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            moment = datetime.fromisoformat(urlsafe_b64decode(padded.encode()).decode())
+        except (TypeError, UnicodeDecodeError, ValueError) as e:
+            raise ValueError('Invalid cursor') from e
+        if timezone.is_naive(moment):
+            raise ValueError('Invalid cursor')
+        return moment
+
+
+# Singleton instance
+sync_service = SyncService()
@@ -0,0 +1,173 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import Dict, Optional
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+
+def _init_worker():
+    """Worker processes are spawned, so they need their own Django setup"""
+    import django
+    django.setup()
+    connections.close_all()
+
+
+def _generate_job(model_label, pk, name):
+    from gear.services.thumbnail_service import thumbnail_service
+    try:
+        return thumbnail_service.generate(apps.get_model(model_label), pk, name)
+    finally:
+        connections.close_all()
+
+
+class ThumbnailService:
+    """
+    Resized WebP and JPEG copies of gear and catalog photos.
+
+    Thumbnails are named after the SHA-256 of the source image
+    (thumbnails/ab/abcd.../<px>.<ext>), so identical uploads share them and
+    existing files are never rendered twice. Work is queued when a photo
+    changes (see gear/signals.py) and runs in a pool of THUMBNAIL_WORKERS
+    processes; with 0 workers it runs inline. When done, the row's
+    photo_thumbnails records the files for the photo they were made from.
+    Thumbnails live in the default storage; photos are read from their
+    field's storage.
+    """
+
+    # Longest side in pixels
+    SIZES = {'small': 160, 'medium': 480, 'large': 960}
+    FORMATS = {
+        'webp': ('WEBP', {'quality': 80, 'method': 4}),
+        'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+    }
+    DIRECTORY = 'thumbnails'
+
+    def __init__(self):
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def workers(self) -> int:
+        return int(getattr(settings, 'THUMBNAIL_WORKERS', 2))
+
+    def schedule(self, model, pk: int, name: str) -> None:
+        """Generate thumbnails for the photo `name` of a saved row"""
+        if self.workers <= 0:
+            try:
+                self.generate(model, pk, name)
+            except Exception:
+                logger.exception('Failed to generate thumbnails for %s', name)
+            return
+
+        future = self._get_pool().submit(_generate_job, model._meta.label, pk, name)
+        future.add_done_callback(self._log_failure(name))
+
+    def generate(self, model, pk: int, name: str) -> Dict:
+        """Render missing thumbnails and record them on the row"""
+        with model._meta.get_field('photo').storage.open(name, 'rb') as source:
+            data = source.read()
+        digest = hashlib.sha256(data).hexdigest()
+
+        sizes = {}
+        image = None
+        # Largest first, each size resized from the previous one
+        for size, pixels in sorted(self.SIZES.items(), key=lambda item: -item[1]):
+            paths = {
+                fmt: self.path(digest, pixels, fmt) for fmt in self.FORMATS
+            }
+            missing = [fmt for fmt, path in paths.items() if not self._reuse(path)]
+            if missing:
+                if image is None:
+                    image = self._open(data, max(self.SIZES.values()))
+                image = image.copy()
+                image.thumbnail((pixels, pixels), Image.LANCZOS)
+                for fmt in missing:
+                    paths[fmt] = default_storage.save(paths[fmt], self._encode(image, fmt))
+            sizes[size] = paths
+
+        thumbnails = {'source': name, 'digest': digest, 'sizes': sizes}
+        # Only if the row still has this photo
+        model.objects.filter(pk=pk, photo=name).update(
+            photo_thumbnails=thumbnails, updated_at=timezone.now())
+        return thumbnails
+
+    def _reuse(self, path: str) -> bool:
+        """
+        Whether an existing thumbnail can be used. Its mtime is refreshed
+        so collect_media_garbage, which only removes old files, keeps it
+        until the row recording it is saved.
+        """
+        try:
+            os.utime(default_storage.path(path))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def path(self, digest: str, pixels: int, fmt: str) -> str:
+        return f'{self.DIRECTORY}/{digest[:2]}/{digest}/{pixels}.{fmt}'
+
+    def urls(self, thumbnails: Dict, request=None) -> Optional[Dict]:
+        """{size: {format: url}} for a photo_thumbnails value, or None"""
+        if not thumbnails:
+            return None
+        result = {}
+        for size, paths in thumbnails['sizes'].items():
+            result[size] = {}
+            for fmt, path in paths.items():
+                url = default_storage.url(path)
+                result[size][fmt] = request.build_absolute_uri(url) if request else url
+        return result
+
+    def _open(self, data: bytes, pixels: int) -> Image.Image:
+        image = Image.open(BytesIO(data))
+        # Let the JPEG decoder scale down while decoding
+        image.draft('RGB', (pixels, pixels))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+        return image
+
+    def _encode(self, image: Image.Image, fmt: str) -> ContentFile:
+        pil_format, options = self.FORMATS[fmt]
+        if pil_format == 'JPEG' and image.mode != 'RGB':
+            image = image.convert('RGB')
+        buffer = BytesIO()
+        image.save(buffer, pil_format, **options)
+        return ContentFile(buffer.getvalue())
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # Spawned, not forked: the server process has threads and
+                # open connections a fork would inherit
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker
+                )
+            return self._pool
+
+    def _log_failure(self, name):
+        def callback(future):
+            error = future.exception()
+            if error is not None:
+                logger.error(
+                    'Failed to generate thumbnails for %s', name, exc_info=error)
+        return callback
+
+
+# Singleton instance
+thumbnail_service = ThumbnailService()
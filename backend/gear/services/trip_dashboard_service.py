@@ -0,0 +1,125 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from gear.async_api import alist, run_in_own_thread
+from gear.models import GearUsageStats, Trip, TripGear
+from gear.serializers import GearUsageStatsSerializer, TripSerializer
+from gear.services.packing_buffer_service import packing_buffer_service
+from gear.services.recommendation_service import recommendation_service
+from gear.services.weather_service import weather_service
+
+logger = logging.getLogger(__name__)
+
+
+class TripDashboardService:
+    """
+    Everything the trip screen shows, in one response: the trip with its
+    gear items, checklist counts, recommendations, the (cached) weather
+    forecast and usage stats of the trip's gear.
+
+    Recommendations, weather and usage stats are optional: one that fails
+    or takes longer than TRIP_DASHBOARD_PART_TIMEOUT seconds is null and
+    listed in `unavailable`, so the client can fetch it from its own
+    endpoint. Each runs in a thread of its own (run_in_own_thread), so
+    they overlap with each other and with the trip's own loads, and one
+    that times out doesn't delay the response: it is left to finish in
+    the background.
+    """
+
+    OPTIONAL_PARTS = ('recommendations', 'weather', 'usage_stats')
+
+    @property
+    def part_timeout(self) -> float:
+        return getattr(settings, 'TRIP_DASHBOARD_PART_TIMEOUT', 2.0)
+
+    async def build(self, user, trip_id: int, context: Dict) -> Optional[Dict]:
+        """The dashboard of one of the user's trips, or None if there is none"""
+        # Buffered packing changes belong in the checklist
+        await sync_to_async(packing_buffer_service.flush)(user_id=user.id)
+        try:
+            trip = await Trip.objects.aget(pk=trip_id, user=user)
+        except Trip.DoesNotExist:
+            return None
+
+        gear_items, *parts = await asyncio.gather(
+            alist(TripGear.objects.filter(trip=trip).select_related('gear__category')),
+            self._optional('recommendations', run_in_own_thread(
+                recommendation_service.generate_recommendations, trip, user.id)),
+            self._optional('weather', self._weather(trip)),
+            self._optional('usage_stats', run_in_own_thread(
+                self._usage_stats, trip, context)),
+        )
+
+        trip._prefetched_objects_cache = {'gear_items': gear_items}
+        trip_data = await sync_to_async(
+            lambda: TripSerializer(trip, context=context).data)()
+
+        dashboard = {
+            'trip': trip_data,
+            'checklist': self._checklist(gear_items),
+            'unavailable': [],
+        }
+        for name, (available, value) in zip(self.OPTIONAL_PARTS, parts):
+            dashboard[name] = value
+            if not available:
+                dashboard['unavailable'].append(name)
+        return dashboard
+
+    async def _optional(self, name: str, part) -> tuple:
+        """(available, value) of a part, giving up after part_timeout"""
+        try:
+            return True, await asyncio.wait_for(part, self.part_timeout)
+        except asyncio.TimeoutError:
+            logger.warning('Trip dashboard %s timed out', name)
+        except Exception:
+            logger.exception('Trip dashboard %s failed', name)
+        return False, None
+
+    async def _weather(self, trip: Trip) -> Optional[Dict]:
+        if not trip.location:
+            return None
+        return await run_in_own_thread(
+            weather_service.get_weather_forecast,
+            trip.location,
+            datetime.combine(trip.start_date, datetime.min.time()),
+            datetime.combine(trip.end_date, datetime.min.time()),
+        )
+
+    def _usage_stats(self, trip: Trip, context: Dict) -> List[Dict]:
+        stats = GearUsageStats.objects.filter(
+            user_id=trip.user_id, gear__trip_usages__trip=trip
+        ).select_related('gear').order_by('gear__name', 'id')
+        return GearUsageStatsSerializer(stats, many=True, context=context).data
+
+    def _checklist(self, gear_items: List[TripGear]) -> Dict[str, Any]:
+        categories = {}
+        for item in gear_items:
+            category = item.gear.category
+            row = categories.setdefault(item.gear.category_id, {
+                'category': item.gear.category_id,
+                'category_name': category.name if category else None,
+                'gear_count': 0,
+                'packed_count': 0,
+            })
+            row['gear_count'] += 1
+            row['packed_count'] += item.packed
+
+        return {
+            'gear_count': len(gear_items),
+            'item_count': sum(item.quantity for item in gear_items),
+            'packed_count': sum(item.packed for item in gear_items),
+            'used_count': sum(item.used for item in gear_items),
+            'categories': sorted(
+                categories.values(),
+                key=lambda row: (row['category_name'] is None, row['category_name'] or '')
+            ),
+        }
+
+
+# Singleton instance
+trip_dashboard_service = TripDashboardService()
@@ -0,0 +1,81 @@
+from typing import Dict
+
+from django.db.models import Count, F, IntegerField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from gear.models import Trip, TripGear
+from gear.services.reference_data_service import reference_data_service
+
+
+class TripSummaryService:
+    """
+    Weight and category breakdown of a trip's gear, computed in the
+    database: one grouped aggregate per category (the trip totals are the
+    sum of its few rows) plus one query for the heaviest items.
+    Line weights are weight_grams × quantity; items without a weight
+    count towards the item counts only.
+    """
+
+    HEAVIEST_ITEMS = 5
+
+    def summarize(self, trip: Trip) -> Dict:
+        items = TripGear.objects.filter(trip=trip)
+        line_weight = F('gear__weight_grams') * F('quantity')
+
+        categories = list(
+            items.values(category=F('gear__category_id')).annotate(
+                gear_count=Count('id'),
+                item_count=Sum('quantity'),
+                packed_count=Count('id', filter=Q(packed=True)),
+                unweighed_count=Count('id', filter=Q(gear__weight_grams__isnull=True)),
+                weight_grams=Coalesce(
+                    Sum(line_weight), Value(0), output_field=IntegerField()),
+                packed_weight_grams=Coalesce(
+                    Sum(line_weight, filter=Q(packed=True)), Value(0),
+                    output_field=IntegerField()),
+            ).order_by('-weight_grams', 'category')
+        )
+
+        heaviest = items.filter(gear__weight_grams__isnull=False).annotate(
+            total_weight_grams=line_weight
+        ).order_by('-total_weight_grams', 'id').values(
+            'gear_id', 'gear__name', 'quantity', 'gear__weight_grams',
+            'total_weight_grams', 'packed'
+        )[:self.HEAVIEST_ITEMS]
+
+        totals = {
+            key: sum(row[key] for row in categories)
+            for key in ['gear_count', 'item_count', 'packed_count',
+                        'unweighed_count', 'weight_grams', 'packed_weight_grams']
+        }
+        return {
+            'trip_id': trip.id,
+            'gear_count': totals['gear_count'],
+            'item_count': totals['item_count'],
+            'packed_count': totals['packed_count'],
+            'unweighed_count': totals['unweighed_count'],
+            'total_weight_grams': totals['weight_grams'],
+            'packed_weight_grams': totals['packed_weight_grams'],
+            'categories': [
+                {
+                    **row,
+                    'category_name': reference_data_service.category_name(row['category']),
+                }
+                for row in categories
+            ],
+            'heaviest_items': [
+                {
+                    'gear_id': row['gear_id'],
+                    'name': row['gear__name'],
+                    'quantity': row['quantity'],
+                    'weight_grams': row['gear__weight_grams'],
+                    'total_weight_grams': row['total_weight_grams'],
+                    'packed': row['packed'],
+                }
+                for row in heaviest
+            ],
+        }
+
+
+# Singleton instance
+trip_summary_service = TripSummaryService()
@@ -0,0 +1,239 @@
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, List, Optional
+
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+
+from gear.models import Trip, TripGear, GearUsageStats
+
+
+class UsageStatsService:
+    """Service for folding completed trips into GearUsageStats"""
+
+    UPDATE_FIELDS = [
+        'times_packed', 'times_used', 'times_not_used',
+        'avg_usefulness_rating', 'rating_sum', 'rating_count',
+        'usage_by_activity', 'usage_by_weather',
+        'usage_by_duration', 'last_used_date', 'updated_at'
+    ]
+
+    # Same buckets as get_duration_range(), expressed as filters
+    DURATION_FILTERS = {
+        '1_day': Q(trip__duration_days__lte=1),
+        '2-3_days': Q(trip__duration_days__gt=1, trip__duration_days__lte=3),
+        '4-7_days': Q(trip__duration_days__gt=3, trip__duration_days__lte=7),
+        '8+_days': Q(trip__duration_days__gt=7),
+    }
+
+    def record_trip(self, trip: Trip) -> int:
+        """
+        Apply a completed trip to the usage stats of every gear item on it.
+
+        Runs as a single transaction with a fixed number of statements,
+        regardless of how many items the trip has: one lookup of the
+        existing stats rows, one insert for the missing ones, one locking
+        select and one bulk update. Returns the number of stats rows touched.
+        """
+        trip_gear = list(
+            TripGear.objects.filter(trip=trip)
+            .only('gear_id', 'packed', 'used', 'usefulness_rating')
+            .order_by('gear_id')
+        )
+        if not trip_gear:
+            return 0
+
+        gear_ids = [item.gear_id for item in trip_gear]
+
+        with transaction.atomic():
+            # Insert missing rows first so that every row we need exists
+            # before locking; concurrent completions then serialize on the
+            # row locks instead of racing on the unique constraint.
+            existing_ids = set(
+                GearUsageStats.objects.filter(
+                    user_id=trip.user_id, gear_id__in=gear_ids
+                ).values_list('gear_id', flat=True)
+            )
+            missing = [
+                GearUsageStats(user_id=trip.user_id, gear_id=gear_id)
+                for gear_id in gear_ids if gear_id not in existing_ids
+            ]
+            if missing:
+                GearUsageStats.objects.bulk_create(
+                    missing, ignore_conflicts=True)
+
+            stats_by_gear = {
+                stats.gear_id: stats
+                for stats in GearUsageStats.objects.select_for_update()
+                .filter(user_id=trip.user_id, gear_id__in=gear_ids)
+                .order_by('gear_id')
+            }
+
+            duration_range = self.get_duration_range(trip.duration_days)
+            now = timezone.now()
+            for item in trip_gear:
+                stats = stats_by_gear[item.gear_id]
+                self._apply_trip_gear(stats, item, trip, duration_range)
+                # bulk_update() bypasses save(), so auto_now isn't applied
+                stats.updated_at = now
+
+            GearUsageStats.objects.bulk_update(
+                stats_by_gear.values(), self.UPDATE_FIELDS)
+
+        return len(stats_by_gear)
+
+    def rebuild_for_users(self, user_ids: List[int]) -> int:
+        """
+        Recompute the stats of the given users from completed trip history.
+
+        Counters, rating totals and duration buckets come from one grouped
+        aggregate; activity and weather maps are grouped by the distinct
+        JSON lists so only those combinations are expanded in Python.
+        Stats rows without any history are removed. History is read in
+        the same transaction, after the users' stats rows are locked.
+        Returns the number of stats rows written.
+        """
+        with transaction.atomic():
+            # Lock the stats first and read the history after: a trip
+            # completed meanwhile is either in the history or waits for us
+            existing = {
+                (user_id, gear_id): pk
+                for pk, user_id, gear_id in GearUsageStats.objects
+                .select_for_update()
+                .filter(user_id__in=user_ids)
+                .order_by('pk')
+                .values_list('pk', 'user_id', 'gear_id')
+            }
+
+            history = TripGear.objects.filter(
+                trip__status='completed', trip__user_id__in=user_ids)
+            rated = Q(usefulness_rating__gte=1)
+
+            rebuilt = {}
+            for row in history.values('trip__user_id', 'gear_id').annotate(
+                times_packed=Count('id', filter=Q(packed=True)),
+                times_used=Count('id', filter=Q(packed=True, used=True)),
+                times_not_used=Count('id', filter=Q(packed=True, used=False)),
+                rating_sum=Sum('usefulness_rating', filter=rated, default=0),
+                rating_count=Count('id', filter=rated),
+                last_used_date=Max('trip__end_date'),
+                **{
+                    f'duration_{key}': Count('id', filter=condition)
+                    for key, condition in self.DURATION_FILTERS.items()
+                }
+            ):
+                key = (row['trip__user_id'], row['gear_id'])
+                rebuilt[key] = GearUsageStats(
+                    user_id=key[0],
+                    gear_id=key[1],
+                    times_packed=row['times_packed'],
+                    times_used=row['times_used'],
+                    times_not_used=row['times_not_used'],
+                    rating_sum=row['rating_sum'],
+                    rating_count=row['rating_count'],
+                    avg_usefulness_rating=self.average_rating(
+                        row['rating_sum'], row['rating_count']),
+                    usage_by_activity={},
+                    usage_by_weather={},
+                    usage_by_duration={
+                        name: row[f'duration_{name}']
+                        for name in self.DURATION_FILTERS
+                        if row[f'duration_{name}']
+                    },
+                    last_used_date=row['last_used_date'],
+                )
+
+            for field, target in [('activities', 'usage_by_activity'),
+                                  ('expected_weather', 'usage_by_weather')]:
+                lookup = f'trip__{field}'
+                for row in history.values(
+                    'trip__user_id', 'gear_id', lookup
+                ).annotate(trips=Count('id')):
+                    stats = rebuilt[(row['trip__user_id'], row['gear_id'])]
+                    counts = getattr(stats, target)
+                    for key in row[lookup] or []:
+                        counts[key] = counts.get(key, 0) + row['trips']
+
+            now = timezone.now()
+            to_create, to_update = [], []
+            for key, stats in rebuilt.items():
+                stats.updated_at = now
+                if key in existing:
+                    stats.pk = existing[key]
+                    to_update.append(stats)
+                else:
+                    to_create.append(stats)
+
+            stale = [pk for key, pk in existing.items() if key not in rebuilt]
+            if stale:
+                GearUsageStats.objects.filter(pk__in=stale).delete()
+            GearUsageStats.objects.bulk_create(to_create, batch_size=1000)
+            GearUsageStats.objects.bulk_update(
+                to_update, self.UPDATE_FIELDS, batch_size=1000)
+
+        return len(rebuilt)
+
+    def _apply_trip_gear(
+        self,
+        stats: GearUsageStats,
+        trip_gear: TripGear,
+        trip: Trip,
+        duration_range: str
+    ) -> None:
+        """Fold a single trip item into its stats row (in memory)"""
+        # Update counters
+        if trip_gear.packed:
+            stats.times_packed += 1
+            if trip_gear.used:
+                stats.times_used += 1
+            else:
+                stats.times_not_used += 1
+
+        # Update context-based usage
+        if trip.activities:
+            stats.usage_by_activity = self._increment(
+                stats.usage_by_activity, trip.activities)
+        if trip.expected_weather:
+            stats.usage_by_weather = self._increment(
+                stats.usage_by_weather, trip.expected_weather)
+        stats.usage_by_duration = self._increment(
+            stats.usage_by_duration, [duration_range])
+
+        # Update average rating from the running totals
+        if trip_gear.usefulness_rating:
+            stats.rating_sum += trip_gear.usefulness_rating
+            stats.rating_count += 1
+            stats.avg_usefulness_rating = self.average_rating(
+                stats.rating_sum, stats.rating_count)
+
+        stats.last_used_date = trip.end_date
+
+    def _increment(self, counts: Dict[str, int], keys: List[str]) -> Dict[str, int]:
+        counts = dict(counts or {})
+        for key in keys:
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    @staticmethod
+    def average_rating(rating_sum: int, rating_count: int) -> Optional[Decimal]:
+        """Exact average rounded to the precision of avg_usefulness_rating"""
+        if not rating_count:
+            return None
+        return (Decimal(rating_sum) / rating_count).quantize(
+            Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+    @staticmethod
+    def get_duration_range(days: int) -> str:
+        """Helper to categorize trip duration"""
+        if days <= 1:
+            return '1_day'
+        elif days <= 3:
+            return '2-3_days'
+        elif days <= 7:
+            return '4-7_days'
+        else:
+            return '8+_days'
+
+
+# Singleton instance
+usage_stats_service = UsageStatsService()
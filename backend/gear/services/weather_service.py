@@ -1,6 +1,8 @@
+import hashlib
 import requests
 from datetime import datetime, timedelta
 from django.conf import settings
+from django.core.cache import cache
 from typing import Optional, Dict, List
 
 
@@ -8,6 +10,7 @@ class WeatherService:
     """
     Service to fetch weather forecasts using OpenWeatherMap API
     Free tier: 1000 calls/day, 5-day forecast
+    Forecasts are cached for WEATHER_CACHE_SECONDS.
     """
 
     BASE_URL = "https://api.openweathermap.org/data/2.5"
@@ -28,6 +31,24 @@ class WeatherService:
         if not self.api_key:
             return None
 
+        key = self._cache_key(location, start_date, end_date)
+        forecast = cache.get(key)
+        if forecast is None:
+            forecast = self._fetch_forecast(location, start_date, end_date)
+            if forecast is not None:
+                cache.set(key, forecast, getattr(settings, 'WEATHER_CACHE_SECONDS', 1800))
+        return forecast
+
+    def _cache_key(self, location: str, start_date: datetime, end_date: datetime) -> str:
+        source = f'{location.strip().lower()}|{start_date.date()}|{end_date.date()}'
+        return 'weather:' + hashlib.sha1(source.encode()).hexdigest()
+
+    def _fetch_forecast(
+        self,
+        location: str,
+        start_date: datetime,
+        end_date: datetime
+    ) -> Optional[Dict]:
         try:
             # Get coordinates from location name
             coords = self._geocode_location(location)
@@ -0,0 +1,101 @@
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import (
+    Category, ActivityType, UserGear, Trip, TripGear, GearUsageStats,
+    GearCatalog, SyncTombstone
+)
+from .services.media_service import media_service
+from .services.reference_data_service import reference_data_service
+from .services.thumbnail_service import thumbnail_service
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=ActivityType)
+@receiver(post_delete, sender=ActivityType)
+def invalidate_reference_data(sender, **kwargs):
+    """Drop the cached snapshot of a reference table when it changes"""
+    reference_data_service.invalidate(sender)
+
+
+@receiver(pre_delete, sender=Category)
+def touch_category_rows(sender, instance, **kwargs):
+    """
+    The category's gear and catalog rows lose it (SET_NULL, which doesn't
+    bump updated_at); mark them changed so Last-Modified and delta sync
+    notice
+    """
+    now = timezone.now()
+    for model in (UserGear, GearCatalog):
+        model.objects.filter(category=instance).update(updated_at=now)
+
+
+TOMBSTONE_KINDS = {
+    UserGear: SyncTombstone.GEAR,
+    Trip: SyncTombstone.TRIP,
+    TripGear: SyncTombstone.TRIP_GEAR,
+    GearUsageStats: SyncTombstone.STATS,
+}
+
+
+@receiver(post_delete, sender=UserGear)
+@receiver(post_delete, sender=Trip)
+@receiver(post_delete, sender=TripGear)
+@receiver(post_delete, sender=GearUsageStats)
+def record_tombstone(sender, instance, origin=None, **kwargs):
+    """Remember a deleted row for delta sync"""
+    # Rows removed by cascade (trip items of a deleted trip, stats of a
+    # deleted gear item, everything of a deleted user) are implied by the
+    # parent's tombstone; clients drop them along with the parent
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin is not None and origin_model is not sender:
+        return
+
+    if sender is TripGear:
+        user_id = instance.trip.user_id
+    else:
+        user_id = instance.user_id
+
+    SyncTombstone.objects.create(
+        user_id=user_id, kind=TOMBSTONE_KINDS[sender], object_id=instance.pk)
+
+
+@receiver(post_save, sender=UserGear)
+@receiver(post_save, sender=GearCatalog)
+def schedule_thumbnails(sender, instance, **kwargs):
+    """Queue thumbnails for a new or replaced photo"""
+    name = instance.photo.name or ''
+    if instance.photo_thumbnails.get('source', '') == name:
+        return
+
+    if instance.photo_thumbnails:
+        # Don't keep serving the previous photo's thumbnails
+        sender.objects.filter(pk=instance.pk).update(photo_thumbnails={})
+        instance.photo_thumbnails = {}
+    if name:
+        # The worker reads the row, so wait until it is committed
+        transaction.on_commit(
+            lambda: thumbnail_service.schedule(sender, instance.pk, name))
+
+
+@receiver(post_save, sender=UserGear)
+@receiver(post_save, sender=GearCatalog)
+def release_replaced_photo(sender, instance, **kwargs):
+    """Release the previous photo of a row whose photo changed"""
+    previous = getattr(instance, '_loaded_photo', None)
+    instance._loaded_photo = instance.photo.name
+    if previous and previous != instance.photo.name:
+        transaction.on_commit(lambda: media_service.release(previous))
+
+
+@receiver(post_delete, sender=UserGear)
+@receiver(post_delete, sender=GearCatalog)
+def release_deleted_photo(sender, instance, **kwargs):
+    """Release the photo of a deleted row"""
+    name = instance.photo.name
+    if name:
+        transaction.on_commit(lambda: media_service.release(name))
@@ -0,0 +1,65 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+from functools import lru_cache
+
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage naming each file after the SHA-256 of its content.
+
+    An upload to gear_photos/tent.JPG is stored as
+    gear_photos/<ab>/<digest>.jpg, so identical uploads share one file.
+    Content is streamed to a temporary file in chunks while it is hashed
+    and then renamed into place, so uploads are never held in memory and
+    concurrent identical uploads can't corrupt each other. Files are only
+    removed once no row references them (see media_service).
+    """
+
+    CHUNK_SIZE = 64 * 1024
+    INCOMING_DIR = '.incoming'
+
+    def get_available_name(self, name, max_length=None):
+        # The final name comes from the content, in _save()
+        return name
+
+    def _save(self, name, content):
+        directory, filename = posixpath.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+
+        incoming = self.path(self.INCOMING_DIR)
+        os.makedirs(incoming, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=incoming)
+        try:
+            digest = hashlib.sha256()
+            with os.fdopen(fd, 'wb') as temp:
+                for chunk in content.chunks(self.CHUNK_SIZE):
+                    digest.update(chunk)
+                    temp.write(chunk)
+
+            digest = digest.hexdigest()
+            final_name = posixpath.join(directory, digest[:2], digest + extension)
+            final_path = self.path(final_name)
+            if os.path.exists(final_path):
+                # Reused: restart its grace period before it can be released
+                os.utime(final_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(temp_path, self.file_permissions_mode)
+                os.replace(temp_path, final_path)
+                temp_path = None
+        finally:
+            if temp_path is not None and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        return final_name
+
+
+@lru_cache(maxsize=None)
+def photo_storage():
+    """Storage of UserGear and GearCatalog photos"""
+    return ContentAddressedStorage()
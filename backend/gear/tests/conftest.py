@@ -10,6 +10,15 @@ def django_db_setup(django_db_setup, django_db_blocker):
         call_command('seed_data')
 
 
+@pytest.fixture(autouse=True)
+def reset_reference_data():
+    """Don't let cached reference data outlive a test's transaction"""
+    from gear.services.reference_data_service import reference_data_service
+    reference_data_service.invalidate()
+    yield
+    reference_data_service.invalidate()
+
+
 @pytest.fixture
 def sample_categories(db):
     """Fixture providing sample categories"""
@@ -21,4 +30,11 @@ def sample_categories(db):
 def sample_activities(db):
     """Fixture providing sample activities"""
     from gear.tests.factories import ActivityTypeFactory
-    return ActivityTypeFactory.create_batch(5)
\ No newline at end of file
+    return ActivityTypeFactory.create_batch(5)
+
+
+@pytest.fixture
+def api_client():
+    """Fixture providing an unauthenticated DRF test client"""
+    from rest_framework.test import APIClient
+    return APIClient()
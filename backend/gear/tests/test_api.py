@@ -1,8 +1,9 @@
 import pytest
 from datetime import date, timedelta
+from django.core.exceptions import ValidationError
 
 from gear.tests.factories import CategoryFactory, TripFactory, TripGearFactory, UserFactory, UserGearFactory
-from gear.models import Trip, TripGear
+from gear.models import Trip, TripGear, UserGear
 
 
 @pytest.mark.django_db
@@ -209,4 +210,1641 @@ class TestTripGearRelationships:
         
         gear.delete()
         
-        assert not TripGear.objects.filter(id=trip_gear_id).exists()
\ No newline at end of file
+        assert not TripGear.objects.filter(id=trip_gear_id).exists()
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestCompleteTripEndpoint:
+    """Test the complete_trip action"""
+
+    def test_complete_trip_updates_stats(self, api_client):
+        """Test completing a trip creates and updates usage stats"""
+        from gear.models import GearUsageStats
+
+        trip = TripFactory(
+            start_date=date(2024, 6, 1),
+            end_date=date(2024, 6, 3),
+            activities=['Hiking'],
+            expected_weather=['Rainy']
+        )
+        used = UserGearFactory(user=trip.user)
+        unused = UserGearFactory(user=trip.user)
+        TripGearFactory(trip=trip, gear=used, packed=True, used=True)
+        TripGearFactory(trip=trip, gear=unused, packed=True, used=False)
+        GearUsageStats.objects.create(
+            user=trip.user, gear=used, times_packed=2, times_used=2,
+            usage_by_activity={'Hiking': 1})
+
+        api_client.force_authenticate(trip.user)
+        response = api_client.post(f'/api/trips/{trip.id}/complete_trip/')
+
+        assert response.status_code == 200
+        assert response.data['status'] == 'completed'
+
+        used_stats = GearUsageStats.objects.get(gear=used)
+        assert used_stats.times_packed == 3
+        assert used_stats.times_used == 3
+        assert used_stats.usage_by_activity == {'Hiking': 2}
+        assert used_stats.usage_by_weather == {'Rainy': 1}
+        assert used_stats.usage_by_duration == {'2-3_days': 1}
+        assert used_stats.last_used_date == date(2024, 6, 3)
+
+        unused_stats = GearUsageStats.objects.get(gear=unused)
+        assert unused_stats.times_packed == 1
+        assert unused_stats.times_not_used == 1
+
+    def test_complete_trip_query_count_is_constant(
+        self, api_client, django_assert_max_num_queries
+    ):
+        """Test stats are written in bulk rather than per item"""
+        from gear.services.usage_stats_service import usage_stats_service
+
+        trip = TripFactory()
+        for _ in range(25):
+            TripGearFactory(
+                trip=trip, gear=UserGearFactory(user=trip.user), packed=True)
+
+        with django_assert_max_num_queries(8):
+            assert usage_stats_service.record_trip(trip) == 25
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestBulkUpdateGearStatusEndpoint:
+    """Test the bulk_update_gear_status action"""
+
+    def test_bulk_update_applies_changes(self, api_client):
+        """Test several items are updated and counters returned"""
+        trip = TripFactory()
+        items = [
+            TripGearFactory(trip=trip, gear=UserGearFactory(user=trip.user))
+            for _ in range(3)
+        ]
+
+        api_client.force_authenticate(trip.user)
+        response = api_client.patch(
+            f'/api/trips/{trip.id}/bulk_update_gear_status/',
+            {'items': [
+                {'gear_id': items[0].gear_id, 'packed': True},
+                {'gear_id': items[1].gear_id, 'packed': True, 'used': True},
+                {'gear_id': items[1].gear_id, 'usefulness_rating': 4},
+                {'gear_id': 999999, 'packed': True},
+            ]},
+            format='json'
+        )
+
+        assert response.status_code == 200
+        assert response.data['updated'] == 2
+        assert response.data['not_found'] == [999999]
+        assert response.data['gear_count'] == 3
+        assert response.data['packed_count'] == 2
+        assert response.data['used_count'] == 1
+
+        items[1].refresh_from_db()
+        assert items[1].packed and items[1].used
+        assert items[1].usefulness_rating == 4
+        items[2].refresh_from_db()
+        assert not items[2].packed
+
+    def test_bulk_update_rejects_invalid_rating(self, api_client):
+        """Test the whole batch is rejected when an item is invalid"""
+        trip = TripFactory()
+        trip_gear = TripGearFactory(
+            trip=trip, gear=UserGearFactory(user=trip.user))
+
+        api_client.force_authenticate(trip.user)
+        response = api_client.patch(
+            f'/api/trips/{trip.id}/bulk_update_gear_status/',
+            {'items': [
+                {'gear_id': trip_gear.gear_id, 'packed': True},
+                {'gear_id': trip_gear.gear_id, 'usefulness_rating': 9},
+            ]},
+            format='json'
+        )
+
+        assert response.status_code == 400
+        trip_gear.refresh_from_db()
+        assert not trip_gear.packed
+
+    def test_bulk_update_rejects_list_body(self, api_client):
+        """Test a bare list instead of {"items": [...]} is a 400"""
+        trip = TripFactory()
+        trip_gear = TripGearFactory(
+            trip=trip, gear=UserGearFactory(user=trip.user))
+
+        api_client.force_authenticate(trip.user)
+        response = api_client.patch(
+            f'/api/trips/{trip.id}/bulk_update_gear_status/',
+            [{'gear_id': trip_gear.gear_id, 'packed': True}], format='json')
+        assert response.status_code == 400
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestPackingWriteBehind:
+    """Test coalescing of packing status toggles"""
+
+    def test_toggles_are_coalesced_until_read(self, api_client, settings):
+        """Test buffered toggles are written once and visible on read"""
+        from gear.services.packing_buffer_service import packing_buffer_service
+
+        settings.TRIP_GEAR_WRITE_BEHIND_SECONDS = 60
+        trip = TripFactory()
+        trip_gear = TripGearFactory(
+            trip=trip, gear=UserGearFactory(user=trip.user))
+        url = f'/api/trips/{trip.id}/update_gear_status/'
+
+        api_client.force_authenticate(trip.user)
+        for packed in [True, False, True]:
+            response = api_client.patch(
+                url, {'gear_id': trip_gear.gear_id, 'packed': packed},
+                format='json')
+            assert response.status_code == 200
+            assert response.data['packed'] == packed
+        response = api_client.patch(
+            url, {'gear_id': trip_gear.gear_id, 'used': True}, format='json')
+        assert response.data['packed'] and response.data['used']
+
+        # Nothing written yet
+        trip_gear.refresh_from_db()
+        assert not trip_gear.packed
+        assert packing_buffer_service.has_pending(trip.user.id)
+
+        # Reading the trip flushes the user's pending changes first
+        response = api_client.get(f'/api/trips/{trip.id}/')
+        assert response.data['packed_count'] == 1
+        assert not packing_buffer_service.has_pending(trip.user.id)
+        trip_gear.refresh_from_db()
+        assert trip_gear.packed and trip_gear.used
+
+    def test_changes_written_immediately_without_window(self, api_client):
+        """Test the default configuration writes through"""
+        trip = TripFactory()
+        trip_gear = TripGearFactory(
+            trip=trip, gear=UserGearFactory(user=trip.user))
+
+        api_client.force_authenticate(trip.user)
+        api_client.patch(
+            f'/api/trips/{trip.id}/update_gear_status/',
+            {'gear_id': trip_gear.gear_id, 'packed': True}, format='json')
+
+        trip_gear.refresh_from_db()
+        assert trip_gear.packed
+
+    def test_invalid_changes_are_rejected_or_dropped(self, api_client, settings, monkeypatch):
+        """Test invalid toggles get a 400 and bad buffered rows don't block others"""
+        from gear.services.packing_buffer_service import packing_buffer_service
+
+        settings.TRIP_GEAR_WRITE_BEHIND_SECONDS = 60
+        trip = TripFactory()
+        trip_gear = TripGearFactory(
+            trip=trip, gear=UserGearFactory(user=trip.user))
+
+        api_client.force_authenticate(trip.user)
+        response = api_client.patch(
+            f'/api/trips/{trip.id}/update_gear_status/',
+            {'gear_id': trip_gear.gear_id, 'packed': 'maybe'}, format='json')
+        assert response.status_code == 400
+        assert not packing_buffer_service.has_pending(trip.user.id)
+
+        # The model's own checks run before anything is buffered
+        with pytest.raises(ValidationError):
+            packing_buffer_service.update(
+                trip_gear, {'usefulness_rating': 9}, trip.user.id)
+        assert not packing_buffer_service.has_pending(trip.user.id)
+
+        # A bad row that still got into the buffer is dropped on flush
+        monkeypatch.setattr(
+            packing_buffer_service, '_validate', lambda trip_gear, changes: changes)
+        other = TripGearFactory()
+        packing_buffer_service.update(trip_gear, {'packed': 'maybe'}, trip.user.id)
+        packing_buffer_service.update(other, {'packed': True}, other.trip.user_id)
+        assert packing_buffer_service.flush() == 1
+        assert not packing_buffer_service.has_pending()
+        other.refresh_from_db()
+        assert other.packed
+        assert api_client.get('/api/trips/').status_code == 200
+
+    def test_buffered_toggle_pins_user_to_primary(self, api_client, settings, monkeypatch):
+        """Test a buffered toggle keeps the user off replicas until it's written"""
+        from django.core.cache import cache
+        from gear import replicas
+
+        settings.TRIP_GEAR_WRITE_BEHIND_SECONDS = 60
+        settings.DATABASE_REPLICAS = ['default']
+        replica_reads = []
+        monkeypatch.setattr(
+            replicas.ReplicaRouter, 'choose_replica',
+            lambda router, aliases: replica_reads.append(aliases[0]) or aliases[0])
+        pins = []
+        pin_to_primary = replicas.pin_to_primary
+
+        def record_pin(user, delay=0):
+            pins.append(delay)
+            pin_to_primary(user, delay)
+
+        monkeypatch.setattr(replicas, 'pin_to_primary', record_pin)
+        cache.clear()
+        trip = TripFactory()
+        trip_gear = TripGearFactory(
+            trip=trip, gear=UserGearFactory(user=trip.user))
+
+        api_client.force_authenticate(trip.user)
+        response = api_client.patch(
+            f'/api/trips/{trip.id}/update_gear_status/',
+            {'gear_id': trip_gear.gear_id, 'packed': True}, format='json')
+        assert response.status_code == 200
+
+        # Pinned for the write-behind window on top of the usual lag
+        assert pins == [60]
+        assert replicas.is_pinned(trip.user)
+        replica_reads.clear()
+        api_client.get(f'/api/trips/{trip.id}/')
+        assert not replica_reads
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestBulkAddGearEndpoint:
+    """Test the bulk_add_gear action"""
+
+    def test_bulk_add_separates_added_and_duplicates(
+        self, api_client, django_assert_max_num_queries
+    ):
+        """Test new items are added and duplicates/foreign gear reported"""
+        trip = TripFactory()
+        existing = UserGearFactory(user=trip.user)
+        TripGearFactory(trip=trip, gear=existing)
+        new_gear = [UserGearFactory(user=trip.user) for _ in range(3)]
+        foreign = UserGearFactory()
+
+        api_client.force_authenticate(trip.user)
+        with django_assert_max_num_queries(10):
+            response = api_client.post(
+                f'/api/trips/{trip.id}/bulk_add_gear/',
+                {'items': [
+                    {'gear_id': new_gear[0].id, 'quantity': 2},
+                    {'gear_id': new_gear[1].id},
+                    {'gear_id': new_gear[2].id},
+                    {'gear_id': existing.id},
+                    {'gear_id': foreign.id},
+                ]},
+                format='json'
+            )
+
+        assert response.status_code == 201
+        added = {item['gear']: item for item in response.data['added']}
+        assert set(added) == {gear.id for gear in new_gear}
+        assert added[new_gear[0].id]['quantity'] == 2
+        assert added[new_gear[1].id]['origin'] == 'user_added'
+        assert response.data['duplicates'] == [existing.id]
+        assert response.data['not_found'] == [foreign.id]
+        assert TripGear.objects.filter(trip=trip).count() == 4
+
+    def test_bulk_add_repeated_ids_and_list_body(self, api_client):
+        """Test the last quantity of a repeated gear_id wins and a bare list is a 400"""
+        trip = TripFactory()
+        gear = UserGearFactory(user=trip.user)
+        url = f'/api/trips/{trip.id}/bulk_add_gear/'
+
+        api_client.force_authenticate(trip.user)
+        assert api_client.post(
+            url, [{'gear_id': gear.id}], format='json').status_code == 400
+
+        response = api_client.post(url, {'items': [
+            {'gear_id': gear.id, 'quantity': 2},
+            {'gear_id': gear.id, 'quantity': 3},
+        ]}, format='json')
+        assert response.status_code == 201
+        assert [item['quantity'] for item in response.data['added']] == [3]
+
+    def test_bulk_add_reports_only_rows_it_created(self, api_client, monkeypatch):
+        """Test a row inserted concurrently is a duplicate, not "added" """
+        from django.db.models.query import QuerySet
+
+        trip = TripFactory()
+        raced, other = UserGearFactory(user=trip.user), UserGearFactory(user=trip.user)
+        values_list = QuerySet.values_list
+
+        def racing_values_list(queryset, *args, **kwargs):
+            rows = values_list(queryset, *args, **kwargs)
+            if queryset.model is not TripGear:
+                return rows
+            # Another request adds one of the items right after they were
+            # checked for
+            rows = list(rows)
+            monkeypatch.setattr(QuerySet, 'values_list', values_list)
+            TripGear.objects.create(trip=trip, gear=raced, quantity=5)
+            return rows
+
+        monkeypatch.setattr(QuerySet, 'values_list', racing_values_list)
+        api_client.force_authenticate(trip.user)
+        response = api_client.post(f'/api/trips/{trip.id}/bulk_add_gear/', {'items': [
+            {'gear_id': raced.id}, {'gear_id': other.id},
+        ]}, format='json')
+
+        assert response.status_code == 201
+        assert [item['gear'] for item in response.data['added']] == [other.id]
+        assert response.data['duplicates'] == [raced.id]
+        assert TripGear.objects.get(trip=trip, gear=raced).quantity == 5
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestKeysetPagination:
+    """Test cursor pagination on list endpoints"""
+
+    def _walk(self, api_client, url):
+        ids = []
+        while url:
+            response = api_client.get(url)
+            assert response.status_code == 200
+            assert 'count' not in response.data
+            ids += [item['id'] for item in response.data['results']]
+            url = response.data['next']
+        return ids
+
+    def test_catalog_cursor_walks_ties_in_order(self, api_client):
+        """Test every catalog item is returned once, in catalog order"""
+        from gear.models import GearCatalog
+        from gear.tests.factories import GearCatalogFactory
+
+        for i in range(7):
+            GearCatalogFactory(name=f'Item {i % 3}', popularity_score=i % 2)
+
+        api_client.force_authenticate(UserFactory())
+        ids = self._walk(api_client, '/api/catalog/?pagination=cursor&page_size=2')
+
+        assert ids == list(GearCatalog.objects.order_by(
+            '-popularity_score', 'name', 'id').values_list('id', flat=True))
+
+    def test_trip_cursor_and_page_number_modes(self, api_client):
+        """Test trips page by cursor on request and by page number otherwise"""
+        user = UserFactory()
+        trips = [
+            TripFactory(user=user, start_date=date(2024, 6, 1 + i % 2))
+            for i in range(5)
+        ]
+
+        api_client.force_authenticate(user)
+        ids = self._walk(api_client, '/api/trips/?pagination=cursor&page_size=2')
+        expected = sorted(trips, key=lambda t: (t.start_date, t.id), reverse=True)
+        assert ids == [trip.id for trip in expected]
+
+        response = api_client.get('/api/trips/')
+        assert response.data['count'] == 5
+        assert [item['id'] for item in response.data['results']] == [
+            trip.id for trip in expected]
+
+    def test_page_number_mode_keeps_list_order(self, api_client):
+        """Test the grouped (counting) trip list is still sorted by start date"""
+        user = UserFactory()
+        for day in (5, 1, 9, 3):
+            TripFactory(user=user, start_date=date(2025, 1, day))
+
+        api_client.force_authenticate(user)
+        response = api_client.get('/api/trips/')
+        assert [item['start_date'] for item in response.data['results']] == [
+            '2025-01-09', '2025-01-05', '2025-01-03', '2025-01-01']
+
+    def test_invalid_cursor(self, api_client):
+        """Test a tampered cursor is rejected"""
+        api_client.force_authenticate(UserFactory())
+        response = api_client.get('/api/gear/?cursor=not-a-cursor')
+        assert response.status_code == 404
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestConditionalGet:
+    """Test ETag/Last-Modified handling on read endpoints"""
+
+    def test_trip_detail_not_modified_until_gear_changes(self, api_client):
+        """Test trip detail ETag changes when a gear item is toggled"""
+        trip = TripFactory()
+        trip_gear = TripGearFactory(
+            trip=trip, gear=UserGearFactory(user=trip.user))
+        url = f'/api/trips/{trip.id}/'
+
+        api_client.force_authenticate(trip.user)
+        response = api_client.get(url)
+        etag = response['ETag']
+        assert response.status_code == 200
+
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert response['ETag'] == etag
+
+        api_client.patch(
+            f'/api/trips/{trip.id}/bulk_update_gear_status/',
+            {'items': [{'gear_id': trip_gear.gear_id, 'packed': True}]},
+            format='json')
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.data['packed_count'] == 1
+
+    def test_list_etag_changes_on_delete(self, api_client):
+        """Test a list ETag changes when a row is removed"""
+        user = UserFactory()
+        gear = UserGearFactory(user=user)
+        UserGearFactory(user=user)
+
+        api_client.force_authenticate(user)
+        etag = api_client.get('/api/gear/')['ETag']
+        assert api_client.get(
+            '/api/gear/', HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+        gear.delete()
+        response = api_client.get('/api/gear/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.data['count'] == 1
+
+    def test_expanded_gear_etag_covers_usage_stats(self, api_client):
+        """Test ?expand=usage_stats responses change with the stats"""
+        from gear.models import GearUsageStats
+
+        gear = UserGearFactory()
+        stats = GearUsageStats.objects.create(user=gear.user, gear=gear, times_used=1)
+
+        api_client.force_authenticate(gear.user)
+        for url in [f'/api/gear/{gear.id}/?expand=usage_stats',
+                    '/api/gear/?expand=usage_stats']:
+            etag = api_client.get(url)['ETag']
+            assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+            stats.times_used += 1
+            stats.save()
+            assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    def test_expanded_trip_list_etag_covers_gear(self, api_client):
+        """Test ?expand=gear_items trip lists change with the items' gear"""
+        trip = TripFactory()
+        gear = UserGearFactory(user=trip.user)
+        TripGearFactory(trip=trip, gear=gear)
+        url = '/api/trips/?expand=gear_items'
+
+        api_client.force_authenticate(trip.user)
+        etag = api_client.get(url)['ETag']
+        assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+        gear.name = 'Renamed tent'
+        gear.save()
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.data['results'][0]['gear_items'][0]['gear_name'] == 'Renamed tent'
+
+    def test_cursor_page_version_reads_only_the_page(self, api_client):
+        """Test a cursor page is validated without aggregating the whole catalog"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from gear.tests.factories import GearCatalogFactory
+
+        for i in range(3):
+            GearCatalogFactory(popularity_score=i)
+
+        api_client.force_authenticate(UserFactory())
+        url = '/api/catalog/?pagination=cursor&page_size=2'
+        etag = api_client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert not any(
+            'gear_gearcatalog' in query['sql'] and ('COUNT(' in query['sql'] or 'MAX(' in query['sql'])
+            for query in queries.captured_queries)
+
+        GearCatalogFactory(popularity_score=10)
+        assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    def test_category_delete_changes_last_modified(self, api_client):
+        """Test rows losing a deleted category are no longer Not Modified"""
+        import time
+        category = CategoryFactory()
+        gear = UserGearFactory(category=category)
+        url = f'/api/gear/{gear.id}/'
+
+        api_client.force_authenticate(gear.user)
+        last_modified = api_client.get(url)['Last-Modified']
+        time.sleep(1)  # Last-Modified has one second resolution
+        category.delete()
+
+        response = api_client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == 200
+        assert response.data['category'] is None
+
+    def test_category_detail_last_modified(self, api_client):
+        """Test If-Modified-Since on a single category"""
+        category = CategoryFactory()
+
+        api_client.force_authenticate(UserFactory())
+        response = api_client.get(f'/api/categories/{category.id}/')
+        last_modified = response['Last-Modified']
+
+        response = api_client.get(
+            f'/api/categories/{category.id}/',
+            HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == 304
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestReferenceDataEndpoints:
+    """Test cached category and activity endpoints"""
+
+    def test_categories_served_from_cache(
+        self, api_client, django_assert_num_queries
+    ):
+        """Test repeated category lists don't hit the database"""
+        from gear.models import Category
+
+        api_client.force_authenticate(UserFactory())
+        response = api_client.get('/api/categories/')
+        assert response.status_code == 200
+        data = response.json()
+        assert data['count'] == Category.objects.count()
+        assert len(data['results']) == min(data['count'], 20)
+        assert 'max-age=' in response['Cache-Control']
+
+        with django_assert_num_queries(0):
+            response = api_client.get(
+                '/api/categories/', HTTP_IF_NONE_MATCH=response['ETag'])
+        assert response.status_code == 304
+
+    def test_cache_invalidated_on_save(self, api_client):
+        """Test a renamed activity type is served right away"""
+        from gear.tests.factories import ActivityTypeFactory
+
+        activity = ActivityTypeFactory(name='Packrafting')
+        api_client.force_authenticate(UserFactory())
+        url = f'/api/activities/{activity.id}/'
+        assert api_client.get(url).json()['name'] == 'Packrafting'
+
+        activity.name = 'Packrafting (whitewater)'
+        activity.save()
+        assert api_client.get(url).json()['name'] == 'Packrafting (whitewater)'
+        assert api_client.get('/api/activities/999999/').status_code == 404
+
+    def test_list_is_paginated(self, api_client):
+        """Test the cached list pages like any other list, ?page=2 included"""
+        from gear.models import ActivityType
+        from gear.tests.factories import ActivityTypeFactory
+
+        for number in range(25):
+            ActivityTypeFactory(name=f'Packing test {number:02d}')
+        names = list(ActivityType.objects.values_list('name', flat=True))
+
+        api_client.force_authenticate(UserFactory())
+        first = api_client.get('/api/activities/').json()
+        assert first['count'] == len(names)
+        assert first['previous'] is None
+        assert [a['name'] for a in first['results']] == names[:20]
+
+        response = api_client.get('/api/activities/', {'page': 2})
+        assert response.status_code == 200
+        assert response.json()['previous'] is not None
+        assert [a['name'] for a in response.json()['results']] == names[20:40]
+
+        seen, url = [], '/api/activities/'
+        while url:
+            data = api_client.get(url).json()
+            seen += [a['name'] for a in data['results']]
+            url = data['next']
+        assert seen == names
+
+        last = (len(names) - 1) // 20 + 1
+        assert api_client.get('/api/activities/', {'page': last + 1}).status_code == 404
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestCatalogByActivity:
+    """Test filtering the catalog by activity and weather tags"""
+
+    def _names(self, response):
+        return [item['name'] for item in response.data['results']]
+
+    def test_any_and_all_matching(self, api_client):
+        """Test any/all matching ranked by popularity"""
+        from gear.tests.factories import GearCatalogFactory
+
+        GearCatalogFactory(name='Tent', popularity_score=50,
+                           common_activities=['Camping', 'Backpacking'],
+                           weather_conditions=['Rainy'])
+        GearCatalogFactory(name='Stove', popularity_score=80,
+                           common_activities=['Camping'],
+                           weather_conditions=[])
+        GearCatalogFactory(name='Harness', popularity_score=90,
+                           common_activities=['Rock Climbing'],
+                           weather_conditions=['Sunny'])
+
+        api_client.force_authenticate(UserFactory())
+        url = '/api/catalog/by_activity/'
+
+        response = api_client.get(
+            url, {'activities': ['Camping', 'Backpacking']})
+        assert self._names(response) == ['Stove', 'Tent']
+
+        response = api_client.get(
+            url, {'activities': ['Camping', 'Backpacking'], 'match': 'all'})
+        assert self._names(response) == ['Tent']
+
+        response = api_client.get(
+            url, {'activities': ['Camping'], 'weather': ['Rainy']})
+        assert self._names(response) == ['Tent']
+
+        assert api_client.get(url).status_code == 400
+
+    def test_tags_follow_item_changes(self):
+        """Test tag rows are kept in sync with the JSON lists"""
+        from gear.models import GearCatalogTag
+        from gear.tests.factories import GearCatalogFactory
+
+        item = GearCatalogFactory(
+            common_activities=['Hiking'], weather_conditions=['Sunny'])
+        item.common_activities = ['Kayaking']
+        item.save()
+
+        assert set(GearCatalogTag.objects.filter(item=item).values_list(
+            'kind', 'name')) == {('activity', 'Kayaking'), ('weather', 'Sunny')}
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestCatalogSearch:
+    """Test catalog search endpoint"""
+
+    def test_search_ranks_name_matches_first(self, api_client):
+        """Test name matches rank above description matches"""
+        from gear.tests.factories import GearCatalogFactory
+
+        GearCatalogFactory(name='Dry bag', description='Keeps a rain jacket dry',
+                           popularity_score=100)
+        GearCatalogFactory(name='Rain jacket', description='Waterproof shell',
+                           popularity_score=10)
+        GearCatalogFactory(name='Headlamp', description='Light',
+                           popularity_score=50)
+
+        api_client.force_authenticate(UserFactory())
+        response = api_client.get('/api/catalog/search/', {'q': 'rain jacket'})
+
+        assert response.status_code == 200
+        assert [item['name'] for item in response.data['results']] == [
+            'Rain jacket', 'Dry bag']
+        assert api_client.get('/api/catalog/search/').status_code == 400
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestGearSearch:
+    """Test gear autocomplete endpoint"""
+
+    def test_autocomplete_ranks_own_gear_then_catalog(self, api_client):
+        """Test own gear is ranked by match position and topped up from the catalog"""
+        from gear.tests.factories import GearCatalogFactory
+
+        user = UserFactory()
+        UserGearFactory(user=user, name='Spare headlamp batteries', description='')
+        UserGearFactory(user=user, name='Buff', description='Head and neck warmer')
+        UserGearFactory(user=user, name='Headlamp', description='')
+        UserGearFactory(user=user, name='Stove', description='')
+        UserGearFactory(name='Headnet', description='')  # someone else's
+        GearCatalogFactory(name='Headlamp', popularity_score=90)
+        GearCatalogFactory(name='Head net', popularity_score=40)
+
+        api_client.force_authenticate(user)
+        response = api_client.get('/api/gear/search/', {'q': 'head'})
+
+        assert response.status_code == 200
+        assert [(item['source'], item['name']) for item in response.data['results']] == [
+            ('user', 'Headlamp'),
+            ('user', 'Spare headlamp batteries'),
+            ('user', 'Buff'),
+            ('catalog', 'Head net'),
+        ]
+
+        response = api_client.get('/api/gear/search/', {'q': 'head', 'limit': 2})
+        assert len(response.data['results']) == 2
+        assert api_client.get('/api/gear/search/').status_code == 400
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestDeltaSync:
+    """Test delta sync endpoint"""
+
+    def test_full_then_delta_sync(self, api_client):
+        """Test a cursor returns only later changes and deletions"""
+        from django.utils import timezone
+        from gear.models import GearUsageStats, SyncTombstone, UserGear
+        from gear.services.sync_service import sync_service
+
+        trip = TripFactory()
+        user = trip.user
+        kept, removed = UserGearFactory.create_batch(2, user=user)
+        trip_gear = TripGearFactory(trip=trip, gear=kept)
+        other_trip = TripFactory(user=user)
+        TripGearFactory(trip=other_trip, gear=kept)
+        UserGearFactory()  # someone else's
+
+        api_client.force_authenticate(user)
+        response = api_client.get('/api/sync/')
+        assert response.status_code == 200
+        assert response.data['full']
+        assert {item['id'] for item in response.data['gear']['updated']} == {
+            kept.id, removed.id}
+        assert len(response.data['trip_gear']['updated']) == 2
+
+        # Everything so far happened well before the cursor
+        hour_ago = timezone.now() - timedelta(hours=1)
+        for model in [UserGear, Trip, TripGear, GearUsageStats]:
+            model.objects.update(updated_at=hour_ago)
+        cursor = sync_service.encode_cursor(hour_ago + timedelta(minutes=30))
+
+        kept.name = 'Renamed'
+        kept.save()
+        api_client.delete(f'/api/gear/{removed.id}/')
+        api_client.delete(
+            f'/api/trips/{trip.id}/remove_gear/',
+            {'gear_id': kept.id}, format='json')
+        api_client.delete(f'/api/trips/{other_trip.id}/')
+
+        response = api_client.get('/api/sync/', {'since': cursor})
+        assert response.status_code == 200
+        assert not response.data['full']
+        assert [item['name'] for item in response.data['gear']['updated']] == ['Renamed']
+        assert response.data['gear']['deleted'] == [removed.id]
+        assert response.data['trip']['updated'] == []
+        assert response.data['trip']['deleted'] == [other_trip.id]
+        # The other trip's items went with it and need no tombstone
+        assert response.data['trip_gear']['deleted'] == [trip_gear.id]
+        assert SyncTombstone.objects.filter(user=user).count() == 3
+
+        assert api_client.get('/api/sync/', {'since': response.data['cursor']}).status_code == 200
+        assert api_client.get('/api/sync/', {'since': 'nonsense'}).status_code == 400
+
+    def test_expired_cursor_gets_full_sync(self, api_client):
+        """Test a cursor older than the tombstone retention resyncs everything"""
+        from django.utils import timezone
+        from gear.services.sync_service import sync_service
+
+        gear = UserGearFactory()
+        cursor = sync_service.encode_cursor(timezone.now() - timedelta(days=365))
+
+        api_client.force_authenticate(gear.user)
+        response = api_client.get('/api/sync/', {'since': cursor})
+
+        assert response.data['full']
+        assert [item['id'] for item in response.data['gear']['updated']] == [gear.id]
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestSyncMutations:
+    """Test offline mutation upload endpoint"""
+
+    def test_operations_apply_in_order_with_refs_and_conflicts(self, api_client):
+        """Test refs chain operations and stale edits are reported as conflicts"""
+        trip = TripFactory()
+        user = trip.user
+        packed_gear = UserGearFactory(user=user)
+        TripGearFactory(trip=trip, gear=packed_gear)
+
+        api_client.force_authenticate(user)
+        response = api_client.post('/api/sync/mutations/', {'operations': [
+            {'op': 'gear.create', 'ref': 'tarp', 'data': {'name': 'Tarp'}},
+            {'op': 'trip.add_gear', 'target': trip.id,
+             'data': {'gear_id': 'tarp', 'quantity': 2}},
+            {'op': 'trip.update_gear_status', 'target': trip.id,
+             'data': {'gear_id': packed_gear.id, 'packed': True}},
+            {'op': 'trip.update', 'target': trip.id, 'data': {'title': 'Stale'},
+             'base_updated_at': '2000-01-01T00:00:00Z'},
+            {'op': 'trip.remove_gear', 'target': trip.id, 'data': {'gear_id': 0}},
+            {'op': 'gear.explode'},
+        ]}, format='json')
+
+        assert response.status_code == 200
+        assert response.data['committed']
+        results = response.data['results']
+        assert [result['status'] for result in results] == [
+            'applied', 'applied', 'applied', 'conflict', 'not_found', 'error']
+        assert results[3]['data']['title'] == trip.title
+
+        tarp = UserGear.objects.get(user=user, name='Tarp')
+        assert results[1]['data']['gear'] == tarp.id
+        assert TripGear.objects.get(trip=trip, gear=tarp).quantity == 2
+        assert TripGear.objects.get(trip=trip, gear=packed_gear).packed
+        trip.refresh_from_db()
+        assert trip.title != 'Stale'
+
+    def test_all_or_nothing_rolls_back(self, api_client):
+        """Test a failed operation undoes the whole batch when asked to"""
+        user = UserFactory()
+
+        api_client.force_authenticate(user)
+        response = api_client.post('/api/sync/mutations/', {
+            'all_or_nothing': True,
+            'operations': [
+                {'op': 'gear.create', 'data': {'name': 'Tarp'}},
+                {'op': 'gear.delete', 'target': 0},
+            ]
+        }, format='json')
+
+        assert response.status_code == 409
+        assert [result['status'] for result in response.data['results']] == [
+            'rolled_back', 'not_found']
+        assert not UserGear.objects.filter(user=user).exists()
+
+    def test_list_body_is_rejected(self, api_client):
+        """Test a bare list of operations is a 400"""
+        api_client.force_authenticate(UserFactory())
+        response = api_client.post('/api/sync/mutations/', [
+            {'op': 'gear.create', 'data': {'name': 'Tarp'}},
+        ], format='json')
+        assert response.status_code == 400
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestResponseFormats:
+    """Test response rendering and compression"""
+
+    def test_orjson_output_matches_stock_renderer(self):
+        """Test the fast renderer encodes values exactly like DRF does"""
+        from datetime import datetime, timezone as dt_timezone
+        from decimal import Decimal
+        from django.utils.translation import gettext_lazy
+        from rest_framework.renderers import JSONRenderer
+        from gear.renderers import ORJSONRenderer
+
+        data = {
+            'when': datetime(2024, 6, 15, 10, 30, 0, 123456, tzinfo=dt_timezone.utc),
+            'day': date(2024, 6, 15),
+            'rating': Decimal('4.50'),
+            'label': gettext_lazy('Hiking'),
+            'text': 'Zażółć gęślą',
+            'items': [1, None, True, 2.5, {'nested': ('a', 'b')}],
+            3: 'int key',
+        }
+        assert ORJSONRenderer().render(data) == JSONRenderer().render(data)
+
+    def test_messagepack_format(self, api_client):
+        """Test clients can ask for MessagePack instead of JSON"""
+        import msgpack
+
+        gear = UserGearFactory()
+        api_client.force_authenticate(gear.user)
+        response = api_client.get(
+            f'/api/gear/{gear.id}/', HTTP_ACCEPT='application/msgpack')
+
+        assert response['Content-Type'] == 'application/msgpack'
+        body = msgpack.unpackb(response.content)
+        assert body['name'] == gear.name
+        assert body['updated_at'] == api_client.get(f'/api/gear/{gear.id}/').data['updated_at']
+
+    def test_large_responses_are_compressed(self, api_client, settings):
+        """Test compression follows Accept-Encoding and the size threshold"""
+        import gzip
+        import brotli
+
+        settings.RESPONSE_COMPRESSION_MIN_BYTES = 1024
+        user = UserFactory()
+        UserGearFactory.create_batch(15, user=user)
+        api_client.force_authenticate(user)
+
+        plain = api_client.get('/api/gear/')
+        assert not plain.has_header('Content-Encoding')
+
+        response = api_client.get('/api/gear/', HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+        assert response['Content-Encoding'] == 'br'
+        assert 'Accept-Encoding' in response['Vary']
+        assert brotli.decompress(response.content) == plain.content
+
+        response = api_client.get('/api/gear/', HTTP_ACCEPT_ENCODING='gzip, br;q=0.5')
+        assert response['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(response.content) == plain.content
+
+        small = api_client.get('/api/auth/me/', HTTP_ACCEPT_ENCODING='br')
+        assert not small.has_header('Content-Encoding')
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestValuesSerializers:
+    """Test the values()-based list serializers match the model serializers"""
+
+    def assert_same_output(self, queryset, serializer_class, values_serializer_class):
+        from rest_framework.test import APIRequestFactory
+
+        context = {'request': APIRequestFactory().get('/api/')}
+        expected = serializer_class(queryset, many=True, context=context).data
+        actual = values_serializer_class(
+            values_serializer_class.prepare_queryset(queryset), context=context).data
+        # Same keys in the same order, same values
+        assert [list(item.items()) for item in actual] == [
+            list(item.items()) for item in expected]
+
+    def test_user_gear_list(self):
+        """Test gear rows with and without a category or photo"""
+        from gear.serializers import UserGearListSerializer, UserGearListValuesSerializer
+
+        user = UserFactory()
+        UserGearFactory(user=user, photo='gear_photos/tent.jpg')
+        UserGearFactory(user=user, category=None, weight_grams=None)
+
+        self.assert_same_output(
+            UserGear.objects.filter(user=user).order_by('id'),
+            UserGearListSerializer, UserGearListValuesSerializer)
+
+    def test_trip_list(self):
+        """Test trip rows, including gear and packed counts"""
+        from gear.serializers import TripListSerializer, TripListValuesSerializer
+
+        trip = TripFactory()
+        TripGearFactory(trip=trip, gear=UserGearFactory(user=trip.user), packed=True)
+        TripGearFactory(trip=trip, gear=UserGearFactory(user=trip.user))
+        TripFactory(user=trip.user)
+
+        self.assert_same_output(
+            Trip.objects.filter(user=trip.user).order_by('id'),
+            TripListSerializer, TripListValuesSerializer)
+
+    def test_catalog_list(self):
+        """Test catalog rows with and without a category or photo"""
+        from gear.models import GearCatalog
+        from gear.serializers import GearCatalogSerializer, GearCatalogValuesSerializer
+        from gear.tests.factories import GearCatalogFactory
+
+        GearCatalogFactory(photo='catalog_photos/stove.jpg')
+        GearCatalogFactory(category=None, typical_weight_grams=None)
+
+        self.assert_same_output(
+            GearCatalog.objects.order_by('id'),
+            GearCatalogSerializer, GearCatalogValuesSerializer)
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestSparseFieldsets:
+    """Test ?fields= and ?expand= on read endpoints"""
+
+    def test_gear_list_fetches_only_selected_columns(self, api_client):
+        """Test unselected fields are neither returned nor joined"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        user = UserFactory()
+        UserGearFactory.create_batch(3, user=user)
+        api_client.force_authenticate(user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get('/api/gear/', {'fields': 'id,name'})
+
+        assert response.status_code == 200
+        assert [set(item) for item in response.data['results']] == [{'id', 'name'}] * 3
+        assert not any('JOIN' in query['sql'] for query in queries.captured_queries)
+
+        response = api_client.get('/api/gear/', {'fields': 'name,category_name'})
+        assert all('category_name' in item for item in response.data['results'])
+
+    def test_gear_usage_stats_on_request(self, api_client, django_assert_max_num_queries):
+        """Test usage stats are only included, and prefetched, when expanded"""
+        from gear.models import GearUsageStats
+
+        user = UserFactory()
+        gear = UserGearFactory.create_batch(3, user=user)
+        GearUsageStats.objects.create(user=user, gear=gear[0], times_packed=2)
+        api_client.force_authenticate(user)
+
+        assert 'usage_stats' not in api_client.get(f'/api/gear/{gear[0].id}/').data
+
+        response = api_client.get(
+            f'/api/gear/{gear[0].id}/', {'fields': 'id', 'expand': 'usage_stats'})
+        assert set(response.data) == {'id', 'usage_stats'}
+        assert response.data['usage_stats']['times_packed'] == 2
+
+        with django_assert_max_num_queries(8):
+            response = api_client.get('/api/gear/', {'expand': 'usage_stats'})
+        stats = {item['id']: item['usage_stats'] for item in response.data['results']}
+        assert stats[gear[0].id]['times_packed'] == 2
+        assert stats[gear[1].id] is None
+
+    def test_trip_gear_items(self, api_client, django_assert_max_num_queries):
+        """Test trip gear items are opt-in on the list and opt-out on the detail"""
+        trip = TripFactory()
+        for _ in range(3):
+            TripGearFactory(trip=trip, gear=UserGearFactory(user=trip.user), packed=True)
+        api_client.force_authenticate(trip.user)
+
+        with django_assert_max_num_queries(8):
+            response = api_client.get('/api/trips/', {'expand': 'gear_items'})
+        [item] = response.data['results']
+        assert len(item['gear_items']) == 3
+        assert item['packed_count'] == 3
+        assert 'gear_items' not in api_client.get('/api/trips/').data['results'][0]
+
+        with django_assert_max_num_queries(8):
+            response = api_client.get(f'/api/trips/{trip.id}/')
+        assert len(response.data['gear_items']) == 3
+
+        response = api_client.get(
+            f'/api/trips/{trip.id}/', {'fields': 'id,title,gear_count'})
+        assert set(response.data) == {'id', 'title', 'gear_count'}
+        assert response.data['gear_count'] == 3
+
+    def test_catalog_fields(self, api_client):
+        """Test the catalog honours ?fields="""
+        from gear.tests.factories import GearCatalogFactory
+
+        item = GearCatalogFactory()
+        api_client.force_authenticate(UserFactory())
+
+        response = api_client.get('/api/catalog/', {'fields': 'id,name'})
+        assert response.data['results'] == [{'id': item.id, 'name': item.name}]
+        response = api_client.get(f'/api/catalog/{item.id}/', {'fields': 'name'})
+        assert response.data == {'name': item.name}
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestTripSummary:
+    """Test trip weight summary endpoint"""
+
+    def test_summary_breakdown(self, api_client, django_assert_max_num_queries):
+        """Test totals, per-category breakdown and heaviest items"""
+        shelter, kitchen = CategoryFactory(), CategoryFactory()
+        trip = TripFactory()
+        user = trip.user
+        tent = UserGearFactory(user=user, category=shelter, weight_grams=2000)
+        pegs = UserGearFactory(user=user, category=shelter, weight_grams=10)
+        stove = UserGearFactory(user=user, category=kitchen, weight_grams=300)
+        spoon = UserGearFactory(user=user, category=kitchen, weight_grams=None)
+        TripGearFactory(trip=trip, gear=tent, quantity=1, packed=True)
+        TripGearFactory(trip=trip, gear=pegs, quantity=8, packed=False)
+        TripGearFactory(trip=trip, gear=stove, quantity=1, packed=True)
+        TripGearFactory(trip=trip, gear=spoon, quantity=2, packed=True)
+
+        api_client.force_authenticate(user)
+        with django_assert_max_num_queries(8):
+            response = api_client.get(f'/api/trips/{trip.id}/summary/')
+
+        assert response.status_code == 200
+        data = response.data
+        assert data['total_weight_grams'] == 2000 + 80 + 300
+        assert data['packed_weight_grams'] == 2300
+        assert data['gear_count'] == 4
+        assert data['item_count'] == 12
+        assert data['packed_count'] == 3
+        assert data['unweighed_count'] == 1
+        assert [
+            (row['category_name'], row['gear_count'], row['weight_grams'], row['packed_weight_grams'])
+            for row in data['categories']
+        ] == [(shelter.name, 2, 2080, 2000), (kitchen.name, 2, 300, 300)]
+        assert [
+            (row['name'], row['total_weight_grams']) for row in data['heaviest_items']
+        ] == [(tent.name, 2000), (stove.name, 300), (pegs.name, 80)]
+
+        etag = response['ETag']
+        assert api_client.get(
+            f'/api/trips/{trip.id}/summary/', HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+
+def make_photo(name='tent.jpg', color='green'):
+    from io import BytesIO
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from PIL import Image
+
+    buffer = BytesIO()
+    Image.new('RGB', (1200, 800), color).save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestPhotoThumbnails:
+    """Test thumbnail generation for uploaded photos"""
+
+    def test_upload_generates_shared_thumbnails(
+            self, api_client, settings, tmp_path, django_capture_on_commit_callbacks):
+        """Test thumbnails are listed after upload and shared by identical photos"""
+        import os
+        import time
+        from PIL import Image
+
+        settings.MEDIA_ROOT = tmp_path
+        settings.THUMBNAIL_WORKERS = 0
+        user = UserFactory()
+        api_client.force_authenticate(user)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = api_client.post(
+                '/api/gear/', {'name': 'Tent', 'photo': make_photo()},
+                format='multipart')
+        assert response.status_code == 201
+
+        [item] = api_client.get('/api/gear/').data['results']
+        assert set(item['thumbnails']) == {'small', 'medium', 'large'}
+        assert item['thumbnails']['small']['webp'].endswith('/160.webp')
+
+        gear = UserGear.objects.get(id=item['id'])
+        sizes = gear.photo_thumbnails['sizes']
+        with Image.open(tmp_path / sizes['medium']['jpeg']) as image:
+            assert image.size == (480, 320)
+        files = sorted(p for p in (tmp_path / 'thumbnails').rglob('*') if p.is_file())
+        assert len(files) == 6
+
+        # The same picture again reuses the rendered files, refreshing
+        # their mtime so the garbage collector doesn't take them meanwhile
+        old = time.time() - 48 * 3600
+        for path in files:
+            os.utime(path, (old, old))
+        with django_capture_on_commit_callbacks(execute=True):
+            api_client.post(
+                '/api/gear/', {'name': 'Tent 2', 'photo': make_photo('copy.jpg')},
+                format='multipart')
+        copy = UserGear.objects.get(user=user, name='Tent 2')
+        assert copy.photo_thumbnails['sizes'] == sizes
+        assert sorted(p for p in (tmp_path / 'thumbnails').rglob('*') if p.is_file()) == files
+        assert all(path.stat().st_mtime > time.time() - 3600 for path in files)
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestContentAddressedPhotos:
+    """Test photos are stored once per content and released when unused"""
+
+    def upload(self, api_client, name, photo):
+        response = api_client.post(
+            '/api/gear/', {'name': name, 'photo': photo}, format='multipart')
+        assert response.status_code == 201
+        return UserGear.objects.get(id=response.data['id'])
+
+    def test_identical_uploads_share_a_file(
+            self, api_client, settings, tmp_path, django_capture_on_commit_callbacks):
+        """Test identical photos are deduplicated and deleted with their last row"""
+        settings.MEDIA_ROOT = tmp_path
+        settings.THUMBNAIL_WORKERS = 0
+        settings.MEDIA_RELEASE_GRACE_SECONDS = 0
+        api_client.force_authenticate(UserFactory())
+
+        first = self.upload(api_client, 'Tent', make_photo('tent.JPG'))
+        api_client.force_authenticate(UserFactory())
+        second = self.upload(api_client, 'Same tent', make_photo('other.jpg'))
+
+        assert first.photo.name == second.photo.name
+        assert first.photo.name.startswith('gear_photos/')
+        assert first.photo.name.endswith('.jpg')
+        photos = [p for p in (tmp_path / 'gear_photos').rglob('*') if p.is_file()]
+        assert len(photos) == 1
+
+        with django_capture_on_commit_callbacks(execute=True):
+            api_client.delete(f'/api/gear/{second.id}/')
+        assert photos[0].exists()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            first.delete()
+        assert not photos[0].exists()
+
+    def test_replaced_photo_is_released(
+            self, api_client, settings, tmp_path, django_capture_on_commit_callbacks):
+        """Test replacing a photo deletes the previous unreferenced file"""
+        settings.MEDIA_ROOT = tmp_path
+        settings.THUMBNAIL_WORKERS = 0
+        settings.MEDIA_RELEASE_GRACE_SECONDS = 0
+        api_client.force_authenticate(UserFactory())
+
+        gear = self.upload(api_client, 'Tent', make_photo())
+        previous = tmp_path / gear.photo.name
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = api_client.patch(
+                f'/api/gear/{gear.id}/', {'photo': make_photo(color='blue')},
+                format='multipart')
+        assert response.status_code == 200
+        gear.refresh_from_db()
+        assert (tmp_path / gear.photo.name).exists()
+        assert not previous.exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestMediaServing:
+    """Test serving uploaded files with caching and range requests"""
+
+    @pytest.fixture
+    def photo(self, settings, tmp_path):
+        from django.core.files.base import ContentFile
+        from gear.storage import photo_storage
+
+        settings.MEDIA_ROOT = tmp_path
+        settings.MEDIA_SERVE = True
+        settings.MEDIA_SENDFILE_HEADER = ''
+        return photo_storage().save('gear_photos/tent.jpg', ContentFile(bytes(range(256)) * 4))
+
+    def test_whole_file_is_cached_as_immutable(self, client, photo):
+        """Test content-addressed files are served with an immutable ETag"""
+        response = client.get(f'/media/{photo}')
+        assert response.status_code == 200
+        assert b''.join(response.streaming_content) == bytes(range(256)) * 4
+        assert response['Content-Type'] == 'image/jpeg'
+        assert response['Accept-Ranges'] == 'bytes'
+        assert 'immutable' in response['Cache-Control']
+        assert response['ETag'].strip('"') in photo
+
+        cached = client.get(f'/media/{photo}', HTTP_IF_NONE_MATCH=response['ETag'])
+        assert cached.status_code == 304
+        assert cached['ETag'] == response['ETag']
+
+    def test_range_requests(self, client, photo):
+        """Test single byte ranges, suffix ranges and unsatisfiable ranges"""
+        response = client.get(f'/media/{photo}', HTTP_RANGE='bytes=10-19')
+        assert response.status_code == 206
+        assert response['Content-Range'] == 'bytes 10-19/1024'
+        assert b''.join(response.streaming_content) == bytes(range(10, 20))
+
+        response = client.get(f'/media/{photo}', HTTP_RANGE='bytes=-6')
+        assert response['Content-Range'] == 'bytes 1018-1023/1024'
+        assert b''.join(response.streaming_content) == bytes(range(250, 256))
+
+        response = client.get(f'/media/{photo}', HTTP_RANGE='bytes=2000-')
+        assert response.status_code == 416
+        assert response['Content-Range'] == 'bytes */1024'
+
+        # A range of a different version is ignored
+        response = client.get(
+            f'/media/{photo}', HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE='"stale"')
+        assert response.status_code == 200
+
+    def test_sendfile_offload(self, client, settings, photo):
+        """Test the proxy is told to send the file"""
+        settings.MEDIA_SENDFILE_HEADER = 'X-Accel-Redirect'
+        response = client.get(f'/media/{photo}')
+        assert response.status_code == 200
+        assert response['X-Accel-Redirect'] == f'/protected-media/{photo}'
+        assert response.content == b''
+
+        settings.MEDIA_SENDFILE_HEADER = 'X-Sendfile'
+        response = client.get(f'/media/{photo}')
+        assert response['X-Sendfile'] == str(settings.MEDIA_ROOT / photo)
+
+    def test_files_outside_media_are_not_served(self, client, photo):
+        """Test traversal and storage internals return 404"""
+        assert client.get('/media/../manage.py').status_code == 404
+        assert client.get('/media/.incoming/upload').status_code == 404
+        assert client.get('/media/gear_photos/missing.jpg').status_code == 404
+
+    def test_not_served_unless_enabled(self, client, settings, photo):
+        """Test uploads are only served with MEDIA_SERVE on"""
+        settings.MEDIA_SERVE = False
+        assert client.get(f'/media/{photo}').status_code == 404
+
+        settings.MEDIA_SENDFILE_HEADER = 'X-Accel-Redirect'
+        assert client.get(f'/media/{photo}').status_code == 404
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestMediaGarbageCollection:
+    """Test the collect_media_garbage command"""
+
+    def write(self, root, name, age_hours, size=100):
+        import os
+        import time
+
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b'x' * size)
+        modified = time.time() - age_hours * 3600
+        os.utime(path, (modified, modified))
+        return path
+
+    def test_deletes_old_unreferenced_files(self, settings, tmp_path):
+        """Test only old files no row references are deleted"""
+        from io import StringIO
+        from django.core.management import call_command
+
+        settings.MEDIA_ROOT = tmp_path
+        digest = 'a' * 64
+        UserGearFactory(
+            photo='gear_photos/aa/kept.jpg',
+            photo_thumbnails={'source': 'gear_photos/aa/kept.jpg', 'digest': digest, 'sizes': {}})
+
+        kept = [
+            self.write(tmp_path, 'gear_photos/aa/kept.jpg', 48),
+            self.write(tmp_path, 'gear_photos/bb/recent.jpg', 1),
+            self.write(tmp_path, f'thumbnails/aa/{digest}/160.webp', 48),
+        ]
+        deleted = [
+            self.write(tmp_path, 'gear_photos/cc/orphan.jpg', 48, size=300),
+            self.write(tmp_path, 'catalog_photos/dd/orphan.jpg', 48),
+            self.write(tmp_path, f'thumbnails/bb/{"b" * 64}/160.webp', 48),
+            self.write(tmp_path, '.incoming/tmp123', 48),
+        ]
+
+        out = StringIO()
+        call_command('collect_media_garbage', '--dry-run', stdout=out)
+        assert 'Would delete 4 of 6 old files' in out.getvalue()
+        assert all(path.exists() for path in deleted)
+
+        out = StringIO()
+        call_command('collect_media_garbage', '--chunk-size', '2', stdout=out)
+        assert 'Deleted 4 of 6 old files, reclaiming 600' in out.getvalue()
+        assert all(path.exists() for path in kept)
+        assert not any(path.exists() for path in deleted)
+        assert not (tmp_path / 'gear_photos' / 'cc').exists()
+        assert not (tmp_path / 'thumbnails' / 'bb').exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestAsyncViews:
+    """Test the async views give the same responses as the sync ones"""
+
+    def call(self, view, user, method='get', path='/', data=None, headers=None, **kwargs):
+        import json
+        from asgiref.sync import async_to_sync
+        from rest_framework.test import APIRequestFactory, force_authenticate
+
+        request = getattr(APIRequestFactory(), method)(
+            path, data, format='json', **(headers or {}))
+        force_authenticate(request, user)
+        response = async_to_sync(view)(request, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        response.json = lambda: json.loads(response.content)
+        return response
+
+    def test_trip_recommendations(self, api_client):
+        """Test async recommendations match the sync endpoint"""
+        from gear.views import get_trip_recommendations_async
+
+        user = UserFactory()
+        trip = TripFactory(user=user, activities=['Hiking'])
+        UserGearFactory(user=user, category=None)
+        path = f'/api/trips/{trip.id}/recommendations/'
+
+        api_client.force_authenticate(user)
+        expected = api_client.get(path).json()
+        response = self.call(get_trip_recommendations_async, user, path=path, trip_id=trip.id)
+        assert response.status_code == 200
+        assert response.json() == expected
+
+        other = self.call(get_trip_recommendations_async, UserFactory(), path=path, trip_id=trip.id)
+        assert other.status_code == 404
+
+    def test_trip_detail(self, api_client):
+        """Test async trip detail output, validators and 404s"""
+        from gear.views import trip_detail_async
+
+        user = UserFactory()
+        trip = TripFactory(user=user)
+        TripGearFactory(trip=trip, gear=UserGearFactory(user=user))
+        path = f'/api/trips/{trip.id}/'
+
+        api_client.force_authenticate(user)
+        expected = api_client.get(path)
+        response = self.call(trip_detail_async, user, path=path, pk=trip.id)
+        assert response.status_code == 200
+        assert response.json() == expected.json()
+        assert response['ETag'] == expected['ETag']
+
+        cached = self.call(trip_detail_async, user, path=path, pk=trip.id,
+                           headers={'HTTP_IF_NONE_MATCH': response['ETag']})
+        assert cached.status_code == 304
+
+        sparse = self.call(trip_detail_async, user, path=path + '?fields=id,title', pk=trip.id)
+        assert sparse.json() == {'id': trip.id, 'title': trip.title}
+
+        assert self.call(trip_detail_async, UserFactory(), path=path, pk=trip.id).status_code == 404
+
+    def test_weather_forecast(self, monkeypatch):
+        """Test async weather validation and the unconfigured API"""
+        from gear.services.weather_service import weather_service
+        from gear.views import get_weather_forecast_async
+
+        user = UserFactory()
+        response = self.call(get_weather_forecast_async, user, method='post', data={})
+        assert response.status_code == 400
+
+        monkeypatch.setattr(weather_service, 'api_key', None)
+        response = self.call(
+            get_weather_forecast_async, user, method='post',
+            data={'location': 'Zakopane', 'start_date': '2024-06-15', 'end_date': '2024-06-17'})
+        assert response.json()['available'] is False
+        assert self.call(get_weather_forecast_async, None, method='post').status_code == 401
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.integration
+class TestTripDashboard:
+    """Test the composite trip dashboard endpoint"""
+
+    def test_dashboard_parts(self, api_client, settings, monkeypatch):
+        """Test the parts, buffered packing changes and a timed out part"""
+        import time
+        from gear.models import GearUsageStats
+        from gear.services.weather_service import weather_service
+
+        settings.TRIP_GEAR_WRITE_BEHIND_SECONDS = 60
+        settings.TRIP_DASHBOARD_PART_TIMEOUT = 0.2
+        monkeypatch.setattr(
+            weather_service, 'get_weather_forecast', lambda *args: time.sleep(1))
+
+        trip = TripFactory()
+        tent = UserGearFactory(user=trip.user, category=CategoryFactory(name='Shelter test'))
+        TripGearFactory(trip=trip, gear=tent, quantity=2)
+        TripGearFactory(trip=trip, gear=UserGearFactory(user=trip.user, category=None))
+        GearUsageStats.objects.create(user=trip.user, gear=tent, times_used=3)
+
+        api_client.force_authenticate(trip.user)
+        api_client.patch(
+            f'/api/trips/{trip.id}/update_gear_status/',
+            {'gear_id': tent.id, 'packed': True}, format='json')
+
+        response = api_client.get(f'/api/trips/{trip.id}/dashboard/')
+        assert response.status_code == 200
+        data = response.json()
+        assert data['trip']['id'] == trip.id
+        assert len(data['trip']['gear_items']) == 2
+        assert data['checklist']['gear_count'] == 2
+        assert data['checklist']['item_count'] == 3
+        assert data['checklist']['packed_count'] == 1
+        assert data['checklist']['categories'][0] == {
+            'category': tent.category_id, 'category_name': 'Shelter test',
+            'gear_count': 1, 'packed_count': 1}
+        assert isinstance(data['recommendations'], list)
+        assert [row['gear'] for row in data['usage_stats']] == [tent.id]
+        assert data['weather'] is None
+        assert data['unavailable'] == ['weather']
+
+        api_client.force_authenticate(UserFactory())
+        assert api_client.get(f'/api/trips/{trip.id}/dashboard/').status_code == 404
+
+    def test_slow_part_does_not_delay_response(self, api_client, settings, monkeypatch):
+        """Test a part running past its timeout doesn't hold up the response"""
+        import time
+        from gear.services.recommendation_service import recommendation_service
+
+        settings.TRIP_DASHBOARD_PART_TIMEOUT = 0.3
+        monkeypatch.setattr(
+            recommendation_service, 'generate_recommendations',
+            lambda *args: time.sleep(1.5))
+        trip = TripFactory()
+        TripGearFactory(trip=trip, gear=UserGearFactory(user=trip.user))
+
+        api_client.force_authenticate(trip.user)
+        started = time.monotonic()
+        response = api_client.get(f'/api/trips/{trip.id}/dashboard/')
+        elapsed = time.monotonic() - started
+
+        assert response.status_code == 200
+        assert response.json()['unavailable'] == ['recommendations']
+        assert elapsed < 1.0
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestBatchRequests:
+    """Test running several API requests in one"""
+
+    def test_requests_run_in_order(self, api_client):
+        """Test reads, a write and per-request errors in one batch"""
+        trip = TripFactory()
+        tent = UserGearFactory(user=trip.user)
+        TripGearFactory(trip=trip, gear=tent)
+
+        api_client.force_authenticate(trip.user)
+        response = api_client.post('/api/batch/', {'requests': [
+            {'method': 'GET', 'path': f'trips/{trip.id}/'},
+            {'method': 'PATCH', 'path': f'/api/trips/{trip.id}/update_gear_status/',
+             'body': {'gear_id': tent.id, 'packed': True}},
+            {'method': 'POST', 'path': 'gear/', 'body': {'name': 'Tarp'}},
+            {'method': 'GET', 'path': 'gear/?pagination=cursor&page_size=1'},
+            {'method': 'GET', 'path': 'nowhere/'},
+            {'method': 'POST', 'path': 'batch/', 'body': {'requests': []}},
+            {'method': 'TRACE', 'path': 'gear/'},
+        ]}, format='json')
+
+        assert response.status_code == 200
+        assert response.data['committed']
+        responses = response.data['responses']
+        assert [r['status'] for r in responses] == [200, 200, 201, 200, 404, 400, 400]
+        assert responses[0]['body']['id'] == trip.id
+        assert 'ETag' in responses[0]['headers']
+        assert responses[1]['body']['packed']
+        assert responses[2]['body']['name'] == 'Tarp'
+        assert UserGear.objects.filter(user=trip.user, name='Tarp').exists()
+
+    def test_all_or_nothing_rolls_back(self, api_client):
+        """Test a failed request undoes the batch and skips the rest"""
+        user = UserFactory()
+
+        api_client.force_authenticate(user)
+        response = api_client.post('/api/batch/', {
+            'all_or_nothing': True,
+            'requests': [
+                {'method': 'POST', 'path': 'gear/', 'body': {'name': 'Tarp'}},
+                {'method': 'DELETE', 'path': 'gear/0/'},
+                {'method': 'POST', 'path': 'gear/', 'body': {'name': 'Stove'}},
+            ]
+        }, format='json')
+
+        assert response.status_code == 409
+        assert not response.data['committed']
+        assert [r['status'] for r in response.data['responses']] == [201, 404, 424]
+        assert not UserGear.objects.filter(user=user).exists()
+
+    def test_rollback_undoes_buffered_toggles(self, api_client, settings):
+        """Test packing toggles in a failed batch aren't written later"""
+        from gear.services.packing_buffer_service import packing_buffer_service
+
+        settings.TRIP_GEAR_WRITE_BEHIND_SECONDS = 60
+        trip = TripFactory()
+        trip_gear = TripGearFactory(trip=trip, gear=UserGearFactory(user=trip.user))
+
+        api_client.force_authenticate(trip.user)
+        response = api_client.post('/api/batch/', {
+            'all_or_nothing': True,
+            'requests': [
+                {'method': 'PATCH', 'path': f'trips/{trip.id}/update_gear_status/',
+                 'body': {'gear_id': trip_gear.gear_id, 'packed': True}},
+                {'method': 'DELETE', 'path': 'gear/0/'},
+            ]
+        }, format='json')
+
+        assert response.status_code == 409
+        assert not packing_buffer_service.has_pending(trip.user.id)
+        trip_gear.refresh_from_db()
+        assert not trip_gear.packed
+
+    def test_shared_authentication(self, api_client):
+        """Test sub-requests run as the batch's user, and need one"""
+        trip = TripFactory()
+
+        api_client.force_authenticate(UserFactory())
+        response = api_client.post('/api/batch/', {'requests': [
+            {'method': 'GET', 'path': f'trips/{trip.id}/'},
+        ]}, format='json')
+        assert response.data['responses'][0]['status'] == 404
+
+        response = api_client.post('/api/batch/', [
+            {'method': 'GET', 'path': f'trips/{trip.id}/'},
+        ], format='json')
+        assert response.status_code == 400
+
+        api_client.force_authenticate(None)
+        response = api_client.post('/api/batch/', {'requests': []}, format='json')
+        assert response.status_code == 401
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestReadReplicaRouting:
+    """Test read-only actions read from replicas, and writers read their writes"""
+
+    def test_reads_use_replicas_until_user_writes(self, api_client, settings, monkeypatch):
+        """Test routing of reads, writes and the pin after a write"""
+        from django.core.cache import cache
+        from gear.replicas import ReplicaRouter
+        from gear.services.reference_data_service import reference_data_service
+
+        # The test database stands in for a replica; record when it's chosen
+        settings.DATABASE_REPLICAS = ['default']
+        replica_reads = []
+
+        def choose_replica(router, replicas):
+            replica_reads.append(replicas[0])
+            return replicas[0]
+
+        monkeypatch.setattr(ReplicaRouter, 'choose_replica', choose_replica)
+        cache.clear()
+
+        trip = TripFactory()
+        UserGearFactory(user=trip.user)
+
+        def read_replica(method, path, data=None):
+            replica_reads.clear()
+            response = getattr(api_client, method)(path, data, format='json')
+            assert response.status_code < 400
+            return bool(replica_reads)
+
+        api_client.force_authenticate(trip.user)
+        assert read_replica('get', '/api/catalog/')
+        assert read_replica('get', '/api/stats/')
+        assert read_replica('get', f'/api/trips/{trip.id}/')
+        assert not read_replica('get', '/api/gear/')
+        assert not read_replica('get', f'/api/trips/{trip.id}/summary/')
+
+        # Shared reference data snapshots come from the primary
+        reference_data_service.invalidate()
+        assert not read_replica('get', '/api/categories/')
+
+        assert not read_replica('patch', f'/api/trips/{trip.id}/', {'title': 'Renamed'})
+        response = api_client.get(f'/api/trips/{trip.id}/')
+        assert response.data['title'] == 'Renamed'
+        assert not replica_reads
+
+        api_client.force_authenticate(UserFactory())
+        assert read_replica('get', '/api/trips/')
+
+        cache.clear()
+        api_client.force_authenticate(trip.user)
+        assert read_replica('get', '/api/trips/')
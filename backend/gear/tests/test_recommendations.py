@@ -1,5 +1,8 @@
 import pytest
 from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
 from gear.tests.factories import (
     UserFactory, CategoryFactory, UserGearFactory,
     TripFactory, TripGearFactory, GearCatalogFactory
@@ -104,6 +107,92 @@ class TestGearUsageTracking:
         assert stats.times_used == 2
         assert stats.times_not_used == 1
 
+    def test_average_rating_is_exact(self):
+        """Test average rating uses rating totals, not times packed"""
+        from gear.services.usage_stats_service import usage_stats_service
+
+        user = UserFactory()
+        gear = UserGearFactory(user=user)
+        for rating, packed in [(5, True), (2, False), (4, True)]:
+            trip = TripFactory(user=user, status='completed')
+            TripGearFactory(
+                trip=trip, gear=gear, packed=packed, usefulness_rating=rating)
+            usage_stats_service.record_trip(trip)
+
+        stats = GearUsageStats.objects.get(user=user, gear=gear)
+        assert stats.rating_sum == 11
+        assert stats.rating_count == 3
+        assert stats.avg_usefulness_rating == Decimal('3.67')
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestRebuildUsageStats:
+    """Test rebuilding usage statistics from trip history"""
+
+    def test_rebuild_matches_history(self):
+        """Test rebuilt stats match what incremental updates would produce"""
+        user = UserFactory()
+        gear = UserGearFactory(user=user)
+        stale_gear = UserGearFactory(user=user)
+
+        trip1 = TripFactory(
+            user=user, status='completed',
+            start_date=date(2024, 6, 1), end_date=date(2024, 6, 1),
+            activities=['Hiking'], expected_weather=['Sunny'])
+        TripGearFactory(
+            trip=trip1, gear=gear, packed=True, used=True, usefulness_rating=5)
+        trip2 = TripFactory(
+            user=user, status='completed',
+            start_date=date(2024, 7, 1), end_date=date(2024, 7, 10),
+            activities=['Hiking', 'Camping'], expected_weather=[])
+        TripGearFactory(
+            trip=trip2, gear=gear, packed=True, used=False, usefulness_rating=2)
+        # Planned trips are not part of the history
+        TripGearFactory(
+            trip=TripFactory(user=user, status='planned'), gear=gear,
+            packed=True, used=True)
+
+        GearUsageStats.objects.create(user=user, gear=gear, times_packed=40)
+        GearUsageStats.objects.create(user=user, gear=stale_gear, times_used=3)
+
+        call_command('rebuild_usage_stats', stdout=StringIO())
+
+        stats = GearUsageStats.objects.get(user=user, gear=gear)
+        assert stats.times_packed == 2
+        assert stats.times_used == 1
+        assert stats.times_not_used == 1
+        assert stats.rating_sum == 7
+        assert stats.rating_count == 2
+        assert stats.avg_usefulness_rating == Decimal('3.50')
+        assert stats.usage_by_activity == {'Hiking': 2, 'Camping': 1}
+        assert stats.usage_by_weather == {'Sunny': 1}
+        assert stats.usage_by_duration == {'1_day': 1, '8+_days': 1}
+        assert stats.last_used_date == date(2024, 7, 10)
+        assert not GearUsageStats.objects.filter(gear=stale_gear).exists()
+
+    def test_history_read_after_locking_stats(self):
+        """Test history is read inside the rebuild's transaction, after the lock"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from gear.services.usage_stats_service import usage_stats_service
+
+        user = UserFactory()
+        trip = TripFactory(user=user, status='completed')
+        TripGearFactory(trip=trip, gear=UserGearFactory(user=user), packed=True)
+
+        with CaptureQueriesContext(connection) as queries:
+            assert usage_stats_service.rebuild_for_users([user.id]) == 1
+
+        statements = [query['sql'] for query in queries.captured_queries]
+        savepoint = next(i for i, sql in enumerate(statements)
+                         if sql.startswith('SAVEPOINT'))
+        locked = next(i for i, sql in enumerate(statements)
+                      if 'FROM "gear_gearusagestats"' in sql)
+        history = [i for i, sql in enumerate(statements)
+                   if 'FROM "gear_tripgear"' in sql]
+        assert savepoint < locked < min(history)
+
 
 @pytest.mark.django_db
 @pytest.mark.unit
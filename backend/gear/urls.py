@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
@@ -6,7 +7,10 @@ from .views import (
     UserRegistrationView, CurrentUserView,
     CategoryViewSet, ActivityTypeViewSet,
     UserGearViewSet, TripViewSet,
-    GearCatalogViewSet, GearUsageStatsViewSet, get_trip_recommendations, get_weather_forecast
+    GearCatalogViewSet, GearUsageStatsViewSet, get_trip_recommendations, get_weather_forecast,
+    sync_changes, apply_sync_mutations,
+    get_trip_recommendations_async, get_weather_forecast_async, trip_detail,
+    get_trip_dashboard, batch_requests
 )
 
 # Create router for viewsets
@@ -29,6 +33,21 @@ urlpatterns = [
     path('', include(router.urls)),
 
     path('weather-forecast/', get_weather_forecast, name='weather_forecast'),
+    path('sync/', sync_changes, name='sync'),
+    path('sync/mutations/', apply_sync_mutations, name='sync_mutations'),
+    path('batch/', batch_requests, name='batch'),
     path('trips/<int:trip_id>/recommendations/',
          get_trip_recommendations, name='trip_recommendations'),
+    path('trips/<int:trip_id>/dashboard/',
+         get_trip_dashboard, name='trip_dashboard'),
 ]
+
+if settings.ASYNC_VIEWS:
+    # Async versions of the most composite reads, for ASGI deployments.
+    # Earlier patterns win, so these go in front of the router's
+    urlpatterns = [
+        path('trips/<int:pk>/', trip_detail, name='trip-detail-async'),
+        path('weather-forecast/', get_weather_forecast_async, name='weather_forecast'),
+        path('trips/<int:trip_id>/recommendations/',
+             get_trip_recommendations_async, name='trip_recommendations'),
+    ] + urlpatterns
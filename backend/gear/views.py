@@ -3,26 +3,132 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework.exceptions import NotFound, ParseError
+from rest_framework.pagination import PageNumberPagination
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.shortcuts import get_object_or_404
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_safe
+from urllib.parse import quote
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max, Prefetch, Q
+from django.utils import timezone
 from datetime import datetime
+import asyncio
+import orjson
 
+from asgiref.sync import sync_to_async
+
+from .async_api import AsyncAPIView, alist, async_api_view
+from .conditional import ConditionalGetMixin, Version, aggregate_version
+from .fieldsets import FieldSelection, SparseFieldsViewMixin
+from .pagination import HybridPagination
+from .renderers import ORJSONRenderer
+from .replicas import ReplicaReadMixin
 from .services.recommendation_service import recommendation_service
 from .services.weather_service import weather_service
+from .services.usage_stats_service import usage_stats_service
+from .services.packing_buffer_service import packing_buffer_service
+from .services.reference_data_service import reference_data_service
+from .services.catalog_search_service import catalog_search_service
+from .services.gear_search_service import gear_search_service
+from .services.sync_service import sync_service
+from .services.mutation_service import mutation_service
+from .services.trip_summary_service import trip_summary_service
+from .services.trip_dashboard_service import trip_dashboard_service
+from .services.media_service import media_service
+from .services.batch_service import batch_service
 
 from .models import (
     Category, UserGear, Trip, TripGear,
-    GearUsageStats, ActivityType, GearCatalog
+    GearUsageStats, ActivityType, GearCatalog, GearCatalogTag
 )
 from .serializers import (
     UserSerializer, UserRegistrationSerializer,
     CategorySerializer, ActivityTypeSerializer,
     UserGearSerializer, UserGearListSerializer,
     TripSerializer, TripListSerializer, TripGearSerializer,
-    GearUsageStatsSerializer, GearCatalogSerializer
+    TripGearAddSerializer, TripGearStatusSerializer,
+    GearUsageStatsSerializer, GearCatalogSerializer,
+    UserGearListValuesSerializer, TripListValuesSerializer,
+    GearCatalogValuesSerializer
 )
 
 
+def category_version():
+    return reference_data_service.categories().version
+
+
+# Fingerprint of a trip's gear items, for the trip detail's version
+TRIP_ITEM_AGGREGATES = {
+    'rows': Count('pk'),
+    'items': Max('updated_at'),
+    'gear': Max('gear__updated_at'),
+}
+
+
+def trip_version(trip, items, categories_version):
+    """Version of a trip's detail, from its TRIP_ITEM_AGGREGATES"""
+    return Version(token=(
+        trip.pk, trip.updated_at,
+        (items['rows'], items['items'], items['gear']),
+        categories_version
+    ))
+
+
+def with_category_version(obj):
+    """Version of an object whose output includes its category name"""
+    categories = reference_data_service.categories()
+    return Version(
+        token=(obj.pk, obj.updated_at, categories.version),
+        last_modified=max(filter(None, [obj.updated_at, categories.last_modified]))
+    )
+
+
+def request_object(request):
+    """The request body, which must be a JSON object (400 otherwise)"""
+    if not isinstance(request.data, dict):
+        raise ParseError('Request body must be a JSON object')
+    return request.data
+
+
+def parse_forecast_request(data):
+    """(location, start_date, end_date) of a forecast request, or an error Response"""
+    location = data.get('location')
+    start_date_str = data.get('start_date')
+    end_date_str = data.get('end_date')
+
+    if not all([location, start_date_str, end_date_str]):
+        return Response(
+            {'error': 'location, start_date, and end_date are required'},
+            status=400
+        )
+
+    try:
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
+        end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
+    except ValueError:
+        return Response(
+            {'error': 'Invalid date format. Use YYYY-MM-DD'},
+            status=400
+        )
+    return location, start_date, end_date
+
+
+def forecast_response(forecast):
+    if forecast is None:
+        return Response({
+            'available': False,
+            'message': 'Weather API unavailable or API key not configured'
+        })
+    return Response(forecast)
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def get_weather_forecast(request):
@@ -35,36 +141,35 @@ def get_weather_forecast(request):
         "end_date": "2024-06-17"
     }
     """
-    location = request.data.get('location')
-    start_date_str = request.data.get('start_date')
-    end_date_str = request.data.get('end_date')
+    parsed = parse_forecast_request(request.data)
+    if isinstance(parsed, Response):
+        return parsed
 
-    if not all([location, start_date_str, end_date_str]):
+    try:
+        return forecast_response(weather_service.get_weather_forecast(*parsed))
+    except Exception as e:
         return Response(
-            {'error': 'location, start_date, and end_date are required'},
-            status=400
+            {'error': str(e)},
+            status=500
         )
 
-    try:
-        start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
-        end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
-
-        forecast = weather_service.get_weather_forecast(
-            location, start_date, end_date)
-
-        if forecast is None:
-            return Response({
-                'available': False,
-                'message': 'Weather API unavailable or API key not configured'
-            })
 
-        return Response(forecast)
+@async_api_view(['POST'])
+@permission_classes([IsAuthenticated])
+async def get_weather_forecast_async(request):
+    """
+    get_weather_forecast for ASGI; the weather API calls run in a thread of
+    their own instead of blocking a worker
+    POST /api/weather-forecast/
+    """
+    parsed = parse_forecast_request(request.data)
+    if isinstance(parsed, Response):
+        return parsed
 
-    except ValueError:
-        return Response(
-            {'error': 'Invalid date format. Use YYYY-MM-DD'},
-            status=400
-        )
+    try:
+        forecast = await sync_to_async(
+            weather_service.get_weather_forecast, thread_sensitive=False)(*parsed)
+        return forecast_response(forecast)
     except Exception as e:
         return Response(
             {'error': str(e)},
@@ -104,6 +209,257 @@ def get_trip_recommendations(request, trip_id):
         )
 
 
+@async_api_view(['GET'])
+@permission_classes([IsAuthenticated])
+async def get_trip_recommendations_async(request, trip_id):
+    """
+    get_trip_recommendations for ASGI; the event loop isn't blocked while
+    gear, stats and catalog load (one after another, see
+    agenerate_recommendations)
+    GET /api/trips/{trip_id}/recommendations/
+    """
+    try:
+        trip = await Trip.objects.aget(id=trip_id, user=request.user)
+    except Trip.DoesNotExist:
+        return Response(
+            {'error': 'Trip not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    try:
+        recommendations = await recommendation_service.agenerate_recommendations(
+            trip, request.user.id
+        )
+        return Response({
+            'trip_id': trip.id,
+            'trip_title': trip.title,
+            'recommendations': recommendations,
+            'total_recommendations': len(recommendations)
+        })
+    except Exception as e:
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@async_api_view(['GET'])
+@permission_classes([IsAuthenticated])
+async def get_trip_dashboard(request, trip_id):
+    """
+    Trip, checklist counts, recommendations, weather and usage stats at once
+    GET /api/trips/{trip_id}/dashboard/
+    Response: {
+        "trip": {...}, "checklist": {...}, "recommendations": [...],
+        "weather": {...}, "usage_stats": [...],
+        "unavailable": ["weather"]
+    }
+    Parts listed in `unavailable` timed out or failed and are null.
+    """
+    dashboard = await trip_dashboard_service.build(
+        request.user, trip_id, context={'request': request})
+    if dashboard is None:
+        return Response(
+            {'error': 'Trip not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    return Response(dashboard)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync_changes(request):
+    """
+    Rows created, updated or deleted since the previous sync
+    GET /api/sync/?since=<cursor>
+    Response: {
+        "cursor": "<pass as since next time>",
+        "full": false,
+        "gear": {"updated": [...], "deleted": [ids]},
+        "trip": {...}, "trip_gear": {...}, "stats": {...}
+    }
+    Deleting a trip or gear item also deletes the trip gear and stats rows
+    that reference it; those are not listed separately. With `full: true`
+    the response is a complete snapshot replacing everything the client has.
+    """
+    since = request.query_params.get('since')
+    try:
+        since = sync_service.decode_cursor(since) if since else None
+    except ValueError:
+        return Response(
+            {'error': 'Invalid cursor'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    return Response(sync_service.changes(
+        request.user, since, context={'request': request}))
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def apply_sync_mutations(request):
+    """
+    Apply changes queued by an offline client, in order, in one transaction
+    POST /api/sync/mutations/
+    Body: {
+        "operations": [
+            {"op": "gear.create", "ref": "tmp-1", "data": {"name": "Tarp"}},
+            {"op": "trip.add_gear", "target": 3, "data": {"gear_id": "tmp-1"}},
+            {"op": "trip.update_gear_status", "target": 3,
+             "data": {"gear_id": 7, "packed": true},
+             "base_updated_at": "2024-06-15T10:00:00Z"}
+        ],
+        "all_or_nothing": false
+    }
+    Each result has a status of applied, conflict, not_found or error.
+    With all_or_nothing, any failure rolls back the whole batch (409).
+    """
+    operations = request_object(request).get('operations')
+    if not isinstance(operations, list):
+        return Response(
+            {'error': 'operations must be a list'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if len(operations) > mutation_service.MAX_OPERATIONS:
+        return Response(
+            {'error': f'At most {mutation_service.MAX_OPERATIONS} operations per batch'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    results, rolled_back = mutation_service.apply(
+        request, operations,
+        all_or_nothing=bool(request.data.get('all_or_nothing'))
+    )
+    return Response(
+        {'committed': not rolled_back, 'results': results},
+        status=status.HTTP_409_CONFLICT if rolled_back else status.HTTP_200_OK
+    )
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def batch_requests(request):
+    """
+    Run several API requests in one round trip, in order
+    POST /api/batch/
+    Body: {
+        "requests": [
+            {"method": "GET", "path": "trips/3/"},
+            {"method": "GET", "path": "gear/?pagination=cursor&page_size=50"},
+            {"method": "PATCH", "path": "trips/3/update_gear_status/",
+             "body": {"gear_id": 7, "packed": true}}
+        ],
+        "all_or_nothing": false
+    }
+    Paths are relative to /api/. Each response has a status, headers and
+    body. With all_or_nothing, the requests share a transaction: the first
+    failure rolls it back (409) and the rest aren't run (424).
+    """
+    sub_requests = request_object(request).get('requests')
+    if not isinstance(sub_requests, list):
+        return Response(
+            {'error': 'requests must be a list'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if len(sub_requests) > batch_service.MAX_REQUESTS:
+        return Response(
+            {'error': f'At most {batch_service.MAX_REQUESTS} requests per batch'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    responses, rolled_back = batch_service.execute(
+        request, sub_requests,
+        all_or_nothing=bool(request.data.get('all_or_nothing'))
+    )
+    return Response(
+        {'committed': not rolled_back, 'responses': responses},
+        status=status.HTTP_409_CONFLICT if rolled_back else status.HTTP_200_OK
+    )
+
+
+MEDIA_CHUNK_SIZE = 64 * 1024
+
+
+def read_range(path, start, length):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(MEDIA_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def media_headers(response, media):
+    response['ETag'] = media.etag
+    response['Last-Modified'] = http_date(media.last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    if media.immutable:
+        patch_cache_control(response, public=True, max_age=365 * 24 * 3600, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Uploaded files, with conditional and range requests
+    GET /media/<path>
+    Content-addressed files (photos, thumbnails) are cached as immutable.
+    With MEDIA_SENDFILE_HEADER set, the front proxy sends the file
+    (X-Accel-Redirect for nginx, X-Sendfile for Apache/lighttpd);
+    otherwise it is streamed from here. Only served with MEDIA_SERVE on.
+    """
+    if not getattr(settings, 'MEDIA_SERVE', False):
+        raise Http404('File not found')
+
+    media = media_service.find(path)
+    if media is None:
+        raise Http404('File not found')
+
+    conditional = get_conditional_response(
+        request, etag=media.etag, last_modified=media.last_modified)
+    if conditional is not None:
+        return media_headers(conditional, media)
+
+    sendfile_header = getattr(settings, 'MEDIA_SENDFILE_HEADER', '')
+    if sendfile_header:
+        # The proxy handles Range itself and keeps our caching headers
+        response = HttpResponse(content_type=media.content_type)
+        if sendfile_header == 'X-Accel-Redirect':
+            prefix = settings.MEDIA_ACCEL_REDIRECT_PREFIX.rstrip('/')
+            response['X-Accel-Redirect'] = quote(f'{prefix}/{media.name}')
+        else:
+            response[sendfile_header] = media.path
+        return media_headers(response, media)
+
+    byte_range = None
+    range_header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    # A stale If-Range means the client wants the whole, current file
+    if range_header and (not if_range or if_range == media.etag
+                         or parse_http_date_safe(if_range) == media.last_modified):
+        try:
+            byte_range = media_service.byte_range(range_header, media.size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{media.size}'
+            return media_headers(response, media)
+
+    if byte_range is None:
+        response = FileResponse(open(media.path, 'rb'), content_type=media.content_type)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            read_range(media.path, start, end - start + 1),
+            status=206, content_type=media.content_type)
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f'bytes {start}-{end}/{media.size}'
+    return media_headers(response, media)
+
+
 class UserRegistrationView(APIView):
     permission_classes = [permissions.AllowAny]
 
@@ -127,34 +483,116 @@ class CurrentUserView(APIView):
         return Response(serializer.data)
 
 
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class ReferenceDataMixin:
+    """
+    Serve a small reference table from the process-wide snapshot kept by
+    reference_data_service: pre-rendered JSON rows, paginated as usual,
+    validated by the snapshot version and cacheable by the client for
+    REFERENCE_DATA_MAX_AGE seconds. Other formats use the regular path.
+    """
+    reference_model = None
+
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+
+        snapshot = reference_data_service.get_snapshot(self.reference_model)
+        ids = list(snapshot.detail_bytes)
+        page = self.paginate_queryset(ids)
+        # Rows are embedded as already rendered
+        results = [orjson.Fragment(snapshot.detail_bytes[pk])
+                   for pk in (ids if page is None else page)]
+        data = results if page is None else self.get_paginated_response(results).data
+        return self._serve(request, snapshot, ORJSONRenderer().render(data))
+
+    def retrieve(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'json':
+            return super().retrieve(request, *args, **kwargs)
+
+        snapshot = reference_data_service.get_snapshot(self.reference_model)
+        try:
+            pk = int(kwargs[self.lookup_field])
+            content = snapshot.detail_bytes[pk]
+        except (KeyError, ValueError):
+            raise NotFound()
+        return self._serve(
+            request, snapshot, content, snapshot.by_id[pk].updated_at)
+
+    def _serve(self, request, snapshot, content, last_modified=None):
+        etag = 'W/"%s"' % snapshot.version
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=int(last_modified.timestamp()) if last_modified else None
+        )
+        if response is None:
+            response = HttpResponse(content, content_type='application/json')
+
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        patch_cache_control(
+            response, private=True, max_age=settings.REFERENCE_DATA_MAX_AGE)
+        return response
+
+
+class CategoryViewSet(ReplicaReadMixin, ReferenceDataMixin, viewsets.ReadOnlyModelViewSet):
     """List and retrieve categories (read-only)"""
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticated]
+    reference_model = Category
 
 
-class ActivityTypeViewSet(viewsets.ReadOnlyModelViewSet):
+class ActivityTypeViewSet(ReferenceDataMixin, viewsets.ReadOnlyModelViewSet):
     """List and retrieve activity types (read-only)"""
     queryset = ActivityType.objects.all()
     serializer_class = ActivityTypeSerializer
     permission_classes = [permissions.IsAuthenticated]
+    reference_model = ActivityType
 
 
-class UserGearViewSet(viewsets.ModelViewSet):
-    """CRUD operations for user's gear"""
+class UserGearViewSet(SparseFieldsViewMixin, ConditionalGetMixin, viewsets.ModelViewSet):
+    """CRUD operations for user's gear; reads take ?fields= and ?expand=usage_stats"""
     serializer_class = UserGearSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = HybridPagination
+    keyset_ordering = ('-created_at', '-id')
+    list_values_serializer_class = UserGearListValuesSerializer
 
     def get_queryset(self):
         # Users can only see their own gear
-        return UserGear.objects.filter(user=self.request.user)
+        queryset = UserGear.objects.filter(user=self.request.user)
+
+        # Only join and prefetch what the response includes
+        selection = self.get_field_selection()
+        if selection.wants('category_name'):
+            queryset = queryset.select_related('category')
+        if selection.wants('usage_stats', default=False):
+            queryset = queryset.prefetch_related('gearusagestats_set')
+        return queryset
 
     def get_serializer_class(self):
         if self.action == 'list':
             return UserGearListSerializer
         return UserGearSerializer
 
+    def get_list_version(self, rows):
+        # category_name is part of the output
+        token = (self.get_page_version(rows), category_version())
+        if self.get_field_selection().wants('usage_stats', default=False):
+            token += (aggregate_version(
+                GearUsageStats.objects.filter(gear__in=self.get_row_ids(rows))),)
+        return Version(token=token)
+
+    def get_object_version(self, obj):
+        version = with_category_version(obj)
+        if self.get_field_selection().wants('usage_stats', default=False):
+            # A deleted stats row leaves no newer timestamp behind
+            version = Version(token=version.token + (aggregate_version(
+                GearUsageStats.objects.filter(gear=obj)),))
+        return version
+
     @action(detail=False, methods=['get'])
     def by_category(self, request):
         """Get gear grouped by category"""
@@ -167,6 +605,27 @@ class UserGearViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(gear, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Autocomplete over the user's gear, topped up with catalog matches
+        GET /api/gear/search/?q=head&limit=10
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            limit = int(request.query_params.get(
+                'limit', gear_search_service.DEFAULT_LIMIT))
+        except ValueError:
+            return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'query': query,
+            'results': gear_search_service.autocomplete(request.user, query, limit)
+        })
+
     @action(detail=True, methods=['get'])
     def usage_stats(self, request, pk=None):
         """Get usage statistics for a specific gear item"""
@@ -179,11 +638,19 @@ class UserGearViewSet(viewsets.ModelViewSet):
             return Response({'message': 'No usage stats available'}, status=status.HTTP_404_NOT_FOUND)
 
 
-class TripViewSet(viewsets.ModelViewSet):
-    """CRUD operations for trips"""
+class TripViewSet(ReplicaReadMixin, SparseFieldsViewMixin, ConditionalGetMixin, viewsets.ModelViewSet):
+    """CRUD operations for trips; reads take ?fields= and ?expand=gear_items"""
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = HybridPagination
+    keyset_ordering = ('-start_date', '-id')
+    list_values_serializer_class = TripListValuesSerializer
 
     def get_queryset(self):
+        # Make buffered packing changes visible before anything else reads
+        # or writes this user's trips; status toggles keep coalescing
+        if self.action != 'update_gear_status':
+            packing_buffer_service.flush(user_id=self.request.user.id)
+
         # Users can only see their own trips
         queryset = Trip.objects.filter(user=self.request.user)
 
@@ -192,6 +659,15 @@ class TripViewSet(viewsets.ModelViewSet):
         if status_filter:
             queryset = queryset.filter(status=status_filter)
 
+        # Gear items are part of the detail by default, of the list on request
+        if self.action in ('list', 'retrieve'):
+            selection = self.get_field_selection()
+            if selection.wants('gear_items', default=self.action == 'retrieve'):
+                queryset = queryset.prefetch_related(Prefetch(
+                    'gear_items',
+                    queryset=TripGear.objects.select_related('gear__category')
+                ))
+
         return queryset
 
     def get_serializer_class(self):
@@ -199,6 +675,24 @@ class TripViewSet(viewsets.ModelViewSet):
             return TripListSerializer
         return TripSerializer
 
+    def get_list_version(self, rows):
+        # gear_count/packed_count depend on the trips' gear items
+        items = TripGear.objects.filter(trip__in=self.get_row_ids(rows))
+        if not self.get_field_selection().wants('gear_items', default=False):
+            return Version(token=(self.get_page_version(rows), aggregate_version(items)))
+
+        # Expanded items also show their gear and its category
+        items = items.aggregate(**TRIP_ITEM_AGGREGATES)
+        return Version(token=(
+            self.get_page_version(rows),
+            (items['rows'], items['items'], items['gear']),
+            category_version()
+        ))
+
+    def get_object_version(self, obj):
+        items = TripGear.objects.filter(trip=obj).aggregate(**TRIP_ITEM_AGGREGATES)
+        return trip_version(obj, items, category_version())
+
     @action(detail=True, methods=['post'])
     def add_gear(self, request, pk=None):
         """Add gear item to trip"""
@@ -232,6 +726,83 @@ class TripViewSet(viewsets.ModelViewSet):
         serializer = TripGearSerializer(trip_gear)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @action(detail=True, methods=['post'])
+    def bulk_add_gear(self, request, pk=None):
+        """
+        Add many gear items to trip
+        POST /api/trips/{id}/bulk_add_gear/
+        Body: {"items": [{"gear_id": 1, "quantity": 2}, {"gear_id": 5}]}
+        A gear_id listed twice is added once, with the last quantity given
+        (as in bulk_update_gear_status, later entries win).
+        """
+        trip = self.get_object()
+
+        serializer = TripGearAddSerializer(
+            data=request_object(request).get('items'), many=True)
+        serializer.is_valid(raise_exception=True)
+
+        quantities = {}
+        for item in serializer.validated_data:
+            quantities[item['gear_id']] = item['quantity']
+
+        owned = set(
+            UserGear.objects.filter(
+                user=request.user, id__in=quantities.keys()
+            ).values_list('id', flat=True)
+        )
+        already_added = set(
+            TripGear.objects.filter(
+                trip=trip, gear_id__in=owned
+            ).values_list('gear_id', flat=True)
+        )
+        new_ids = [
+            gear_id for gear_id in quantities
+            if gear_id in owned and gear_id not in already_added
+        ]
+
+        def new_row(gear_id):
+            return TripGear(
+                trip=trip,
+                gear_id=gear_id,
+                origin='user_added',
+                quantity=quantities[gear_id]
+            )
+
+        try:
+            with transaction.atomic():
+                created = TripGear.objects.bulk_create(
+                    [new_row(gear_id) for gear_id in new_ids])
+        except IntegrityError:
+            # Another request added some of them meanwhile: add the rest
+            # one by one, reporting only the rows created here
+            created = []
+            for gear_id in new_ids:
+                row = new_row(gear_id)
+                try:
+                    with transaction.atomic():
+                        row.save(force_insert=True)
+                    created.append(row)
+                except IntegrityError:
+                    already_added.add(gear_id)
+            new_ids = [row.gear_id for row in created]
+
+        added = TripGear.objects.filter(
+            pk__in=[row.pk for row in created]
+        ).select_related('gear__category')
+
+        return Response(
+            {
+                'added': TripGearSerializer(added, many=True).data,
+                'duplicates': [
+                    gear_id for gear_id in quantities if gear_id in already_added
+                ],
+                'not_found': [
+                    gear_id for gear_id in quantities if gear_id not in owned
+                ]
+            },
+            status=status.HTTP_201_CREATED if new_ids else status.HTTP_200_OK
+        )
+
     @action(detail=True, methods=['delete'])
     def remove_gear(self, request, pk=None):
         """Remove gear item from trip"""
@@ -252,133 +823,259 @@ class TripViewSet(viewsets.ModelViewSet):
     def update_gear_status(self, request, pk=None):
         """Update packed/used status of gear in trip"""
         trip = self.get_object()
-        gear_id = request.data.get('gear_id')
+
+        serializer = TripGearStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        changes = dict(serializer.validated_data)
+        gear_id = changes.pop('gear_id')
 
         try:
             trip_gear = TripGear.objects.get(trip=trip, gear_id=gear_id)
 
-            # Update fields if provided
-            if 'packed' in request.data:
-                trip_gear.packed = request.data['packed']
-            if 'used' in request.data:
-                trip_gear.used = request.data['used']
-            if 'usefulness_rating' in request.data:
-                trip_gear.usefulness_rating = request.data['usefulness_rating']
-            if 'notes' in request.data:
-                trip_gear.notes = request.data['notes']
-
-            trip_gear.save()
+            # Update fields if provided; rapid toggles may be coalesced and
+            # written shortly after the response
+            trip_gear = packing_buffer_service.update(
+                trip_gear, changes, request.user.id)
 
             serializer = TripGearSerializer(trip_gear)
             return Response(serializer.data)
+        except ValidationError as e:
+            return Response(e.message_dict, status=status.HTTP_400_BAD_REQUEST)
         except TripGear.DoesNotExist:
             return Response(
                 {'error': 'Gear not found in this trip'},
                 status=status.HTTP_404_NOT_FOUND
             )
 
+    @action(detail=True, methods=['patch'])
+    def bulk_update_gear_status(self, request, pk=None):
+        """
+        Update packed/used status of many gear items in one request
+        PATCH /api/trips/{id}/bulk_update_gear_status/
+        Body: {
+            "items": [
+                {"gear_id": 1, "packed": true},
+                {"gear_id": 2, "used": false, "usefulness_rating": 4}
+            ]
+        }
+        """
+        trip = self.get_object()
+
+        serializer = TripGearStatusSerializer(
+            data=request_object(request).get('items'), many=True)
+        serializer.is_valid(raise_exception=True)
+
+        # Later changes to the same item win
+        changes = {}
+        for item in serializer.validated_data:
+            changes.setdefault(item.pop('gear_id'), {}).update(item)
+
+        with transaction.atomic():
+            trip_gear = list(
+                TripGear.objects.select_for_update()
+                .filter(trip=trip, gear_id__in=changes.keys())
+                .order_by('gear_id')
+            )
+
+            fields = set()
+            now = timezone.now()
+            for item in trip_gear:
+                for field, value in changes[item.gear_id].items():
+                    setattr(item, field, value)
+                    fields.add(field)
+                # bulk_update() bypasses save(), so auto_now isn't applied
+                item.updated_at = now
+
+            if fields:
+                TripGear.objects.bulk_update(
+                    trip_gear, sorted(fields) + ['updated_at'])
+
+        found = {item.gear_id for item in trip_gear}
+        counters = TripGear.objects.filter(trip=trip).aggregate(
+            gear_count=Count('id'),
+            packed_count=Count('id', filter=Q(packed=True)),
+            used_count=Count('id', filter=Q(used=True))
+        )
+        return Response({
+            'updated': len(trip_gear),
+            'not_found': [gear_id for gear_id in changes if gear_id not in found],
+            **counters
+        })
+
+    @action(detail=True, methods=['get'])
+    def summary(self, request, pk=None):
+        """
+        Total and packed weight, per-category breakdown and heaviest items
+        GET /api/trips/{id}/summary/
+        """
+        trip = self.get_object()
+        version = self.get_object_version(trip)
+        not_modified = self.check_not_modified(request, version)
+        if not_modified is not None:
+            return not_modified
+
+        return self.add_validators(
+            Response(trip_summary_service.summarize(trip)), version)
+
     @action(detail=True, methods=['post'])
     def complete_trip(self, request, pk=None):
         """Mark trip as completed and update usage statistics"""
         trip = self.get_object()
 
-        trip.status = 'completed'
-        trip.save()
-
-        # Update gear usage statistics
-        for trip_gear in trip.gear_items.all():
-            stats, created = GearUsageStats.objects.get_or_create(
-                user=request.user,
-                gear=trip_gear.gear,
-                defaults={
-                    'times_packed': 0,
-                    'times_used': 0,
-                    'times_not_used': 0
-                }
-            )
+        with transaction.atomic():
+            trip.status = 'completed'
+            trip.save()
 
-            # Update counters
-            if trip_gear.packed:
-                stats.times_packed += 1
-                if trip_gear.used:
-                    stats.times_used += 1
-                else:
-                    stats.times_not_used += 1
-
-            # Update activity usage
-            if trip.activities:
-                usage_by_activity = stats.usage_by_activity or {}
-                for activity in trip.activities:
-                    usage_by_activity[activity] = usage_by_activity.get(
-                        activity, 0) + 1
-                stats.usage_by_activity = usage_by_activity
-
-            # Update weather usage
-            if trip.expected_weather:
-                usage_by_weather = stats.usage_by_weather or {}
-                for weather in trip.expected_weather:
-                    if weather not in usage_by_weather:
-                        usage_by_weather[weather] = 0
-                    usage_by_weather[weather] += 1
-                stats.usage_by_weather = usage_by_weather
-
-            # Update duration usage
-            duration_range = self._get_duration_range(trip.duration_days)
-            usage_by_duration = stats.usage_by_duration or {}
-            usage_by_duration[duration_range] = usage_by_duration.get(
-                duration_range, 0) + 1
-            stats.usage_by_duration = usage_by_duration
-
-            # Update average rating
-            if trip_gear.usefulness_rating:
-                if stats.times_packed == 0:
-                    # First rating
-                    stats.avg_usefulness_rating = trip_gear.usefulness_rating
-                else:
-                    current_ratings = stats.times_packed
-                    current_avg = float(stats.avg_usefulness_rating or 0)
-                    new_avg = ((current_avg * (current_ratings - 1)) +
-                               trip_gear.usefulness_rating) / current_ratings
-                    stats.avg_usefulness_rating = round(new_avg, 2)
-
-            stats.last_used_date = trip.end_date
-            stats.save()
+            # Update gear usage statistics
+            usage_stats_service.record_trip(trip)
 
         serializer = TripSerializer(trip)
         return Response(serializer.data)
 
-    def _get_duration_range(self, days):
-        """Helper to categorize trip duration"""
-        if days <= 1:
-            return '1_day'
-        elif days <= 3:
-            return '2-3_days'
-        elif days <= 7:
-            return '4-7_days'
-        else:
-            return '8+_days'
+
+class TripDetailAsyncView(ConditionalGetMixin, AsyncAPIView):
+    """
+    TripViewSet's retrieve for ASGI: the trip, its gear items and the
+    version aggregates load without blocking the event loop. They're
+    gathered, but Django's async ORM runs them one after another in its
+    thread-sensitive executor, so the queries don't overlap.
+    GET /api/trips/{id}/
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    http_method_names = ['get', 'head', 'options']
+
+    async def get(self, request, pk):
+        user = request.user
+        # Make buffered packing changes visible, as TripViewSet does
+        await sync_to_async(packing_buffer_service.flush)(user_id=user.id)
+
+        selection = FieldSelection.from_request(request)
+        items = TripGear.objects.filter(trip_id=pk, trip__user=user)
+        loads = [
+            Trip.objects.aget(pk=pk, user=user),
+            items.aaggregate(**TRIP_ITEM_AGGREGATES),
+            sync_to_async(category_version)(),
+        ]
+        if selection.wants('gear_items'):
+            loads.append(alist(items.select_related('gear__category')))
+        try:
+            trip, items_version, categories_version, *gear_items = (
+                await asyncio.gather(*loads))
+        except Trip.DoesNotExist:
+            raise Http404('No Trip matches the given query.')
+
+        version = trip_version(trip, items_version, categories_version)
+        not_modified = self.check_not_modified(request, version)
+        if not_modified is not None:
+            return not_modified
+
+        if gear_items:
+            trip._prefetched_objects_cache = {'gear_items': gear_items[0]}
+        context = {
+            'request': request, 'format': self.format_kwarg, 'view': self,
+            'field_selection': selection,
+        }
+        data = await sync_to_async(
+            lambda: TripSerializer(trip, context=context).data)()
+        return self.add_validators(Response(data), version)
+
+
+trip_detail_sync = TripViewSet.as_view(
+    {'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'},
+    basename='trip', detail=True)
+trip_detail_async = TripDetailAsyncView.as_view()
+
+
+@csrf_exempt
+async def trip_detail(request, pk):
+    """
+    Trip detail for ASGI: reads by TripDetailAsyncView, writes by TripViewSet
+    /api/trips/{id}/
+    """
+    if request.method in ('GET', 'HEAD'):
+        return await trip_detail_async(request, pk=pk)
+    return await sync_to_async(trip_detail_sync)(request, pk=pk)
 
 
-class GearCatalogViewSet(viewsets.ReadOnlyModelViewSet):
-    """Browse gear catalog for inspiration"""
-    queryset = GearCatalog.objects.all()
+class GearCatalogViewSet(ReplicaReadMixin, SparseFieldsViewMixin, ConditionalGetMixin,
+                         viewsets.ReadOnlyModelViewSet):
+    """Browse gear catalog for inspiration; reads take ?fields="""
+    queryset = GearCatalog.objects.defer('search_vector')
     serializer_class = GearCatalogSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = HybridPagination
+    keyset_ordering = ('-popularity_score', 'name', 'id')
+    list_values_serializer_class = GearCatalogValuesSerializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.get_field_selection().wants('category_name'):
+            queryset = queryset.select_related('category')
+        return queryset
+
+    def get_list_version(self, rows):
+        return Version(token=(
+            self.get_page_version(rows),
+            category_version()
+        ))
+
+    def get_object_version(self, obj):
+        return with_category_version(obj)
 
     @action(detail=False, methods=['get'])
     def by_activity(self, request):
-        """Get recommended catalog items for specific activities"""
+        """
+        Get catalog items for specific activities and/or weather conditions,
+        ranked by popularity
+        GET /api/catalog/by_activity/?activities=Hiking&activities=Camping
+            &weather=Rainy&match=any|all
+        """
         activities = request.query_params.getlist('activities')
-        if activities:
-            # Filter items that match any of the activities
-            queryset = self.queryset.filter(
-                common_activities__overlap=activities)
-            serializer = self.get_serializer(queryset, many=True)
-            return Response(serializer.data)
-        return Response({'error': 'No activities specified'}, status=status.HTTP_400_BAD_REQUEST)
-
+        weather = request.query_params.getlist('weather')
+        if not activities and not weather:
+            return Response({'error': 'No activities specified'}, status=status.HTTP_400_BAD_REQUEST)
+
+        match_all = request.query_params.get('match', 'any') == 'all'
+        queryset = self.get_queryset()
+        for kind, names in [(GearCatalogTag.ACTIVITY, activities),
+                            (GearCatalogTag.WEATHER, weather)]:
+            if names:
+                queryset = queryset.filter(
+                    id__in=self._tagged_items(kind, names, match_all))
+
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
-class GearUsageStatsViewSet(viewsets.ReadOnlyModelViewSet):
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Search catalog items by name and description, best matches first
+        GET /api/catalog/search/?q=rain jacket
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = catalog_search_service.search(self.get_queryset(), query)
+
+        # Results are ranked by relevance, so page by number, not keyset
+        paginator = PageNumberPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    def _tagged_items(self, kind, names, match_all):
+        """Ids of catalog items tagged with any (or all) of the names"""
+        tags = GearCatalogTag.objects.filter(kind=kind, name__in=names)
+        if match_all:
+            tags = tags.values('item').annotate(
+                matched=Count('name', distinct=True)
+            ).filter(matched=len(set(names)))
+        return tags.values('item')
+
+
+class GearUsageStatsViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     """View usage statistics for user's gear"""
     serializer_class = GearUsageStatsSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -1,5 +1,7 @@
 import api from './api';
 
+export type Thumbnails = Record<'small' | 'medium' | 'large', { webp: string; jpeg: string }>;
+
 export interface GearItem {
   id: number;
   name: string;
@@ -8,6 +10,7 @@ export interface GearItem {
   category_name: string;
   weight_grams: number | null;
   photo: string | null;
+  thumbnails?: Thumbnails | null;
   purchase_date: string | null;
   notes: string;
   created_at: string;
@@ -31,6 +34,15 @@ export interface CreateGearData {
   notes?: string;
 }
 
+export interface GearSearchResult {
+  source: 'user' | 'catalog';
+  id: number;
+  name: string;
+  category: number | null;
+  category_name: string | null;
+  weight_grams: number | null;
+}
+
 class GearService {
 
   async getCatalogItems(): Promise<GearItem[]> {
@@ -45,6 +57,11 @@ class GearService {
     return allGear;
   }
 
+  async searchGear(query: string, limit = 10): Promise<GearSearchResult[]> {
+    const response = await api.get('/gear/search/', { params: { q: query, limit } });
+    return response.data.results;
+  }
+
   async getGearItemsByCategory(categoryId: number): Promise<GearItem[]> {
     const response = await api.get(`/gear/by_category/?category_id=${categoryId}`);
     console.log("GEAR by category RESPONSE:", response.data);
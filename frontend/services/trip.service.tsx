@@ -1,4 +1,5 @@
 import api from "./api";
+import { RecommendedGear } from "./recommendation.service";
 
 export interface ActivityType {
     id: number;
@@ -43,6 +44,48 @@ export interface TripGear {
     created_at: string;
 }
 
+export interface BulkAddGearResult {
+    added: TripGear[];
+    duplicates: number[];
+    not_found: number[];
+}
+
+export interface BulkGearStatusResult {
+    updated: number;
+    not_found: number[];
+    gear_count: number;
+    packed_count: number;
+    used_count: number;
+}
+
+export interface TripSummary {
+    trip_id: number;
+    gear_count: number;
+    item_count: number;
+    packed_count: number;
+    unweighed_count: number;
+    total_weight_grams: number;
+    packed_weight_grams: number;
+    categories: {
+        category: number | null;
+        category_name: string | null;
+        gear_count: number;
+        item_count: number;
+        packed_count: number;
+        unweighed_count: number;
+        weight_grams: number;
+        packed_weight_grams: number;
+    }[];
+    heaviest_items: {
+        gear_id: number;
+        name: string;
+        quantity: number;
+        weight_grams: number;
+        total_weight_grams: number;
+        packed: boolean;
+    }[];
+}
+
 export interface CreateTripData {
     title: string;
     description?: string;
@@ -70,6 +113,42 @@ export interface WeatherForecast {
     }>;
 }
 
+export interface GearUsageStats {
+    id: number;
+    gear: number;
+    gear_name: string;
+    times_packed: number;
+    times_used: number;
+    times_not_used: number;
+    avg_usefulness_rating: string | null;
+    usage_by_activity: Record<string, number>;
+    usage_by_weather: Record<string, number>;
+    usage_by_duration: Record<string, number>;
+    last_used_date: string | null;
+    updated_at: string;
+}
+
+export interface TripDashboard {
+    trip: Trip;
+    checklist: {
+        gear_count: number;
+        item_count: number;
+        packed_count: number;
+        used_count: number;
+        categories: {
+            category: number | null;
+            category_name: string | null;
+            gear_count: number;
+            packed_count: number;
+        }[];
+    };
+    // null when listed in `unavailable` (timed out or failed)
+    recommendations: RecommendedGear[] | null;
+    weather: WeatherForecast | null;
+    usage_stats: GearUsageStats[] | null;
+    unavailable: ('recommendations' | 'weather' | 'usage_stats')[];
+}
+
 class TripService {
 
     async getWeatherForecast(
@@ -93,6 +172,16 @@ class TripService {
         return response.data;
     }
 
+    async bulkAddGearToTrip(
+        tripId: number,
+        items: Array<{ gear_id: number; quantity?: number }>
+    ): Promise<BulkAddGearResult> {
+        const response = await api.post(`/trips/${tripId}/bulk_add_gear/`, {
+            items,
+        });
+        return response.data;
+    }
+
     async updateTrip(id: number, data: Partial<CreateTripData>): Promise<Trip> {
         const response = await api.patch(`/trips/${id}/`, data);
         return response.data;
@@ -124,11 +213,37 @@ class TripService {
         return response.data;
     }
 
+    async bulkUpdateGearStatus(
+        tripId: number,
+        items: Array<{
+            gear_id: number;
+            packed?: boolean;
+            used?: boolean;
+            usefulness_rating?: number | null;
+            notes?: string;
+        }>
+    ): Promise<BulkGearStatusResult> {
+        const response = await api.patch(`/trips/${tripId}/bulk_update_gear_status/`, {
+            items,
+        });
+        return response.data;
+    }
+
     async getTrip(id: number): Promise<Trip> {
         const response = await api.get(`/trips/${id}/`);
         return response.data;
     }
 
+    async getTripSummary(id: number): Promise<TripSummary> {
+        const response = await api.get(`/trips/${id}/summary/`);
+        return response.data;
+    }
+
+    async getTripDashboard(id: number): Promise<TripDashboard> {
+        const response = await api.get(`/trips/${id}/dashboard/`);
+        return response.data;
+    }
+
     async getActivities(): Promise<ActivityType[]> {
         let url = '/activities/';
         let allActivities: ActivityType[] = [];